@@ -1,19 +1,32 @@
 #!/usr/bin/env python3
+import os
 import sys
 import gzip
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from pipeline_events import EventWriter, file_size
+
 def process_fastq(fastq_path, barcode_dict, output_prefix):
     """处理FASTQ文件并拆分到对应barcode文件"""
+    # 先打开输入：打开失败时直接抛出原始错误，finally 中的 raw/fastq 一定已绑定
+    if fastq_path.endswith('.gz'):
+        fastq = gzip.open(fastq_path, 'rt')
+        raw = fastq.buffer.fileobj
+    else:
+        fastq = open(fastq_path, 'r')
+        raw = fastq.buffer
+
+    # 结构化进度事件（由 pipeline 设置 NGS_EVENT_FILE 时写出）
+    stage = EventWriter().stage("split", total_bytes=file_size(fastq_path))
+    n_reads = 0
     try:
-        if fastq_path.endswith('.gz'):
-            fastq = gzip.open(fastq_path, 'rt')
-        else:
-            fastq = open(fastq_path, 'r')
-        
         while True:
             # 读取四行一组
             header = fastq.readline().strip()
             if not header: break  # 文件结束
+            n_reads += 1
+            if n_reads & 0xfff == 0:
+                stage.progress(n_reads, raw.tell())
             sequence = fastq.readline().strip()
             sep = fastq.readline().strip()
             quality = fastq.readline().strip()
@@ -29,7 +42,9 @@ def process_fastq(fastq_path, barcode_dict, output_prefix):
                 output_file.write(f"{header}\n{sequence}\n{sep}\n{quality}\n")
                 
     finally:
+        stage.progress(n_reads, raw.tell())
         fastq.close()
+        stage.end()
 
 def main():
     if len(sys.argv) != 3:
@@ -11,6 +11,12 @@ YELLOW='\033[1;33m'
 BLUE='\033[0;34m'
 NC='\033[0m' # No Color
 
+# 结构化进度事件（app 通过 NGS_EVENT_FILE 读取），缺失时退化为空操作
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+if ! source "$(dirname "$(dirname "$SCRIPT_DIR")")/pipeline_events.sh" 2>/dev/null; then
+    event_emit() { :; }; event_pipeline_start() { :; }; event_stage_start() { :; }; event_stage_end() { :; }; event_file_bytes() { echo 0; }
+fi
+
 # 帮助信息
 print_help() {
     echo -e "${BLUE}测序数据分析自动化pipeline${NC}"
@@ -158,6 +164,7 @@ parse_arguments() {
 # 主流程函数
 main_pipeline() {
     print_info "开始测序数据分析流程"
+    event_pipeline_start egg_indel 5
     print_info "工作名称: $WORK_NAME"
     print_info "样品数量: $SAMPLE_COUNT"
     print_info "窗口大小: $WINDOW_SIZE"
@@ -176,6 +183,7 @@ main_pipeline() {
     
     # 步骤1: 激活conda环境
     print_info "步骤1: 激活conda环境 (crispresso2_env)"
+    event_stage_start env 1 "激活conda环境"
     if command -v conda &> /dev/null; then
         source "$(conda info --base)/etc/profile.d/conda.sh" 2>/dev/null || true
         if conda activate crispresso2_env 2>/dev/null; then
@@ -187,10 +195,12 @@ main_pipeline() {
     else
         print_warning "未找到conda命令，跳过环境激活"
     fi
+    event_stage_end env ok
     echo ""
     
     # 步骤2: FLASH拼接
     print_info "步骤2: 使用FLASH拼接序列"
+    event_stage_start flash 2 "FLASH拼接"
     
     # 使用第一个序列文件的基础名作为FLASH输出名
     local FLASH_OUTPUT_BASE="${SEQ1_FILE%_1*}"
@@ -208,10 +218,12 @@ main_pipeline() {
     WORK_NAME="$FLASH_OUTPUT_BASE"
     print_info "实际工作名称: $WORK_NAME"
     print_success "FLASH拼接完成"
+    event_stage_end flash ok "bytes=$(event_file_bytes "${WORK_NAME}.extendedFrags.fastq")"
     echo ""
     
     # 步骤3: 生成barcode文件并拆分序列
     print_info "步骤3: 生成barcode文件并拆分序列"
+    event_stage_start split 3 "按Barcode拆分"
     
     # 根据用户输入的barcode序号生成barcode文件
     local SELECTED_BARCODES=("${BARCODE_SELECTED[@]}")
@@ -297,11 +309,13 @@ EOF
         error_exit "barcode拆分未生成任何fastq文件"
     fi
     print_success "barcode拆分完成，生成 $split_count 个文件"
+    event_stage_end split ok
     echo ""
     
     # 步骤4: 运行CRISPResso分析
     print_info "步骤6: 运行CRISPResso分析"
     print_info "将分析 $SAMPLE_COUNT 个样品"
+    event_stage_start crispresso 4 "CRISPResso分析" "total=$SAMPLE_COUNT"
     
     # 定义固定的amplicon和guide序列
     local AMPLICON_SEQ="CATCTCCTCGCAGCGTCTCTGCGGGGCGGCCCCGGCTCCCTCCGCCATGGGGGCCGCGGCCCTCCGAGCCCTTCCCTGGGCTCTGCTGCTGCTGCTGGGCCCGCTGCTGCCCGGCCAGCGCTTGCAGGCCGACGCCACGCGTGTCTCCGAGCCCACCTGGGAGCAGCCGTGGGGAGAGCCCGGGGGTATCACCGCCGCCCCGCTGGCCACGGCCCAGGAGGTGCACCCGCTGAACAAACAGCACCACA"
@@ -328,15 +342,18 @@ EOF
                   -g "$GUIDE_SEQ" \
                   -n "$i" \
                   -w "$WINDOW_SIZE" || print_warning "CRISPResso分析样品 $i 失败，继续处理下一个"
+        event_emit progress "stage=crispresso" "records=$i" "total=$SAMPLE_COUNT"
         
         echo ""
     done
     
     print_success "CRISPResso分析完成"
+    event_stage_end crispresso ok "records=$SAMPLE_COUNT"
     echo ""
     
     # 步骤5: 打包结果
     print_info "步骤7: 打包分析结果"
+    event_stage_start package 5 "打包结果"
     
     local result_files=$(ls -d CRISPResso_on_egg* 2>/dev/null | wc -l)
     if [ "$result_files" -eq 0 ]; then
@@ -355,6 +372,7 @@ EOF
             print_warning "打包文件未生成"
         fi
     fi
+    event_stage_end package ok "bytes=$(event_file_bytes "${WORK_NAME}_result.tar.gz")"
     echo ""
     
     # 清理临时文件
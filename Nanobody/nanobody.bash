@@ -11,6 +11,12 @@ YELLOW='\033[1;33m'
 BLUE='\033[0;34m'
 NC='\033[0m' # No Color
 
+# 结构化进度事件（app 通过 NGS_EVENT_FILE 读取），缺失时退化为空操作
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+if ! source "$(dirname "$SCRIPT_DIR")/pipeline_events.sh" 2>/dev/null; then
+    event_emit() { :; }; event_pipeline_start() { :; }; event_stage_start() { :; }; event_stage_end() { :; }; event_file_bytes() { echo 0; }
+fi
+
 # 帮助信息
 print_help() {
     echo -e "${BLUE}纳米抗体分析自动化pipeline${NC}"
@@ -115,6 +121,7 @@ parse_arguments() {
 # 主流程函数
 main_pipeline() {
     print_info "开始纳米抗体分析流程"
+    event_pipeline_start nanobody 4
     print_info "工作名称: $WORK_NAME"
     echo ""
     
@@ -132,6 +139,7 @@ main_pipeline() {
     
     # 步骤1: FLASH拼接
     print_info "步骤1: 使用FLASH拼接序列"
+    event_stage_start flash 1 "FLASH拼接"
     
     check_command "flash"
     print_info "执行: flash $SEQ1_FILE $SEQ2_FILE -o $WORK_NAME"
@@ -141,10 +149,12 @@ main_pipeline() {
         error_exit "FLASH输出文件未找到: ${WORK_NAME}.extendedFrags.fastq"
     fi
     print_success "FLASH拼接完成"
+    event_stage_end flash ok "bytes=$(event_file_bytes "${WORK_NAME}.extendedFrags.fastq")"
     echo ""
     
     # 步骤2: 转换fastq为fasta
     print_info "步骤2: 转换fastq为fasta格式"
+    event_stage_start fq2fa 2 "格式转换"
     check_command "seqkit"
     print_info "执行: seqkit fq2fa ${WORK_NAME}.extendedFrags.fastq > ${WORK_NAME}.fa"
     seqkit fq2fa "${WORK_NAME}.extendedFrags.fastq" > "${WORK_NAME}.fa" || error_exit "seqkit转换失败"
@@ -153,10 +163,12 @@ main_pipeline() {
         error_exit "FASTA文件未生成: ${WORK_NAME}.fa"
     fi
     print_success "格式转换完成"
+    event_stage_end fq2fa ok "bytes=$(event_file_bytes "${WORK_NAME}.fa")"
     echo ""
     
     # 步骤3: Trim序列
     print_info "步骤3: 使用指定标记trim序列"
+    event_stage_start trim 3 "Trim序列"
     
     local TRIM_SCRIPT="/home/sunyuhong/software/NGS_Tool_syh/Nanobody/trim.py"
     if [ ! -f "$TRIM_SCRIPT" ]; then
@@ -170,18 +182,41 @@ main_pipeline() {
         error_exit "trim后的文件未生成: ${WORK_NAME}_trim.fa"
     fi
     print_success "序列trim完成"
+    event_stage_end trim ok
     echo ""
     
     # 步骤4: 解析序列并生成结果
     print_info "步骤4: 解析trim后的序列并生成结果表格"
+    event_stage_start parse 4 "解析序列"
     
     local PARSE_SCRIPT="/home/sunyuhong/software/NGS_Tool_syh/Nanobody/parse.py"
     if [ ! -f "$PARSE_SCRIPT" ]; then
         error_exit "未找到parse脚本: $PARSE_SCRIPT"
     fi
     
-    print_info "执行: python $PARSE_SCRIPT ${WORK_NAME}_trim.fa ${WORK_NAME}_result.csv"
-    python "$PARSE_SCRIPT" "${WORK_NAME}_trim.fa" "${WORK_NAME}_result.csv" || error_exit "解析序列失败"
+    # 近似 Top-K（NGS_APPROX_TOP，0 为不运行）在后台与精确统计同时进行，app 在精确结果生成前显示其快照
+    local APPROX_TOP="${NGS_APPROX_TOP:-2000}"
+    local APPROX_PID=""
+    if [ "$APPROX_TOP" -gt 0 ] 2>/dev/null; then
+        print_info "后台执行: python $PARSE_SCRIPT ${WORK_NAME}_trim.fa ${WORK_NAME}_result.csv --approx-top $APPROX_TOP"
+        python "$PARSE_SCRIPT" "${WORK_NAME}_trim.fa" "${WORK_NAME}_result.csv" --approx-top "$APPROX_TOP" \
+            > "${WORK_NAME}_approx.log" 2>&1 &
+        APPROX_PID=$!
+    fi
+    
+    # 统计进程数（NGS_PARSE_WORKERS，默认单进程）
+    local PARSE_WORKERS="${NGS_PARSE_WORKERS:-1}"
+    print_info "执行: python $PARSE_SCRIPT ${WORK_NAME}_trim.fa ${WORK_NAME}_result.csv --workers $PARSE_WORKERS"
+    if ! python "$PARSE_SCRIPT" "${WORK_NAME}_trim.fa" "${WORK_NAME}_result.csv" --workers "$PARSE_WORKERS"; then
+        [ -n "$APPROX_PID" ] && kill "$APPROX_PID" 2>/dev/null
+        error_exit "解析序列失败"
+    fi
+    # 精确结果已生成，近似快照不再显示：终止仍在运行的后台统计，wait 仅用于回收进程
+    if [ -n "$APPROX_PID" ]; then
+        kill "$APPROX_PID" 2>/dev/null
+        wait "$APPROX_PID" 2>/dev/null
+        rm -f "${WORK_NAME}_result_approx.csv.tmp" "${WORK_NAME}_result_approx.json.tmp"
+    fi
     
     if [ ! -f "${WORK_NAME}_result.csv" ]; then
         error_exit "结果文件未生成: ${WORK_NAME}_result.csv"
@@ -189,6 +224,7 @@ main_pipeline() {
     
     local result_size=$(du -h "${WORK_NAME}_result.csv" | cut -f1)
     print_success "结果分析完成: ${WORK_NAME}_result.csv (大小: $result_size)"
+    event_stage_end parse ok
     echo ""
     
     # 清理临时文件
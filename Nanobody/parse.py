@@ -3,15 +3,36 @@
 """
 FASTA序列统计工具
 统计FASTA文件中不同序列的数量，并生成包含序列、条数和百分比的表格
+
+序列边读边统计，不保存读段列表，内存只与不同序列的数量有关。仅含 ACGT 的序列以 2-bit 压缩的
+bytes 作为计数键（每字节4个碱基），含 N 等其他字符的序列原样保存（见 encode_sequence）。
+
+除文本表格外，默认另写一份列式二进制表（与输出同名，扩展名不同），供 app 快速、按列加载:
+    .feather  Arrow IPC（未压缩，可内存映射），需要 pyarrow
+    .npz      无 pyarrow 时的回退：序列拼接为一个字节数组并记录偏移，条数与百分比为数值数组
 """
+import os
 import sys
 import argparse
 import gzip
+import heapq
+import json
+import math
+import multiprocessing
+import pickle
+import resource
+import tempfile
 import time
-from collections import defaultdict
-from typing import Dict, List, Tuple
+import zlib
+from collections import Counter, defaultdict
+from itertools import islice
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import csv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_events import EventWriter, file_size
+
 def detect_file_type(filename: str) -> str:
     """检测文件类型"""
     if filename.endswith('.gz'):
@@ -29,19 +50,107 @@ def detect_file_type(filename: str) -> str:
         else:
             return 'fasta'  # 默认按FASTA处理
 
-def read_fasta_sequences(filepath: str) -> Tuple[List[str], int]:
+# 多进程统计：每个工作进程分到的段数、每段最小字节数、读取块大小、首次出现位置中段内序号的位数
+CHUNKS_PER_WORKER = 4
+MIN_CHUNK_BYTES = 1 << 20
+READ_BLOCK = 8 << 20
+ORDER_BITS = 40
+
+# 外部排序统计：估算内存时每个计数表条目/排序记录在键长之外的开销（字节），溢写时每次序列化的记录数，
+# 一次归并打开的最多临时文件数
+ENTRY_BYTES = 120
+RECORD_BYTES = 160
+SPILL_BATCH = 2048
+MAX_MERGE_FANIN = 64
+COUNT_MASK = (1 << 40) - 1
+
+# 近似 Top-K：SpaceSaving 计数器数 = K * APPROX_CAPACITY_FACTOR；Count-Min 宽度 2^APPROX_CM_WIDTH_BITS、
+# 深度 APPROX_CM_DEPTH；每批聚合的读段数；快照写出间隔（秒）
+APPROX_CAPACITY_FACTOR = 10
+APPROX_CM_WIDTH_BITS = 18
+APPROX_CM_DEPTH = 4
+APPROX_BATCH = 65536
+APPROX_SNAPSHOT_SECONDS = 5
+# Count-Min 各行的乘法哈希系数（奇数）
+APPROX_CM_MULTIPLIERS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93,
+                         0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53, 0x94D049BB133111EB, 0xBF58476D1CE4E5B9)
+
+# 列式表每批写入的行数
+COLUMNAR_BATCH_ROWS = 1 << 20
+
+# 2-bit 编码：A/C/G/T -> 四进制数字 0/1/2/3
+BASE_TO_DIGIT = str.maketrans('ACGT', '0123')
+BYTE_TO_BASES = [''.join('ACGT'[(b >> shift) & 3] for shift in (6, 4, 2, 0)) for b in range(256)]
+# 键的首字节：0-3 为压缩键最前面补齐的碱基数，RAW_KEY 表示其后为原始 ASCII 序列
+RAW_KEY = b'\xff'
+
+def encode_sequence(seq: str) -> bytes:
+    """
+    将序列编码为计数键
+    
+    仅含 ACGT 时按四进制解析为整数再转成字节（长度不是4的倍数时在最前面补 A），
+    首字节记录补齐的碱基数；否则为 RAW_KEY + 原始序列。两种键互不重叠，解码结果与原序列一致。
+    """
+    n_bytes = (len(seq) + 3) // 4
+    try:
+        # 序列只含字母，ACGT 以外的字符会使四进制解析失败
+        value = int(seq.translate(BASE_TO_DIGIT), 4)
+    except ValueError:
+        return RAW_KEY + seq.encode('ascii', 'replace')
+    return bytes((n_bytes * 4 - len(seq),)) + value.to_bytes(n_bytes, 'big')
+
+def decode_sequence(key: bytes) -> str:
+    """encode_sequence 的逆运算"""
+    if key[:1] == RAW_KEY:
+        return key[1:].decode('ascii')
+    return ''.join([BYTE_TO_BASES[b] for b in key[1:]])[key[0]:]
+
+def sequences_from_lines(lines: Iterable[str], progress=None) -> Iterator[str]:
     """
-    高效读取FASTA文件中的所有序列
+    从FASTA文本行中逐条解析序列（生成器，不保存已读序列）
     
     参数:
-        filepath: FASTA文件路径
+        lines: 文本行迭代器
+        progress: 可选回调，每 4096 条序列以已解析条数调用一次
     返回:
-        (序列列表, 序列总数)
+        依次产生每条序列（已去除非字母字符并转为大写）
     """
-    sequences = []
     current_sequence = []
     total_sequences = 0
     
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+            
+        if line.startswith('>'):
+            # 输出上一条序列
+            if current_sequence:
+                yield ''.join(current_sequence)
+                total_sequences += 1
+                current_sequence = []
+                if progress is not None and total_sequences & 0xfff == 0:
+                    progress(total_sequences)
+        else:
+            # 移除序列中的空白字符和数字（可选，根据需求调整）
+            seq_line = line if line.isalpha() else ''.join(c for c in line if c.isalpha())
+            if seq_line:  # 只添加非空的行
+                current_sequence.append(seq_line.upper())  # 统一转为大写
+    
+    # 输出最后一条序列
+    if current_sequence:
+        yield ''.join(current_sequence)
+
+def iter_fasta_sequences(filepath: str, stage=None) -> Iterator[str]:
+    """
+    逐条读取FASTA文件中的序列（生成器，不保存已读序列）
+    
+    参数:
+        filepath: FASTA文件路径
+        stage: 可选的 pipeline_events.StageProgress，按已读字节上报读取进度
+    返回:
+        依次产生每条序列（已去除非字母字符并转为大写）
+    """
     # 检测文件类型并选择合适的打开方式
     file_type = detect_file_type(filepath)
     
@@ -53,29 +162,580 @@ def read_fasta_sequences(filepath: str) -> Tuple[List[str], int]:
         mode = 'r'
     
     with open_func(filepath, mode) as f:
-        for line in f:
-            line = line.strip()
-            if not line:
+        raw = f.buffer.fileobj if file_type == 'gzip' else f.buffer
+        progress = None
+        if stage is not None:
+            progress = lambda n: stage.progress(n, raw.tell())
+        yield from sequences_from_lines(f, progress)
+
+def read_fasta_sequences(filepath: str, stage=None) -> Tuple[List[str], int]:
+    """
+    读取FASTA文件中的所有序列（保存全部读段，仅适合小文件；统计请用 count_sequences_stream）
+    
+    参数:
+        filepath: FASTA文件路径
+        stage: 可选的 pipeline_events.StageProgress，按已读字节上报读取进度
+    返回:
+        (序列列表, 序列总数)
+    """
+    sequences = list(iter_fasta_sequences(filepath, stage))
+    return sequences, len(sequences)
+
+def count_sequences_stream(sequences: Iterable[str]) -> Tuple[Dict[bytes, int], int]:
+    """
+    边读边统计序列出现的次数
+    
+    参数:
+        sequences: 序列迭代器（如 iter_fasta_sequences）
+    返回:
+        (编码键到计数的字典, 序列总数)，键由 encode_sequence 生成
+    """
+    sequence_counts = defaultdict(int)
+    total_sequences = 0
+    encode = encode_sequence
+    
+    for seq in sequences:
+        sequence_counts[encode(seq)] += 1
+        total_sequences += 1
+    
+    return sequence_counts, total_sequences
+
+def find_chunk_boundaries(filepath: str, n_chunks: int) -> List[int]:
+    """
+    将未压缩的FASTA文件按字节切分为约 n_chunks 段，每个切分点都位于以 '>' 开头的行首
+    
+    返回:
+        切分点列表，首项为 0、末项为文件大小；第 i 段为 [bounds[i], bounds[i+1])
+    """
+    size = os.path.getsize(filepath)
+    bounds = [0]
+    with open(filepath, 'rb') as f:
+        for i in range(1, n_chunks):
+            target = size * i // n_chunks
+            if target <= bounds[-1]:
                 continue
-                
-            if line.startswith('>'):
-                # 保存上一条序列
-                if current_sequence:
-                    sequences.append(''.join(current_sequence))
-                    total_sequences += 1
-                    current_sequence = []
+            # 跳过 target 所在的（可能不完整的）行，再找下一条记录的开头
+            f.seek(target)
+            f.readline()
+            while True:
+                pos = f.tell()
+                line = f.readline()
+                if not line or line.startswith(b'>'):
+                    break
+            if bounds[-1] < pos < size:
+                bounds.append(pos)
+    bounds.append(size)
+    return bounds
+
+def iter_range_lines(filepath: str, start: int, end: int) -> Iterator[str]:
+    """按块读取文件 [start, end) 字节范围内的文本行（范围两端须位于行首）"""
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        tail = b''
+        while remaining > 0:
+            block = f.read(min(READ_BLOCK, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            block = tail + block
+            cut = block.rfind(b'\n') + 1
+            tail = block[cut:]
+            yield from block[:cut].decode('utf-8', 'replace').splitlines()
+        if tail:
+            yield tail.decode('utf-8', 'replace')
+
+def _count_chunk(args) -> Tuple[int, int, int, List[str]]:
+    """
+    工作进程：统计一段字节范围，并按键的 CRC32 把结果分到 n_shards 个分片文件
+    
+    每个键带上首次出现的位置（段号 << ORDER_BITS | 段内序号），合并后据此还原串行统计中
+    条数相同的序列的先后顺序。返回 (段号, 序列数, 字节数, 各分片文件路径)。
+    """
+    filepath, index, start, end, n_shards, tmp_dir = args
+    sequence_counts, total = count_sequences_stream(sequences_from_lines(iter_range_lines(filepath, start, end)))
+    shards = [[] for _ in range(n_shards)]
+    base = index << ORDER_BITS
+    for rank, (key, count) in enumerate(sequence_counts.items()):
+        shards[zlib.crc32(key) % n_shards].append((key, count, base + rank))
+    del sequence_counts
+    paths = []
+    for shard_no, shard in enumerate(shards):
+        path = os.path.join(tmp_dir, f'chunk{index:05d}_shard{shard_no:03d}.pkl')
+        with open(path, 'wb') as f:
+            pickle.dump(shard, f, protocol=pickle.HIGHEST_PROTOCOL)
+        paths.append(path)
+    return index, total, end - start, paths
+
+def _merge_shard(paths: List[str]) -> List[Tuple[bytes, int, int]]:
+    """
+    工作进程：合并同一分片在各段中的计数（paths 按段号排列）
+    
+    返回按 (条数降序, 首次出现位置) 排序的 (键, 条数, 首次出现位置) 列表
+    """
+    merged = {}
+    for path in paths:
+        with open(path, 'rb') as f:
+            shard = pickle.load(f)
+        os.remove(path)
+        for key, count, order in shard:
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [count, order]
             else:
-                # 移除序列中的空白字符和数字（可选，根据需求调整）
-                seq_line = ''.join(c for c in line if c.isalpha())
-                if seq_line:  # 只添加非空的行
-                    current_sequence.append(seq_line.upper())  # 统一转为大写
+                # 段按顺序合并，首次出现位置保持最早的一段
+                entry[0] += count
+    return sorted(((key, count, order) for key, (count, order) in merged.items()),
+                  key=lambda x: (-x[1], x[2]))
+
+def count_sequences_parallel(filepath: str, workers: int, stage=None,
+                             tmp_dir: Optional[str] = None) -> Tuple[Dict[bytes, int], int, Dict]:
+    """
+    多进程统计未压缩FASTA文件
     
-    # 添加最后一条序列
-    if current_sequence:
-        sequences.append(''.join(current_sequence))
-        total_sequences += 1
+    文件按记录边界切成约 workers * CHUNKS_PER_WORKER 段（每段不小于 MIN_CHUNK_BYTES）并行计数，
+    各段结果按键哈希分成 workers 个分片，再并行合并每个分片。
+    
+    参数:
+        filepath: FASTA文件路径
+        workers: 工作进程数
+        stage: 可选的 pipeline_events.StageProgress，每完成一段上报一次进度
+        tmp_dir: 分片临时文件的父目录（默认系统临时目录）
+    返回:
+        (编码键到计数的字典, 序列总数, 各阶段耗时)。字典按条数降序、条数相同时按首次出现顺序排列，
+        经 calculate_statistics 得到的结果与串行统计完全一致。
+    """
+    size = os.path.getsize(filepath)
+    n_chunks = max(1, min(workers * CHUNKS_PER_WORKER, size // MIN_CHUNK_BYTES))
+    bounds = find_chunk_boundaries(filepath, n_chunks)
+    timings = {'chunks': len(bounds) - 1}
+    
+    with tempfile.TemporaryDirectory(prefix='parse_shards_', dir=tmp_dir) as shard_dir, \
+            multiprocessing.Pool(workers) as pool:
+        count_start = time.time()
+        tasks = [(filepath, i, bounds[i], bounds[i + 1], workers, shard_dir) for i in range(len(bounds) - 1)]
+        shard_paths = [[None] * len(tasks) for _ in range(workers)]
+        total_sequences = done_bytes = 0
+        for index, total, n_bytes, paths in pool.imap_unordered(_count_chunk, tasks):
+            total_sequences += total
+            done_bytes += n_bytes
+            for shard_no, path in enumerate(paths):
+                shard_paths[shard_no][index] = path
+            if stage is not None:
+                stage.progress(total_sequences, done_bytes)
+        timings['count_time'] = time.time() - count_start
+        
+        merge_start = time.time()
+        shards = pool.map(_merge_shard, shard_paths)
+        timings['merge_time'] = time.time() - merge_start
+    
+    # 各分片已排序，归并后即为串行统计中 calculate_statistics 的排序
+    sequence_counts = {key: count for key, count, _ in heapq.merge(*shards, key=lambda x: (-x[1], x[2]))}
+    return sequence_counts, total_sequences, timings
+
+def measure_scaling(input_file: str, worker_counts: List[int]) -> List[Dict]:
+    """
+    对每个工作进程数各统计一次，返回耗时、加速比与并行效率，并检查结果与串行统计一致
+    
+    加速比与效率以串行统计（workers=1）为基准：效率 = 加速比 / 工作进程数。
+    """
+    rows = []
+    reference = baseline = None
+    for workers in [1] + [w for w in worker_counts if w != 1]:
+        start = time.time()
+        if workers == 1:
+            sequence_counts, total = count_sequences_stream(iter_fasta_sequences(input_file))
+        else:
+            sequence_counts, total, _ = count_sequences_parallel(input_file, workers)
+        stats = calculate_statistics(sequence_counts, total)
+        elapsed = time.time() - start
+        if reference is None:
+            reference, baseline = stats, elapsed
+        speedup = baseline / elapsed if elapsed > 0 else 0
+        rows.append({'workers': workers, 'time': elapsed, 'speedup': speedup,
+                     'efficiency': speedup / workers, 'identical': stats == reference})
+    return rows
+
+def _write_run(path: str, records: Iterable[Tuple[bytes, int, int]]) -> int:
+    """把 (键, 条数, 首次出现位置) 记录分批 pickle 后写入 gzip 临时文件，返回压缩后的字节数"""
+    records = iter(records)
+    with gzip.open(path, 'wb', compresslevel=1) as f:
+        while True:
+            batch = list(islice(records, SPILL_BATCH))
+            if not batch:
+                break
+            pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return os.path.getsize(path)
+
+def _read_run(path: str) -> Iterator[Tuple[bytes, int, int]]:
+    """按写入顺序逐条读取 _write_run 写出的记录"""
+    with gzip.open(path, 'rb') as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+def _sum_by_key(records: Iterable[Tuple[bytes, int, int]]) -> Iterator[Tuple[bytes, int, int]]:
+    """合并按键排序的记录流中相同键的条数，首次出现位置取最早的"""
+    current = None
+    for key, count, order in records:
+        if current is not None and current[0] == key:
+            current[1] += count
+            if order < current[2]:
+                current[2] = order
+        else:
+            if current is not None:
+                yield tuple(current)
+            current = [key, count, order]
+    if current is not None:
+        yield tuple(current)
+
+def _stats_order(record: Tuple[bytes, int, int]) -> Tuple[int, int]:
+    """calculate_statistics 的排序：条数降序，条数相同时按首次出现顺序"""
+    return -record[1], record[2]
+
+class ExternalCounter:
+    """
+    内存预算有限时的外部排序统计
+    
+    计数表的估算大小达到预算时，按键排序后溢写为一个压缩的临时文件（一段），清空后继续计数。
+    统计结束后多路归并各段、累加相同键的条数，再以预算为单位按 (条数降序, 首次出现位置) 排序溢写，
+    最后多路归并得到与 calculate_statistics 顺序一致的结果。段数超过 MAX_MERGE_FANIN 时分多轮归并。
     
-    return sequences, total_sequences
+    计数表的值为 (段内序号 << 40) | 条数，条数直接累加，溢写时还原出首次出现位置
+    （段号 << ORDER_BITS | 段内序号）。从未溢写时等同于 count_sequences_stream。
+    """
+    
+    def __init__(self, budget_bytes: int, tmp_dir: Optional[str] = None):
+        self.budget = budget_bytes
+        self._tmp = tempfile.TemporaryDirectory(prefix='parse_spill_', dir=tmp_dir)
+        self.runs = []
+        self.n_files = 0
+        self.spill_bytes = 0
+        self.peak_estimate = 0
+        self.unique = 0
+        self.raw_keys = 0
+    
+    def _new_path(self) -> str:
+        self.n_files += 1
+        return os.path.join(self._tmp.name, f'run{self.n_files:05d}.pkl.gz')
+    
+    def _spill(self, sequence_counts: Dict[bytes, int]) -> None:
+        base = len(self.runs) << ORDER_BITS
+        path = self._new_path()
+        self.spill_bytes += _write_run(path, ((key, value & COUNT_MASK, base | (value >> 40))
+                                              for key in sorted(sequence_counts)
+                                              for value in (sequence_counts[key],)))
+        self.runs.append(path)
+    
+    def count(self, sequences: Iterable[str]) -> Tuple[Optional[Dict[bytes, int]], int]:
+        """
+        统计序列
+        
+        返回:
+            (计数字典, 序列总数)；发生过溢写时计数字典为 None，结果由 statistics() 读取
+        """
+        sequence_counts = {}
+        total_sequences = 0
+        estimate = 0
+        encode = encode_sequence
+        
+        for seq in sequences:
+            key = encode(seq)
+            total_sequences += 1
+            value = sequence_counts.get(key)
+            if value is not None:
+                sequence_counts[key] = value + 1
+                continue
+            sequence_counts[key] = (len(sequence_counts) << 40) | 1
+            estimate += len(key) + ENTRY_BYTES
+            if estimate >= self.budget:
+                self.peak_estimate = max(self.peak_estimate, estimate)
+                self._spill(sequence_counts)
+                sequence_counts = {}
+                estimate = 0
+        
+        self.peak_estimate = max(self.peak_estimate, estimate)
+        if not self.runs:
+            for key in sequence_counts:
+                sequence_counts[key] &= COUNT_MASK
+            self.unique = len(sequence_counts)
+            return sequence_counts, total_sequences
+        if sequence_counts:
+            self._spill(sequence_counts)
+        return None, total_sequences
+    
+    def _merge(self, paths: List[str], key, combine=None) -> Iterator[Tuple[bytes, int, int]]:
+        """多路归并已排序的段；段数过多时先分批归并成新的段"""
+        paths = list(paths)
+        while len(paths) > MAX_MERGE_FANIN:
+            group, paths = paths[:MAX_MERGE_FANIN], paths[MAX_MERGE_FANIN:]
+            merged = heapq.merge(*(_read_run(p) for p in group), key=key)
+            path = self._new_path()
+            _write_run(path, combine(merged) if combine else merged)
+            for p in group:
+                os.remove(p)
+            paths.append(path)
+        merged = heapq.merge(*(_read_run(p) for p in paths), key=key)
+        return combine(merged) if combine else merged
+    
+    def statistics(self, total_sequences: int) -> 'SpilledStatistics':
+        """归并各段并按统计顺序重新排序，返回可重复迭代的统计结果"""
+        sorted_runs = []
+        buffer = []
+        estimate = 0
+        
+        def flush():
+            buffer.sort(key=_stats_order)
+            path = self._new_path()
+            self.spill_bytes += _write_run(path, buffer)
+            sorted_runs.append(path)
+            buffer.clear()
+        
+        for record in self._merge(self.runs, itemgetter(0), _sum_by_key):
+            self.unique += 1
+            if record[0][:1] == RAW_KEY:
+                self.raw_keys += 1
+            buffer.append(record)
+            estimate += len(record[0]) + RECORD_BYTES
+            if estimate >= self.budget:
+                flush()
+                estimate = 0
+        if buffer:
+            flush()
+        # 多轮归并时部分段已被删除
+        for path in self.runs:
+            if os.path.exists(path):
+                os.remove(path)
+        self.runs = []
+        return SpilledStatistics(self, sorted_runs, total_sequences)
+    
+    def close(self) -> None:
+        self._tmp.cleanup()
+
+class SpilledStatistics:
+    """外部排序后的统计结果：每次迭代都从临时文件归并出 (序列, 条数, 百分比)"""
+    
+    def __init__(self, counter: ExternalCounter, paths: List[str], total_sequences: int):
+        if len(paths) > MAX_MERGE_FANIN:
+            merged = counter._merge(paths, _stats_order)
+            path = counter._new_path()
+            _write_run(path, merged)
+            paths = [path]
+        self.paths = paths
+        self.total_sequences = total_sequences
+        self.unique = counter.unique
+    
+    def __len__(self) -> int:
+        return self.unique
+    
+    def __iter__(self) -> Iterator[Tuple[str, int, float]]:
+        total = self.total_sequences
+        for key, count, _ in heapq.merge(*(_read_run(p) for p in self.paths), key=_stats_order):
+            yield decode_sequence(key), count, (count / total) * 100 if total > 0 else 0
+
+class SpaceSaving:
+    """
+    SpaceSaving 重频项统计：最多跟踪 capacity 个序列
+    
+    新序列在计数器已满时替换当前计数最小的序列，继承其计数作为误差。
+    对被跟踪的序列，真实条数在 [count - error, count] 之间，error 不超过 总条数 / capacity；
+    未被跟踪的序列真实条数不超过当前最小计数。最小计数用带延迟更新的小顶堆查找。
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self._heap = []
+        self.total = 0
+    
+    def update(self, key: str, weight: int = 1) -> None:
+        self.total += weight
+        counts = self.counts
+        if key in counts:
+            counts[key] += weight
+            return
+        if len(counts) < self.capacity:
+            counts[key] = weight
+            self.errors[key] = 0
+            heapq.heappush(self._heap, (weight, key))
+            return
+        # 堆中的计数可能已过期：与实际计数不一致时更新后重新下沉
+        heap = self._heap
+        while True:
+            count, victim = heap[0]
+            actual = counts[victim]
+            if actual == count:
+                break
+            heapq.heapreplace(heap, (actual, victim))
+        del counts[victim]
+        del self.errors[victim]
+        counts[key] = count + weight
+        self.errors[key] = count
+        heapq.heapreplace(heap, (count + weight, key))
+    
+    def min_count(self) -> int:
+        """未被跟踪的序列条数的上界"""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+    
+    def items(self) -> List[Tuple[str, int, int]]:
+        """(序列, 计数, 误差) 列表，按计数降序"""
+        return sorted(((key, count, self.errors[key]) for key, count in self.counts.items()),
+                      key=lambda x: x[1], reverse=True)
+
+class CountMinSketch:
+    """
+    Count-Min 草图（需要 numpy）：估计值不小于真实条数，且以 1 - e^-depth 的概率不超过
+    真实条数 + e / width * 总条数。每行用乘法移位哈希把 Python hash 映射到列。
+    """
+    
+    def __init__(self, width_bits: int = APPROX_CM_WIDTH_BITS, depth: int = APPROX_CM_DEPTH):
+        import numpy as np
+        self._np = np
+        self.width = 1 << width_bits
+        self.depth = depth
+        self._shift = np.uint64(64 - width_bits)
+        self._multipliers = np.array(APPROX_CM_MULTIPLIERS[:depth], dtype=np.uint64)
+        self.table = np.zeros((depth, self.width), dtype=np.uint32)
+    
+    def _columns(self, keys: List[str]):
+        np = self._np
+        hashes = np.array([hash(key) for key in keys], dtype=np.int64).view(np.uint64)
+        # 每行一个系数，uint64 乘法按 2^64 取模，取高位作为列号
+        return ((hashes[None, :] * self._multipliers[:, None]) >> self._shift).astype(np.intp)
+    
+    def update_batch(self, keys: List[str], weights: List[int]) -> None:
+        np = self._np
+        weights = np.asarray(weights, dtype=np.float64)
+        for row, columns in enumerate(self._columns(keys)):
+            self.table[row] += np.bincount(columns, weights=weights, minlength=self.width).astype(np.uint32)
+    
+    def estimate_batch(self, keys: List[str]) -> List[int]:
+        np = self._np
+        if not keys:
+            return []
+        columns = self._columns(keys)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0).tolist()
+    
+    @property
+    def memory_bytes(self) -> int:
+        return self.table.nbytes
+
+def approx_output_paths(output_file: str) -> Tuple[str, str]:
+    """近似 Top-K 结果表与说明文件的路径：{输出文件名}_approx.csv / _approx.json"""
+    stem = os.path.splitext(output_file)[0]
+    return stem + '_approx.csv', stem + '_approx.json'
+
+class _BytesProgress:
+    """供 iter_fasta_sequences 调用的进度对象，只记录已读字节数"""
+    
+    def __init__(self):
+        self.bytes_read = 0
+    
+    def progress(self, records, bytes_read=None):
+        if bytes_read is not None:
+            self.bytes_read = bytes_read
+
+def _write_approx_snapshot(sketch: SpaceSaving, cms: Optional[CountMinSketch], k: int, output_file: str,
+                           meta: Dict) -> Dict:
+    """按当前状态写出近似 Top-K 表与说明文件（先写临时文件再替换，app 不会读到写了一半的文件）"""
+    total = sketch.total
+    items = sketch.items()
+    uppers = [count for _, count, _ in items]
+    if cms is not None:
+        uppers = [min(count, estimate) for count, estimate in zip(uppers, cms.estimate_batch([key for key, _, _ in items]))]
+    rows = sorted(((key, upper, count - error) for (key, count, error), upper in zip(items, uppers)),
+                  key=lambda x: x[1], reverse=True)
+    top, rest = rows[:k], rows[k:]
+    # 排名 K 之外（或未被跟踪）的序列条数上界；下界不低于它的序列一定在真实 Top-K 中
+    threshold = max([upper for _, upper, _ in rest[:1]] + [sketch.min_count()])
+    
+    csv_path, json_path = approx_output_paths(output_file)
+    with open(csv_path + '.tmp', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Rank', 'Sequence', 'Count', 'Count_min', 'Percentage(%)', 'Guaranteed'])
+        for rank, (key, upper, lower) in enumerate(top, 1):
+            percentage = upper / total * 100 if total > 0 else 0
+            writer.writerow([rank, key, upper, lower, f"{percentage:.4f}", lower >= threshold])
+    os.replace(csv_path + '.tmp', csv_path)
+    
+    meta = dict(meta, total_sequences=total, k=k, capacity=sketch.capacity,
+                max_error=total // sketch.capacity, guaranteed=sum(1 for _, _, lower in top if lower >= threshold),
+                updated=time.time())
+    if cms is not None:
+        meta.update(cms_width=cms.width, cms_depth=cms.depth, cms_error=math.e / cms.width * total,
+                    cms_confidence=1 - math.exp(-cms.depth))
+    with open(json_path + '.tmp', 'w') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(json_path + '.tmp', json_path)
+    return meta
+
+def approximate_top_sequences(input_file: str, output_file: str, k: int, verbose: bool = False) -> Dict:
+    """
+    近似统计条数最多的 K 条序列（固定内存，单遍读取）
+    
+    读段按 APPROX_BATCH 条聚合后更新 SpaceSaving（K * APPROX_CAPACITY_FACTOR 个计数器）和
+    Count-Min 草图（未安装 numpy 时只用 SpaceSaving）。每 APPROX_SNAPSHOT_SECONDS 秒写出一次
+    {输出文件名}_approx.csv / .json 快照，app 在精确统计完成前据此显示结果。
+    
+    结果表中 Count 为条数上界（SpaceSaving 计数与 Count-Min 估计的较小者），Count_min 为下界，
+    Guaranteed 表示该序列一定属于真实的 Top-K。
+    
+    返回:
+        说明文件中的汇总信息（另含 total_time、reads_per_sec、peak_rss_mb）
+    """
+    start_time = time.time()
+    sketch = SpaceSaving(k * APPROX_CAPACITY_FACTOR)
+    try:
+        cms = CountMinSketch()
+    except ImportError:
+        print("[WARN] 未安装 numpy，只使用 SpaceSaving 估计")
+        cms = None
+    progress = _BytesProgress()
+    meta = {'input_file': input_file, 'input_bytes': file_size(input_file), 'done': False}
+    last_snapshot = time.time()
+    
+    sequences = iter_fasta_sequences(input_file, progress)
+    while True:
+        batch = Counter(islice(sequences, APPROX_BATCH))
+        if not batch:
+            break
+        if cms is not None:
+            cms.update_batch(list(batch), list(batch.values()))
+        update = sketch.update
+        for key, weight in batch.items():
+            update(key, weight)
+        if time.time() - last_snapshot >= APPROX_SNAPSHOT_SECONDS:
+            _write_approx_snapshot(sketch, cms, k, output_file, dict(meta, bytes_read=progress.bytes_read))
+            last_snapshot = time.time()
+            if verbose:
+                print(f"已处理 {sketch.total:,} 条序列")
+    
+    meta = _write_approx_snapshot(sketch, cms, k, output_file,
+                                  dict(meta, bytes_read=meta['input_bytes'], done=True))
+    total_time = time.time() - start_time
+    meta.update(total_time=total_time,
+                reads_per_sec=sketch.total / total_time if total_time > 0 else 0,
+                memory_mb=(sys.getsizeof(sketch.counts) * 2 + sum(sys.getsizeof(key) for key in sketch.counts)
+                           + (cms.memory_bytes if cms else 0)) / 1024 / 1024,
+                peak_rss_mb=peak_rss_mb())
+    return meta
+
+def counter_memory_bytes(sequence_counts: Dict) -> int:
+    """计数字典本身及其键、值对象占用的内存（字节，近似值）"""
+    size = sys.getsizeof(sequence_counts)
+    for key, count in sequence_counts.items():
+        size += sys.getsizeof(key) + (sys.getsizeof(count) if count > 256 else 0)
+    return size
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB，Linux 的 ru_maxrss 单位为 KB）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
 
 def count_sequences_fast(sequences: List[str]) -> Dict[str, int]:
     """
@@ -93,15 +753,17 @@ def count_sequences_fast(sequences: List[str]) -> Dict[str, int]:
     
     return sequence_counts
 
-def calculate_statistics(sequence_counts: Dict[str, int], total_sequences: int) -> List[Tuple[str, int, float]]:
+def calculate_statistics(sequence_counts: Dict, total_sequences: int,
+                         decode=None) -> List[Tuple[str, int, float]]:
     """
     计算序列统计信息
     
     参数:
         sequence_counts: 序列计数字典
         total_sequences: 总序列数
+        decode: 可选，把字典的键转换为序列（如 decode_sequence）
     返回:
-        包含(序列, 条数, 百分比)的列表，按条数降序排序
+        包含(序列, 条数, 百分比)的列表，按条数降序排序（条数相同时保持首次出现的顺序）
     """
     stats = []
     
@@ -112,22 +774,25 @@ def calculate_statistics(sequence_counts: Dict[str, int], total_sequences: int)
     # 按条数降序排序
     stats.sort(key=lambda x: x[1], reverse=True)
     
+    if decode is not None:
+        stats = [(decode(key), count, percentage) for key, count, percentage in stats]
+    
     return stats
 
-def write_statistics_table(stats: List[Tuple[str, int, float]], output_file: str, 
+def write_statistics_table(stats: Iterable[Tuple[str, int, float]], output_file: str, 
                           format: str = 'csv', min_percentage: float = 0.0) -> None:
     """
     将统计结果写入表格文件
     
     参数:
-        stats: 统计信息列表
+        stats: 统计信息列表（或按相同顺序产生记录的可迭代对象，逐条写出）
         output_file: 输出文件路径
         format: 输出格式 ('csv', 'tsv', 'txt')
         min_percentage: 最小百分比阈值，低于此值的序列将被过滤
     """
     # 过滤低于阈值的序列
     if min_percentage > 0:
-        stats = [(seq, count, perc) for seq, count, perc in stats if perc >= min_percentage]
+        stats = ((seq, count, perc) for seq, count, perc in stats if perc >= min_percentage)
     
     if format == 'csv':
         delimiter = ','
@@ -151,8 +816,74 @@ def write_statistics_table(stats: List[Tuple[str, int, float]], output_file: str
         for seq, count, percentage in stats:
             writer.writerow([seq, count, f"{percentage:.4f}"])
 
+def columnar_output_path(output_file: str, kind: str) -> str:
+    """列式表的路径：输出文件去掉扩展名后加 .feather / .npz"""
+    return os.path.splitext(output_file)[0] + '.' + kind
+
+def write_columnar_table(stats: Iterable[Tuple[str, int, float]], output_file: str,
+                         kind: str = 'auto', min_percentage: float = 0.0) -> Optional[str]:
+    """
+    将统计结果另存为列式二进制表
+    
+    参数:
+        stats: 统计信息列表（按条数降序），也可以是可迭代对象；feather 按 COLUMNAR_BATCH_ROWS 行分批写出
+        output_file: 文本表格的输出路径，列式表与其同名
+        kind: 'feather'、'npz'，或 'auto'（有 pyarrow 时 feather，否则 npz）
+        min_percentage: 与文本表格相同的过滤阈值
+    返回:
+        写出的文件路径；所需依赖都不可用时返回 None
+    """
+    if min_percentage > 0:
+        stats = ((seq, count, perc) for seq, count, perc in stats if perc >= min_percentage)
+    stats = iter(stats)
+    
+    if kind in ('auto', 'feather'):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            if kind == 'feather':
+                raise
+        else:
+            path = columnar_output_path(output_file, 'feather')
+            schema = pa.schema([('Sequence', pa.string()), ('Count', pa.int64()), ('Percentage(%)', pa.float64())])
+            # Feather v2 即 Arrow IPC 文件格式；不压缩，app 可直接内存映射读取
+            with pa.ipc.new_file(path, schema) as writer:
+                while True:
+                    batch = list(islice(stats, COLUMNAR_BATCH_ROWS))
+                    if not batch:
+                        break
+                    writer.write_table(pa.table({
+                        'Sequence': [seq for seq, _, _ in batch],
+                        'Count': [count for _, count, _ in batch],
+                        'Percentage(%)': [round(perc, 4) for _, _, perc in batch],
+                    }, schema=schema))
+            return path
+    
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    from array import array
+    path = columnar_output_path(output_file, 'npz')
+    seq_data = bytearray()
+    offsets = array('q', [0])
+    counts = array('q')
+    percentages = array('d')
+    for seq, count, perc in stats:
+        seq_data += seq.encode('ascii')
+        offsets.append(len(seq_data))
+        counts.append(count)
+        percentages.append(round(perc, 4))
+    np.savez(path,
+             seq_data=np.frombuffer(bytes(seq_data), dtype=np.uint8),
+             seq_offsets=np.frombuffer(offsets, dtype=np.int64),
+             count=np.frombuffer(counts, dtype=np.int64),
+             percentage=np.frombuffer(percentages, dtype=np.float64))
+    return path
+
 def process_fasta_file(input_file: str, output_file: str, format: str = 'csv', 
-                      min_percentage: float = 0.0, verbose: bool = False) -> Dict:
+                      min_percentage: float = 0.0, verbose: bool = False,
+                      columnar: str = 'auto', workers: int = 1, memory_budget_mb: float = 0) -> Dict:
     """
     处理FASTA文件并生成统计表格
     
@@ -162,6 +893,10 @@ def process_fasta_file(input_file: str, output_file: str, format: str = 'csv',
         format: 输出格式 ('csv', 'tsv', 'txt')
         min_percentage: 最小百分比阈值
         verbose: 是否显示详细处理信息
+        columnar: 列式表格式 ('auto', 'feather', 'npz', 'none')
+        workers: 统计使用的进程数；大于1时按记录边界切分文件并行统计（gzip 输入只能串行）
+        memory_budget_mb: 计数表的内存预算（MB，近似）；大于0时超出预算的部分溢写到临时文件（外部排序），
+                          只支持单进程
     返回:
         包含统计信息的字典
     """
@@ -171,30 +906,67 @@ def process_fasta_file(input_file: str, output_file: str, format: str = 'csv',
         print(f"开始处理文件: {input_file}")
         print("正在读取序列...")
     
-    # 1. 读取序列
+    # 1-2. 边读边统计（设置 NGS_EVENT_FILE 时写出结构化进度事件）
     read_start = time.time()
-    sequences, total_sequences = read_fasta_sequences(input_file)
+    input_bytes = file_size(input_file)
+    stage = EventWriter().stage("parse", total_bytes=input_bytes)
+    parallel_timings = {}
+    # 临时文件放在输出目录，与结果在同一块磁盘上
+    tmp_dir = os.path.dirname(os.path.abspath(output_file))
+    if workers > 1 and memory_budget_mb > 0:
+        print("[WARN] 设置内存预算时只支持单进程统计，忽略 --workers")
+        workers = 1
+    if workers > 1 and detect_file_type(input_file) == 'gzip':
+        print("[WARN] gzip 输入无法按字节切分，改为单进程统计")
+        workers = 1
+    external = None
+    if workers > 1:
+        sequence_counts, total_sequences, parallel_timings = count_sequences_parallel(
+            input_file, workers, stage, tmp_dir)
+    elif memory_budget_mb > 0:
+        external = ExternalCounter(int(memory_budget_mb * 1024 * 1024), tmp_dir)
+        sequence_counts, total_sequences = external.count(iter_fasta_sequences(input_file, stage))
+    else:
+        sequence_counts, total_sequences = count_sequences_stream(iter_fasta_sequences(input_file, stage))
+    stage.progress(total_sequences, stage.total_bytes)
     read_time = time.time() - read_start
     
-    if verbose:
-        print(f"读取完成: 共 {total_sequences} 条序列，耗时 {read_time:.2f} 秒")
-        print("正在统计序列出现次数...")
-    
-    # 2. 统计序列
-    count_start = time.time()
-    sequence_counts = count_sequences_fast(sequences)
-    count_time = time.time() - count_start
+    # 发生溢写时计数表在临时文件中（sequence_counts 为 None）
+    spilled = sequence_counts is None
+    spill_runs = 0
+    if spilled:
+        spill_runs = len(external.runs)
+        counter_mb = external.peak_estimate / 1024 / 1024
+    else:
+        unique_sequences = len(sequence_counts)
+        raw_keys = sum(1 for key in sequence_counts if key[:1] == RAW_KEY)
+        counter_mb = counter_memory_bytes(sequence_counts) / 1024 / 1024
+    count_peak_mb = peak_rss_mb()
     
-    unique_sequences = len(sequence_counts)
+    if verbose and spilled:
+        print(f"读取并统计完成: 共 {total_sequences} 条序列，耗时 {read_time:.2f} 秒")
+        print(f"计数表超出内存预算，已溢写 {spill_runs} 段（{external.spill_bytes / 1024 / 1024:.1f} MB），"
+              f"正在归并排序...")
     
-    if verbose:
-        print(f"统计完成: 共 {unique_sequences} 种不同序列，耗时 {count_time:.2f} 秒")
+    elif verbose:
+        print(f"读取并统计完成: 共 {total_sequences} 条序列，{unique_sequences} 种不同序列，耗时 {read_time:.2f} 秒")
+        if parallel_timings:
+            print(f"并行统计: {workers} 个进程，{parallel_timings['chunks']} 段，"
+                  f"计数 {parallel_timings['count_time']:.2f} 秒，分片合并 {parallel_timings['merge_time']:.2f} 秒")
+        print(f"计数表内存: {counter_mb:.1f} MB（{raw_keys} 种序列含非ACGT字符，未压缩）")
         print("正在计算百分比并排序...")
     
-    # 3. 计算统计信息
+    # 3. 计算统计信息（此时才解码为序列字符串）
     calc_start = time.time()
-    stats = calculate_statistics(sequence_counts, total_sequences)
+    if spilled:
+        stats = external.statistics(total_sequences)
+        unique_sequences = external.unique
+        raw_keys = external.raw_keys
+    else:
+        stats = calculate_statistics(sequence_counts, total_sequences, decode_sequence)
+    del sequence_counts
     calc_time = time.time() - calc_start
+    top = next(iter(stats), None)
     
     if verbose:
         print(f"计算完成: 耗时 {calc_time:.2f} 秒")
@@ -205,21 +977,50 @@ def process_fasta_file(input_file: str, output_file: str, format: str = 'csv',
     write_statistics_table(stats, output_file, format, min_percentage)
     write_time = time.time() - write_start
     
+    # 5. 列式二进制表（供 app 快速加载）
+    columnar_start = time.time()
+    columnar_file = None
+    if columnar != 'none':
+        columnar_file = write_columnar_table(stats, output_file, columnar, min_percentage)
+    columnar_time = time.time() - columnar_start
+    if verbose:
+        if columnar_file:
+            print(f"列式表已写入: {columnar_file}，耗时 {columnar_time:.2f} 秒")
+        elif columnar != 'none':
+            print("未安装 pyarrow/numpy，跳过列式表")
+    
+    if external is not None:
+        external.close()
+    
     total_time = time.time() - start_time
+    stage.end(unique=unique_sequences)
     
     # 汇总统计信息
     summary = {
         'total_sequences': total_sequences,
         'unique_sequences': unique_sequences,
         'duplication_rate': (1 - unique_sequences / total_sequences) * 100 if total_sequences > 0 else 0,
-        'top_sequence': stats[0][0][:50] + "..." if len(stats) > 0 and len(stats[0][0]) > 50 else stats[0][0] if stats else "",
-        'top_count': stats[0][1] if stats else 0,
-        'top_percentage': stats[0][2] if stats else 0,
+        'top_sequence': top[0][:50] + "..." if top and len(top[0]) > 50 else top[0] if top else "",
+        'top_count': top[1] if top else 0,
+        'top_percentage': top[2] if top else 0,
         'read_time': read_time,
-        'count_time': count_time,
         'calc_time': calc_time,
         'write_time': write_time,
-        'total_time': total_time
+        'columnar_file': columnar_file,
+        'columnar_time': columnar_time,
+        'total_time': total_time,
+        'workers': workers,
+        'parallel_timings': parallel_timings,
+        'spill_runs': spill_runs,
+        'spill_mb': external.spill_bytes / 1024 / 1024 if spilled else 0,
+        # 内存与吞吐
+        'input_bytes': input_bytes,
+        'reads_per_sec': total_sequences / read_time if read_time > 0 else 0,
+        'mb_per_sec': (input_bytes or 0) / 1024 / 1024 / read_time if read_time > 0 else 0,
+        'counter_mb': counter_mb,
+        'unpacked_unique': raw_keys,
+        'count_peak_rss_mb': count_peak_mb,
+        'peak_rss_mb': peak_rss_mb()
     }
     
     if verbose:
@@ -276,6 +1077,8 @@ def main():
   python fasta_sequence_stats.py input.fasta output.tsv --format tsv
   python fasta_sequence_stats.py input.fasta.gz output.csv --min_percentage 0.1
   python fasta_sequence_stats.py input.fa output.txt --format txt --verbose
+  python fasta_sequence_stats.py input.fa output.csv --workers 8
+  python fasta_sequence_stats.py input.fa --scaling 1,2,4,8,16  # 并行扩展性测试
   python fasta_sequence_stats.py --test  # 生成测试数据并运行示例
         """
     )
@@ -288,6 +1091,17 @@ def main():
                        help='最小百分比阈值，低于此值的序列将被过滤 (默认: 0.0)')
     parser.add_argument('--verbose', action='store_true',
                        help='显示详细处理信息')
+    parser.add_argument('--columnar', choices=['auto', 'feather', 'npz', 'none'], default='auto',
+                       help='另写列式二进制表：feather(需要pyarrow), npz, auto(有pyarrow时feather，否则npz), none(不写) (默认: auto)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='统计使用的进程数，大于1时按记录边界切分文件并行统计，不支持gzip输入 (默认: 1)')
+    parser.add_argument('--memory-budget', type=float, default=0, metavar='MB',
+                       help='计数表的内存预算(MB)，超出时排序后压缩溢写到输出目录下的临时文件，最后多路归并；0为不限制 (默认: 0)')
+    parser.add_argument('--scaling', metavar='N,N,...',
+                       help='只测量统计耗时：依次以这些进程数统计输入文件，报告加速比与并行效率，不写输出文件')
+    parser.add_argument('--approx-top', type=int, default=0, metavar='K',
+                       help='只做近似统计：用 SpaceSaving/Count-Min 在固定内存内估计条数最多的K条序列及误差范围，'
+                            '写出 {输出文件名}_approx.csv 与 _approx.json（运行中定期更新），不写精确结果表')
     parser.add_argument('--test', action='store_true',
                        help='生成测试数据并运行示例')
     
@@ -325,18 +1139,51 @@ def main():
         print(f"结果已保存到: {test_output}")
         return
     
+    # 并行扩展性测试
+    if args.scaling and args.input_file:
+        worker_counts = [int(n) for n in args.scaling.split(',') if n.strip()]
+        print(f"{'进程数':>6} {'耗时(秒)':>10} {'加速比':>8} {'效率':>8}  结果一致")
+        for row in measure_scaling(args.input_file, worker_counts):
+            print(f"{row['workers']:>6} {row['time']:>10.2f} {row['speedup']:>8.2f} {row['efficiency']:>8.1%}  "
+                  f"{'是' if row['identical'] else '否'}")
+        return
+    
     # 正常模式
     if not args.input_file or not args.output_file:
         parser.print_help()
         sys.exit(1)
     
+    # 近似 Top-K 模式
+    if args.approx_top > 0:
+        if not os.path.exists(args.input_file):
+            print(f"错误: 找不到输入文件 '{args.input_file}'", file=sys.stderr)
+            sys.exit(1)
+        meta = approximate_top_sequences(args.input_file, args.output_file, args.approx_top, args.verbose)
+        print("\n" + "="*60)
+        print("近似 Top-K 统计结果摘要")
+        print("="*60)
+        print(f"总序列条数: {meta['total_sequences']:,}")
+        print(f"Top-{meta['k']}: 其中 {meta['guaranteed']} 条确定属于真实 Top-{meta['k']}")
+        print(f"SpaceSaving: {meta['capacity']:,} 个计数器，条数误差不超过 {meta['max_error']:,}")
+        if 'cms_error' in meta:
+            print(f"Count-Min: {meta['cms_depth']} x {meta['cms_width']:,}，"
+                  f"以 {meta['cms_confidence']:.1%} 的概率高估不超过 {meta['cms_error']:,.0f}")
+        print(f"结果表: {approx_output_paths(args.output_file)[0]}")
+        print(f"总处理时间: {meta['total_time']:.2f}秒 ({meta['reads_per_sec']:.0f} 条/秒)")
+        print(f"草图内存: {meta['memory_mb']:.1f} MB，峰值内存: {meta['peak_rss_mb']:.1f} MB")
+        print("="*60)
+        return
+    
     try:
         summary = process_fasta_file(
             args.input_file, 
             args.output_file, 
             args.format, 
             args.min_percentage, 
-            args.verbose
+            args.verbose,
+            args.columnar,
+            args.workers,
+            args.memory_budget
         )
         
         # 输出统计摘要
@@ -352,13 +1199,19 @@ def main():
             print(f"最频繁序列: {summary['top_sequence']}")
             print(f"  出现次数: {summary['top_count']:,}")
             print(f"  占比: {summary['top_percentage']:.4f}%")
-        print(f"读取时间: {summary['read_time']:.2f}秒")
-        print(f"统计时间: {summary['count_time']:.2f}秒")
+        print(f"读取与统计时间: {summary['read_time']:.2f}秒 "
+              f"({summary['reads_per_sec']:.0f} 条/秒, {summary['mb_per_sec']:.1f} MB/秒)")
         print(f"计算时间: {summary['calc_time']:.2f}秒")
         print(f"写入时间: {summary['write_time']:.2f}秒")
+        if summary['columnar_file']:
+            print(f"列式表: {summary['columnar_file']} ({summary['columnar_time']:.2f}秒)")
         print(f"总处理时间: {summary['total_time']:.2f}秒")
         print(f"处理速度: {summary['total_sequences']/summary['total_time']:.0f} 条/秒" 
               if summary['total_time'] > 0 else "处理速度: N/A")
+        if summary['spill_runs']:
+            print(f"外部排序: 溢写 {summary['spill_runs']} 段，临时文件共 {summary['spill_mb']:.1f} MB")
+        print(f"计数表内存: {summary['counter_mb']:.1f} MB，"
+              f"统计结束时峰值内存: {summary['count_peak_rss_mb']:.1f} MB，总峰值内存: {summary['peak_rss_mb']:.1f} MB")
         print("="*60)
         
     except FileNotFoundError:
@@ -1,17 +1,22 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import os
 import sys
 import argparse
 from typing import Iterator, Tuple, Optional
 import gzip
 import time
 
-def fasta_reader(filepath: str) -> Iterator[Tuple[str, str]]:
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_events import EventWriter, file_size
+
+def fasta_reader(filepath: str, position: Optional[list] = None) -> Iterator[Tuple[str, str]]:
     """
     高效读取FASTA文件的生成器函数，支持普通文本和gzip压缩格式
     
     参数:
         filepath: FASTA文件路径（支持.txt, .fasta, .fa, .gz格式）
+        position: 可选的单元素列表，产生每条记录时写入已读取的原始文件字节数（gzip为压缩字节），用于进度上报
     返回:
         生成器，每次产生(header, sequence)元组
     """
@@ -19,6 +24,7 @@ def fasta_reader(filepath: str) -> Iterator[Tuple[str, str]]:
     mode = 'rt' if filepath.endswith('.gz') else 'r'
     
     with open_func(filepath, mode) as f:
+        raw = f.buffer.fileobj if filepath.endswith('.gz') else f.buffer
         header = ''
         sequence_lines = []
         
@@ -29,6 +35,8 @@ def fasta_reader(filepath: str) -> Iterator[Tuple[str, str]]:
                 
             if line.startswith('>'):
                 if header:
+                    if position is not None:
+                        position[0] = raw.tell()
                     yield header, ''.join(sequence_lines)
                 header = line
                 sequence_lines = []
@@ -100,10 +108,15 @@ def process_fasta(input_file: str, output_file: str,
     start_time = time.time()
     total_sequences = 0
     extracted_fragments = 0
+    # 结构化进度事件（由 pipeline 设置 NGS_EVENT_FILE 时写出），按已读字节估算阶段进度
+    stage = EventWriter().stage("trim", total_bytes=file_size(input_file))
+    position = [0]
     
     with open(output_file, 'w') as fout:
-        for header, sequence in fasta_reader(input_file):
+        for header, sequence in fasta_reader(input_file, position):
             total_sequences += 1
+            if total_sequences & 0xfff == 0:
+                stage.progress(total_sequences, position[0])
             
             fragment = extract_fragment(sequence, start_marker, end_marker, allow_overlap)
             
@@ -129,6 +142,8 @@ def process_fasta(input_file: str, output_file: str,
     
     end_time = time.time()
     processing_time = end_time - start_time
+    stage.progress(total_sequences, stage.total_bytes)
+    stage.end(extracted=extracted_fragments)
     
     return total_sequences, extracted_fragments, processing_time
 
@@ -1,87 +1,13 @@
-import pysam
-import matplotlib.pyplot as plt
-import numpy as np
 import os
+import sys
 from datetime import datetime
 import argparse
 
-def get_counts(samfile, chrom, start, end, bin_size):
-    """计算指定区间内每个bin的符合条件的reads数"""
-    bins = range(start, end, bin_size)
-    counts = []
-    
-    for b_start in bins:
-        b_end = b_start + bin_size
-        bin_count = 0
-        # fetch 利用索引快速定位
-        try:
-            for read in samfile.fetch(chrom, b_start, b_end):
-                if read.is_unmapped or read.is_secondary:
-                    continue
-                
-                # 计算 read 在当前 bin 内的覆盖长度
-                overlap = read.get_overlap(b_start, b_end)
-                read_len = read.query_length if read.query_length > 0 else 1
-                
-                # 核心算法：重叠部分 > 50%
-                if (overlap / read_len) > 0.5:
-                    bin_count += 1
-        except ValueError:
-            # 如果染色体名称在BAM里找不到，跳过
-            bin_count = 0
-            
-        counts.append(bin_count)
-    return list(bins), counts
-
-def plot_data(bins, counts, chrom, bin_size, title, filename, target_pos=None):
-    """绘图并保存
-
-    使用细竖线表示每个 bin（按光谱配色）。如果提供 `target_pos`，会在该位置画一条竖直虚线并标注原始坐标值。
-    """
-    import matplotlib.cm as cm
-    from matplotlib.colors import Normalize
-
-    plt.figure(figsize=(12, 5))
-    # 使用 bin 中心作为每个竖线的位置，单位 Mb
-    x_centers = (np.array(bins) + bin_size / 2.0) / 1e6
-
-    counts_arr = np.array(counts)
-
-    # 颜色映射：基于丰度（counts）映射颜色，低值偏蓝，高值偏红
-    cmap = cm.get_cmap('RdYlBu_r')
-    max_count = counts_arr.max() if counts_arr.size else 1
-    norm = Normalize(vmin=0, vmax=max(max_count, 1))
-
-    # 画细竖线（linewidth 很小，看起来像细柱），颜色由高度决定
-    for x, h in zip(x_centers, counts_arr):
-        if h > 0:
-            c = cmap(norm(h))
-            plt.vlines(x, 0, h, color=c, linewidth=0.9)
-        else:
-            # 对于 0 值使用浅灰色做占位
-            plt.vlines(x, 0, 0, color=(0.9, 0.9, 0.9), linewidth=0.4)
-
-    plt.title(title, fontsize=14)
-    plt.xlabel(f"Chromosome {chrom} Position (Mb)", fontsize=12)
-    plt.ylabel("Read Counts (Filtered)", fontsize=12)
-    plt.grid(axis='y', linestyle='--', alpha=0.3)
-
-    # 如果给定目标位置，则绘制垂直虚线并标注原始坐标
-    if target_pos is not None:
-        x_target_mb = target_pos / 1e6
-        # 竖线与标签半透明（alpha=0.6）
-        plt.axvline(x=x_target_mb, color='red', linestyle='--', linewidth=1, alpha=0.6)
-        # 在图顶端标注原始坐标值（不缩放到 Mb，显示整数坐标）
-        ymax = counts_arr.max() if counts_arr.size else 1
-        # 将文字放在竖线稍上方并倾斜90度以与竖线对齐
-        plt.text(x_target_mb, ymax * 0.95, f"{int(target_pos)}", rotation=90,
-                 va='top', ha='right', color=(1.0, 0.0, 0.0, 0.6), fontsize=10,
-                 backgroundcolor=(1.0, 1.0, 1.0, 0.6))
-
-    plt.tight_layout()
-    plt.savefig(filename, dpi=300)
-    print(f"✅ 成功生成图像: {filename}")
-    plt.close()
+# 计数与绘图统一使用 WORF_Seq 下的实现，此脚本只保留交互式入口
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'WORF_Seq'))
+from bam_backends import PysamBackend, get_counts
+from WGSmapping import plot_data
+
 
 def main():
     parser = argparse.ArgumentParser(description='WGSmapping: WGS background and target enrichment plotting')
@@ -110,10 +36,11 @@ def main():
                 print("❌ 错误：文件路径不存在，请重新输入。")
 
     try:
-        samfile = pysam.AlignmentFile(bam_path, "rb")
+        reader = PysamBackend(bam_path)
     except Exception as e:
         print(f"❌ 无法读取BAM文件: {e}")
         return
+    samfile = reader.samfile
 
     # 输出目录：在 BAM 所在目录下创建 WGSmapping 子目录
     bam_abspath = os.path.abspath(bam_path)
@@ -139,7 +66,7 @@ def main():
     # --- 执行全长分析 ---
     if not args.skip_wgs:
         print(f"\n[1/2] 正在分析 {target_chrom} 全长背景 (长度: {chrom_length/1e6:.2f} Mb)...")
-        wgs_bins, wgs_counts = get_counts(samfile, target_chrom, 0, chrom_length, wgs_bin)
+        wgs_bins, wgs_counts = get_counts(reader, target_chrom, 0, chrom_length, wgs_bin, rule='overlap50')
         wgs_fname = os.path.join(out_dir, f"WGS_Overview_{target_chrom}_{timestamp}.png")
         plot_data(wgs_bins, wgs_counts, target_chrom, wgs_bin,
               f"WGS Background: {target_chrom}", wgs_fname, target_pos=target_pos)
@@ -152,12 +79,12 @@ def main():
     micro_end = min(chrom_length, target_pos + 50000)
 
     print(f"[2/2] 正在分析目标区域 (+/- 50kb 范围)...")
-    m_bins, m_counts = get_counts(samfile, target_chrom, micro_start, micro_end, micro_bin)
+    m_bins, m_counts = get_counts(reader, target_chrom, micro_start, micro_end, micro_bin, rule='overlap50')
     target_fname = os.path.join(out_dir, f"Target_Detail_{target_chrom}_{timestamp}.png")
     plot_data(m_bins, m_counts, target_chrom, micro_bin,
               f"Target Enrichment: {target_chrom}:{target_pos}", target_fname, target_pos=target_pos)
 
-    samfile.close()
+    reader.close()
     print("\n🎉 分析完成！请检查当前目录下的 PNG 图片文件。")
 
 if __name__ == "__main__":
@@ -6,116 +6,340 @@ import sys
 from datetime import datetime
 import argparse
 import re
+from collections import namedtuple
 
-def get_counts(bam_file, chrom, start, end, bin_size):
-    """使用samtools计算指定区间内每个bin的符合条件的reads数"""
-    bins = range(start, end, bin_size)
-    counts = []
-    
-    # 检查samtools是否可用；缺失则视为致命错误，退出以通知上层脚本
-    try:
-        subprocess.run(['samtools', '--version'], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        # 明确报错并抛出异常让调用方处理（或程序退出）
-        raise FileNotFoundError("samtools not found in PATH") from e
-    
-    for b_start in bins:
-        b_end = b_start + bin_size
-        bin_count = 0
-        
-        try:
-            # 使用samtools view获取指定区域的reads
-            cmd = [
-                'samtools', 'view', '-c', 
-                bam_file, 
-                f'{chrom}:{b_start}-{b_end-1}'
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            total_reads = int(result.stdout.strip())
-            
-            # 对于简化的计算，我们使用总reads数
-            # 在实际应用中，更精确的过滤需要额外的samtools命令
-            bin_count = total_reads
-            
-        except subprocess.CalledProcessError as e:
-            # 如果区域不存在或samtools出错，计数为0
-            bin_count = 0
-        except ValueError:
-            bin_count = 0
-            
-        counts.append(bin_count)
-        
-    return list(bins), counts
-
-def plot_data(bins, counts, chrom, bin_size, title, filename, target_pos=None):
+from bam_backends import BACKENDS, COUNT_RULES, count_bins_multi, count_genome, index_stats, open_backend, total_reads
+from bam_slice import find_slice, read_slice_info, slice_covers, write_bam_slice
+from coverage_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_MB, CoverageCache, bam_identity, get_counts_cached
+from coverage_pyramid import BASE_BIN, CoveragePyramid, build_pyramid, open_matching_pyramid, write_pyramid
+from hotspots import DEFAULT_MIN_FOLD, DEFAULT_PVALUE, DEFAULT_Z, HOTSPOT_TESTS, rank_hotspots, scan_hotspots, write_hotspot_table
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_events import EventWriter
+
+FIG_SIZE = (12, 5)
+PUBLICATION_DPI = 300
+PREVIEW_DPI = 72
+
+
+def downsample_minmax(x, counts, n_cols):
+    """将相邻bin合并为不超过 n_cols 列，返回每列的 (x中心, 最小值, 最大值)
+
+    bin数不超过列数时原样返回（最小值=最大值=计数）。
+    """
+    counts = np.asarray(counts)
+    n = counts.size
+    if n <= n_cols:
+        return x, counts, counts
+    group = -(-n // n_cols)
+    idx = np.arange(0, n, group)
+    lo = np.minimum.reduceat(counts, idx)
+    hi = np.maximum.reduceat(counts, idx)
+    x_mid = (x[idx] + x[np.minimum(idx + group, n) - 1]) / 2.0
+    return x_mid, lo, hi
+
+
+def plot_data(bins, counts, chrom, bin_size, title, filename, target_pos=None, total_mapped=None,
+              dpi=PUBLICATION_DPI, preview_dpi=None):
     """绘图并保存
 
-    使用细竖线表示每个 bin（按光谱配色）。如果提供 `target_pos`，会在该位置画一条竖直虚线并标注原始坐标值。
+    使用细竖线表示每个 bin（按光谱配色），所有竖线由一次 vlines 调用绘制。
+    bin 数超过输出像素宽度时，按像素列做 min/max 降采样：0 到最小值为实色，
+    最小值到最大值为半透明，表示该列内的波动范围。
+    如果提供 `target_pos`（整数或整数列表），会在该位置画竖直虚线并标注原始坐标值。
+    如果提供 `total_mapped`（样本已比对reads总数），右侧额外显示 CPM 标准化坐标轴。
+    如果提供 `preview_dpi`，额外保存低分辨率预览图 `<filename>_preview.png`，返回其路径。
     """
-    import matplotlib.cm as cm
     from matplotlib.colors import Normalize
 
-    plt.figure(figsize=(12, 5))
+    plt.figure(figsize=FIG_SIZE)
     # 使用 bin 中心作为每个竖线的位置，单位 Mb
-    x_centers = (np.array(bins) + bin_size / 2.0) / 1e6
-
-    counts_arr = np.array(counts)
+    x_centers = (np.asarray(bins, dtype=np.float64) + bin_size / 2.0) / 1e6
+    counts_arr = np.asarray(counts, dtype=np.int64)
 
     # 颜色映射：基于丰度（counts）映射颜色，低值偏蓝，高值偏红
-    cmap = cm.get_cmap('RdYlBu_r')
+    cmap = plt.get_cmap('RdYlBu_r')
     max_count = counts_arr.max() if counts_arr.size else 1
     norm = Normalize(vmin=0, vmax=max(max_count, 1))
 
-    # 画细竖线（linewidth 很小，看起来像细柱），颜色由高度决定
-    for x, h in zip(x_centers, counts_arr):
-        if h > 0:
-            c = cmap(norm(h))
-            plt.vlines(x, 0, h, color=c, linewidth=0.9)
-        else:
-            # 对于 0 值使用浅灰色做占位
-            plt.vlines(x, 0, 0, color=(0.9, 0.9, 0.9), linewidth=0.4)
+    # 按发布分辨率下的像素列数降采样（预览图分辨率更低，共用同一份降采样结果）
+    n_cols = int(FIG_SIZE[0] * dpi)
+    x_cols, lo, hi = downsample_minmax(x_centers, counts_arr, n_cols)
+    downsampled = len(x_cols) < len(x_centers)
+    # 未降采样时保持细柱外观；降采样后每列约一个像素宽
+    linewidth = 72.0 / dpi if downsampled else 0.9
+
+    # 0 值不绘制（原实现为零长度的浅灰色占位线，不可见）
+    nonzero = hi > 0
+    colors = cmap(norm(hi[nonzero]))
+    plt.vlines(x_cols[nonzero], 0, lo[nonzero], colors=colors, linewidth=linewidth)
+    if downsampled:
+        spread = nonzero & (hi > lo)
+        plt.vlines(x_cols[spread], lo[spread], hi[spread], colors=cmap(norm(hi[spread])),
+                   linewidth=linewidth, alpha=0.5)
 
     plt.title(title, fontsize=14)
     plt.xlabel(f"Chromosome {chrom} Position (Mb)", fontsize=12)
     plt.ylabel("Read Counts (Filtered)", fontsize=12)
     plt.grid(axis='y', linestyle='--', alpha=0.3)
 
-    # 如果给定目标位置，则绘制垂直虚线并标注原始坐标
+    # CPM = counts / 已比对reads总数 * 1e6，为线性缩放，用次坐标轴表示
+    if total_mapped:
+        cpm_scale = 1e6 / total_mapped
+        cpm_axis = plt.gca().secondary_yaxis('right', functions=(lambda y: y * cpm_scale, lambda y: y / cpm_scale))
+        cpm_axis.set_ylabel("CPM (Counts per Million mapped reads)", fontsize=12)
+
+    # 如果给定目标位置（可为多个），则绘制垂直虚线并标注原始坐标
     if target_pos is not None:
-        x_target_mb = target_pos / 1e6
-        # 竖线与标签半透明（alpha=0.6）
-        plt.axvline(x=x_target_mb, color='red', linestyle='--', linewidth=1, alpha=0.6)
-        # 在图顶端标注原始坐标值（不缩放到 Mb，显示整数坐标）
+        positions = target_pos if isinstance(target_pos, (list, tuple)) else [target_pos]
         ymax = counts_arr.max() if counts_arr.size else 1
-        # 将文字放在竖线稍上方并倾斜90度以与竖线对齐
-        plt.text(x_target_mb, ymax * 0.95, f"{int(target_pos)}", rotation=90,
-                 va='top', ha='right', color=(1.0, 0.0, 0.0, 0.6), fontsize=10,
-                 backgroundcolor=(1.0, 1.0, 1.0, 0.6))
+        for pos in positions:
+            x_target_mb = pos / 1e6
+            # 竖线与标签半透明（alpha=0.6）
+            plt.axvline(x=x_target_mb, color='red', linestyle='--', linewidth=1, alpha=0.6)
+            # 在图顶端标注原始坐标值（不缩放到 Mb，显示整数坐标）
+            # 将文字放在竖线稍上方并倾斜90度以与竖线对齐
+            plt.text(x_target_mb, ymax * 0.95, f"{int(pos)}", rotation=90,
+                     va='top', ha='right', color=(1.0, 0.0, 0.0, 0.6), fontsize=10,
+                     backgroundcolor=(1.0, 1.0, 1.0, 0.6))
+
+    plt.tight_layout()
+    plt.savefig(filename, dpi=dpi)
+    print(f"✅ 成功生成图像: {filename}")
+    preview_fname = None
+    if preview_dpi:
+        preview_fname = f"{os.path.splitext(filename)[0]}_preview.png"
+        plt.savefig(preview_fname, dpi=preview_dpi)
+        print(f"✅ 成功生成预览图: {preview_fname}")
+    plt.close()
+    return preview_fname
+
+def plot_genome(counts_by_chrom, bin_size, title, filename, targets=(), total_mapped=None,
+                dpi=PUBLICATION_DPI, preview_dpi=None):
+    """全基因组 Manhattan 风格图：各染色体首尾相接，相邻染色体交替配色
+
+    每条染色体按其长度分到的像素列数做 min/max 降采样，每列以最大值画点。
+    `targets` 为 [(染色体, 位置), ...]，在各目标位置画虚线。返回预览图路径（未生成时为 None）。
+    """
+    plt.figure(figsize=(FIG_SIZE[0] * 1.5, FIG_SIZE[1]))
+    genome_len = sum(len(c) for c in counts_by_chrom.values()) * bin_size
+    n_cols_total = int(FIG_SIZE[0] * 1.5 * dpi)
+    palette = ('#3b5b92', '#9aa5b8')
+    offset = 0
+    tick_pos, tick_labels = [], []
+    target_x = []
+    xs = ([], [])
+    ys = ([], [])
+    for i, (chrom, counts) in enumerate(counts_by_chrom.items()):
+        counts = np.asarray(counts)
+        chrom_span = len(counts) * bin_size
+        x = (offset + np.arange(len(counts)) * bin_size + bin_size / 2.0) / 1e6
+        n_cols = max(1, -(-n_cols_total * chrom_span // max(genome_len, 1)))
+        x_cols, _, hi = downsample_minmax(x, counts, n_cols)
+        keep = hi > 0
+        xs[i % 2].append(x_cols[keep])
+        ys[i % 2].append(hi[keep])
+        tick_pos.append((offset + chrom_span / 2.0) / 1e6)
+        tick_labels.append(chrom.replace('chr', ''))
+        target_x.extend((offset + pos) / 1e6 for t_chrom, pos in targets if t_chrom == chrom)
+        offset += chrom_span
+    for k in range(2):
+        if xs[k]:
+            plt.scatter(np.concatenate(xs[k]), np.concatenate(ys[k]), s=2, color=palette[k], linewidths=0)
+
+    plt.title(title, fontsize=14)
+    plt.xlabel("Chromosome", fontsize=12)
+    plt.ylabel("Read Counts (Filtered)", fontsize=12)
+    # 染色体多于40条时（如含大量 contig）只标注前40条，避免刻度重叠
+    plt.xticks(tick_pos[:40], tick_labels[:40], fontsize=8, rotation=90 if len(tick_pos) > 25 else 0)
+    plt.xlim(0, offset / 1e6)
+    plt.grid(axis='y', linestyle='--', alpha=0.3)
+
+    if total_mapped:
+        cpm_scale = 1e6 / total_mapped
+        cpm_axis = plt.gca().secondary_yaxis('right', functions=(lambda y: y * cpm_scale, lambda y: y / cpm_scale))
+        cpm_axis.set_ylabel("CPM (Counts per Million mapped reads)", fontsize=12)
+
+    for x in target_x:
+        plt.axvline(x=x, color='red', linestyle='--', linewidth=1, alpha=0.6)
 
     plt.tight_layout()
-    plt.savefig(filename, dpi=300)
+    plt.savefig(filename, dpi=dpi)
     print(f"✅ 成功生成图像: {filename}")
+    preview_fname = None
+    if preview_dpi:
+        preview_fname = f"{os.path.splitext(filename)[0]}_preview.png"
+        plt.savefig(preview_fname, dpi=preview_dpi)
+        print(f"✅ 成功生成预览图: {preview_fname}")
     plt.close()
+    return preview_fname
+
+
+def write_bin_table(counts_by_chrom, bin_size, filename, chrom_lengths, total_mapped=None):
+    """写出每个bin一行的TSV: chrom, start, end, count[, cpm]"""
+    with open(filename, 'w') as f:
+        f.write("chrom\tstart\tend\tcount" + ("\tcpm" if total_mapped else "") + "\n")
+        for chrom, counts in counts_by_chrom.items():
+            counts = np.asarray(counts)
+            starts = np.arange(len(counts), dtype=np.int64) * bin_size
+            ends = np.minimum(starts + bin_size, chrom_lengths[chrom])
+            if total_mapped:
+                cpm = counts * (1e6 / total_mapped)
+                f.writelines(f"{chrom}\t{s}\t{e}\t{c}\t{v:.4f}\n"
+                             for s, e, c, v in zip(starts.tolist(), ends.tolist(), counts.tolist(), cpm.tolist()))
+            else:
+                f.writelines(f"{chrom}\t{s}\t{e}\t{c}\n"
+                             for s, e, c in zip(starts.tolist(), ends.tolist(), counts.tolist()))
+    print(f"[INFO] 分bin计数表已保存: {filename}")
+
+
+# 目标区精细分析：中心 ±MICRO_FLANK，MICRO_BIN 分bin
+MICRO_BIN = 500
+MICRO_FLANK = 50000
+
+Target = namedtuple('Target', ['name', 'chrom', 'pos'])
+
+
+def read_targets(path):
+    """读取目标位点文件，返回 Target 列表
+
+    支持三种行格式（制表符或空格分隔，# / track / browser 开头的行忽略）:
+        BED:   chrom start end [name]   中心取 (start + end) // 2
+        列表:  chrom pos [name]
+        区域:  chrom:pos [name]
+    """
+    targets = []
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith(('#', 'track', 'browser')):
+                continue
+            try:
+                if ':' in fields[0]:
+                    chrom, pos = fields[0].rsplit(':', 1)
+                    pos, name = int(pos.replace(',', '')), (fields[1] if len(fields) > 1 else None)
+                elif len(fields) >= 3 and fields[2].isdigit():
+                    chrom, pos = fields[0], (int(fields[1]) + int(fields[2])) // 2
+                    name = fields[3] if len(fields) > 3 else None
+                else:
+                    chrom, pos = fields[0], int(fields[1].replace(',', ''))
+                    name = fields[2] if len(fields) > 2 else None
+            except (IndexError, ValueError):
+                raise ValueError(f"{path} 第 {line_no} 行无法解析: {line.strip()}")
+            targets.append(Target(name or f"{chrom}:{pos}", chrom, pos))
+    return targets
+
+
+def merge_target_windows(targets, chrom_lengths, flank=MICRO_FLANK):
+    """按 (BAM中染色体顺序, 位置) 排序，合并重叠或相邻的 ±flank 窗口
+
+    返回:
+        [(chrom, start, end, [Target, ...]), ...]，每项对应一次BAM读取
+    """
+    order = {chrom: i for i, chrom in enumerate(chrom_lengths)}
+    merged = []
+    for t in sorted(targets, key=lambda t: (order[t.chrom], t.pos)):
+        start, end = max(0, t.pos - flank), min(chrom_lengths[t.chrom], t.pos + flank)
+        if merged and merged[-1][0] == t.chrom and start <= merged[-1][2]:
+            merged[-1][2] = max(merged[-1][2], end)
+            merged[-1][3].append(t)
+        else:
+            merged.append([t.chrom, start, end, [t]])
+    return [tuple(m) for m in merged]
+
+
+TARGET_COLUMNS = ('name', 'chrom', 'pos', 'window_start', 'window_end', 'reads', 'cpm',
+                  'max_bin_start', 'max_bin_count', 'fold_vs_chrom', 'plot')
+
+
+def target_summary_row(target, start, end, bin_size, counts, chrom_len, chrom_mapped, total_mapped, plot_file):
+    """汇总单个目标窗口: reads总数、CPM、最高bin，以及相对该染色体平均密度的富集倍数"""
+    counts = np.asarray(counts)
+    reads = int(counts.sum())
+    peak = int(np.argmax(counts)) if counts.size else 0
+    # 期望 = 该染色体已比对reads按长度均摊到窗口
+    expected = chrom_mapped * (end - start) / chrom_len if chrom_mapped and chrom_len else None
+    return {
+        'name': target.name,
+        'chrom': target.chrom,
+        'pos': target.pos,
+        'window_start': start,
+        'window_end': end,
+        'reads': reads,
+        'cpm': f"{reads * 1e6 / total_mapped:.4f}" if total_mapped else '',
+        'max_bin_start': start + peak * bin_size,
+        'max_bin_count': int(counts[peak]) if counts.size else 0,
+        'fold_vs_chrom': f"{reads / expected:.2f}" if expected else '',
+        'plot': os.path.basename(plot_file),
+    }
+
+
+def write_targets_table(rows, filename):
+    """写出批量模式的目标汇总TSV，按 reads 降序"""
+    with open(filename, 'w') as f:
+        f.write('\t'.join(TARGET_COLUMNS) + '\n')
+        for row in sorted(rows, key=lambda r: -r['reads']):
+            f.write('\t'.join(str(row[col]) for col in TARGET_COLUMNS) + '\n')
+
 
 def main():
     parser = argparse.ArgumentParser(description='WGSmapping: WGS background and target enrichment plotting')
     # 适配bash脚本的参数调用方式
     parser.add_argument('--bam', required=True, help='Input BAM file path')
-    parser.add_argument('--chromosome', required=True, help='Target chromosome (e.g., chr6)')
-    parser.add_argument('--center', type=int, required=True, help='Center position (bp)')
+    parser.add_argument('--chromosome', help='Target chromosome (e.g., chr6)')
+    parser.add_argument('--center', type=int, help='Center position (bp)')
+    parser.add_argument('--targets', help='Batch mode: BED (chrom start end [name]) or list (chrom pos [name] / chrom:pos [name]) '
+                                          'of target loci; replaces --chromosome/--center')
     parser.add_argument('--step', type=int, default=100000, help='Step size for genome-wide analysis (bp)')
     parser.add_argument('--background', type=str, default='true', help='Perform background analysis (true/false)')
     parser.add_argument('--output', required=True, help='Output directory for plots')
+    parser.add_argument('--backend', default='auto', choices=('auto',) + BACKENDS,
+                        help='BAM reading backend (default: auto = pysam > samtools > pure)')
+    parser.add_argument('--count-rule', default='raw', choices=COUNT_RULES,
+                        help='raw: count reads by start position; overlap50: aligned overlap > 50%% of read length')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help='Binned coverage cache directory (default: $WORF_SEQ_CACHE_DIR or system temp)')
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_MB,
+                        help=f'Coverage cache size cap in MB, least recently used entries are evicted (default: {DEFAULT_MAX_MB})')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the binned coverage cache')
+    parser.add_argument('--no-pyramid', action='store_true',
+                        help='Do not write the multi-resolution coverage pyramid used by the app zoom viewer')
+    parser.add_argument('--genome-wide', action='store_true',
+                        help='Also bin every contig in the BAM and write a genome-wide Manhattan plot and per-bin table')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Genome-wide mode: 1 = one sequential pass over the BAM; N > 1 = N processes reading contigs via the index')
+    parser.add_argument('--hotspot-test', default='poisson', choices=HOTSPOT_TESTS,
+                        help='Hotspot test on the background bins against a rolling local background (default: poisson)')
+    parser.add_argument('--hotspot-pvalue', type=float, default=DEFAULT_PVALUE,
+                        help=f'Per-bin Poisson p-value threshold (default: {DEFAULT_PVALUE})')
+    parser.add_argument('--hotspot-z', type=float, default=DEFAULT_Z, help=f'Per-bin z-score threshold (default: {DEFAULT_Z})')
+    parser.add_argument('--hotspot-min-fold', type=float, default=DEFAULT_MIN_FOLD,
+                        help=f'Minimum fold enrichment over the local background for a hotspot bin (default: {DEFAULT_MIN_FOLD})')
+    parser.add_argument('--no-hotspots', action='store_true', help='Skip the hotspot scan')
+    parser.add_argument('--no-slice', action='store_true',
+                        help='Do not write the indexed BAM slice of the target windows (*_target_slice.bam)')
+    parser.add_argument('--slice-hotspots', type=int, default=0,
+                        help='Also write an indexed BAM slice of the top N hotspots (*_hotspots_slice.bam, default: 0 = off)')
+    parser.add_argument('--dpi', type=int, default=PUBLICATION_DPI, help=f'Publication PNG resolution (default: {PUBLICATION_DPI})')
+    parser.add_argument('--preview-dpi', type=int, default=PREVIEW_DPI,
+                        help=f'Also save a low-resolution *_preview.png for quick viewing, 0 to disable (default: {PREVIEW_DPI})')
 
     args = parser.parse_args()
+    if not args.targets and (args.chromosome is None or args.center is None):
+        parser.error('--chromosome and --center are required unless --targets is given')
 
     print("[INFO] === WORF-Seq 染色体比对分析 ===")
     print(f"[INFO] BAM文件: {args.bam}")
-    print(f"[INFO] 染色体: {args.chromosome}")
-    print(f"[INFO] 中心位置: {args.center}")
+    if args.targets:
+        print(f"[INFO] 目标位点文件: {args.targets}")
+    else:
+        print(f"[INFO] 染色体: {args.chromosome}")
+        print(f"[INFO] 中心位置: {args.center}")
     print(f"[INFO] 步长: {args.step}")
     print(f"[INFO] 背景分析: {args.background}")
+    print(f"[INFO] 计数规则: {args.count_rule}")
+    if args.genome_wide:
+        print(f"[INFO] 全基因组扫描: 是 (workers: {args.workers})")
 
     # 1. 检查BAM文件
     bam_path = args.bam
@@ -126,19 +350,25 @@ def main():
     if not os.path.exists(bam_path + ".bai"):
         print(f"[WARNING] 未找到索引文件 (.bai): {bam_path}.bai")
 
-    # 检查BAM文件是否可读（samtools 必需）
+    # 输入为目标区域切片时，只能分析切片覆盖的窗口；reads总数取自切片中记录的原BAM索引统计
+    input_slice = read_slice_info(bam_path)
+    if input_slice is not None:
+        print(f"[INFO] 输入为目标区域切片 (来源: {input_slice['source']})，跳过全染色体背景、全基因组扫描与热点扫描")
+        args.background = 'false'
+        args.genome_wide = False
+        args.no_hotspots = True
+        args.no_slice = True
+        args.slice_hotspots = 0
+
+    # 从 .bai 索引读取reads总数（等价于 samtools idxstats，无需解压整个BAM）
+    stats = []
+    total_mapped = None
     try:
-        # 使用samtools view测试BAM文件
-        result = subprocess.run(['samtools', 'view', '-c', bam_path], 
-                              capture_output=True, text=True, check=True)
-        total_reads = int(result.stdout.strip())
-        print(f"[INFO] BAM文件包含 {total_reads:,} 条reads")
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] 无法读取BAM文件: {e}")
-        sys.exit(1)
-    except FileNotFoundError:
-        print("[ERROR] samtools not found in PATH")
-        sys.exit(1)
+        stats = input_slice['index_stats'] if input_slice is not None else index_stats(bam_path)
+        total_mapped, total_records = total_reads(stats)
+        print(f"[INFO] BAM文件包含 {total_records:,} 条reads (已比对 {total_mapped:,})")
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] 无法从索引读取reads总数，跳过CPM标准化: {e}")
 
     # 2. 输出目录设置
     out_dir = args.output
@@ -149,109 +379,363 @@ def main():
     # 统一样本前缀：去掉常见的对齐/排序后缀，以匹配 worf_seq.bash 中使用的 folder basename
     # 例如: UDI001_aligned_minimap.sorted -> UDI001
     sample_prefix = re.sub(r'(_aligned_minimap)?(\.sorted|_sorted)?$', '', bam_basename)
+    # 以切片为输入时沿用原样本前缀，例如 UDI001_target_slice -> UDI001
+    sample_prefix = re.sub(r'_(target|hotspots)_slice$', '', sample_prefix)
 
-    # 3. 设置目标染色体和位置
-    target_chrom = args.chromosome
-    target_pos = args.center
+    # 3. 设置目标位点：单目标模式即只有一个位点的批量模式
+    if args.targets:
+        try:
+            targets = read_targets(args.targets)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] 无法读取目标位点文件: {e}")
+            sys.exit(1)
+        if not targets:
+            print(f"[ERROR] 目标位点文件为空: {args.targets}")
+            sys.exit(1)
+    else:
+        targets = [Target(f"{args.chromosome}:{args.center}", args.chromosome, args.center)]
     wgs_bin = args.step
     
     # 转换背景分析参数
     do_background = args.background.lower() in ['true', 'yes', '1', 'on']
 
-    # 获取染色体长度
+    # 创建BAM读取后端
     try:
-        # 使用samtools view -H获取头信息，然后解析染色体长度
-        cmd = ['samtools', 'view', '-H', bam_path]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        
-        chrom_length = None
-        for line in result.stdout.split('\n'):
-            if line.startswith('@SQ') and f'SN:{target_chrom}' in line:
-                for part in line.split('\t'):
-                    if part.startswith('LN:'):
-                        chrom_length = int(part[3:])
-                        break
-                break
-        
-        if chrom_length is None:
-            print(f"[ERROR] 无法获取染色体 {target_chrom} 的长度")
+        reader = open_backend(bam_path, args.backend)
+    except (FileNotFoundError, ImportError) as e:
+        print(f"[ERROR] 无法创建BAM读取后端 ({args.backend}): {e}")
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] 无法读取BAM文件: {e}")
+        sys.exit(1)
+    print(f"[INFO] BAM读取后端: {reader.name}")
+
+    # 后端在 main 结束（包括提前退出）时关闭
+    micro_reader = None
+    try:
+        # 从BAM头获取染色体长度
+        try:
+            chrom_lengths = dict(reader.references())
+        except (subprocess.CalledProcessError, ValueError) as e:
+            print(f"[ERROR] 获取染色体长度失败: {e}")
             return
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] 获取染色体长度失败: {e}")
-        return
+        unknown = [t for t in targets if t.chrom not in chrom_lengths]
+        for t in unknown:
+            print(f"[ERROR] 无法获取染色体 {t.chrom} 的长度" + (f"，跳过目标 {t.name}" if args.targets else ""))
+        # 重复位点只分析一次
+        targets = list({(t.chrom, t.pos): t for t in targets if t.chrom in chrom_lengths}.values())
+        if input_slice is not None:
+            outside = [t for t in targets if not slice_covers(input_slice, t.chrom, max(0, t.pos - MICRO_FLANK),
+                                                              min(chrom_lengths[t.chrom], t.pos + MICRO_FLANK))]
+            for t in outside:
+                print(f"[ERROR] 目标 {t.name} 的 ±{MICRO_FLANK // 1000}kb 窗口不在切片覆盖范围内，跳过")
+            targets = [t for t in targets if t not in outside]
+        if not targets:
+            return
+        target_chroms = list(dict.fromkeys(t.chrom for t in sorted(targets, key=lambda t: list(chrom_lengths).index(t.chrom))))
+        # 单目标模式下沿用原有变量，用于摘要
+        target_chrom, target_pos = targets[0].chrom, targets[0].pos
+        chrom_length = chrom_lengths[target_chrom]
+        windows = merge_target_windows(targets, chrom_lengths)
+        if args.targets:
+            print(f"[INFO] {len(targets)} 个目标位点，合并为 {len(windows)} 个读取区间，分布于 {len(target_chroms)} 条染色体")
 
-    generated_files = []
+        cache = None
+        if not args.no_cache:
+            try:
+                cache = CoverageCache(args.cache_dir, args.cache_max_mb)
+                print(f"[INFO] 覆盖度缓存目录: {args.cache_dir}")
+            except OSError as e:
+                print(f"[WARNING] 无法使用覆盖度缓存，将直接读取BAM: {e}")
 
-    # --- 执行全长分析 ---
-    if do_background:
-        print(f"\n[INFO] [1/2] 正在分析 {target_chrom} 全长背景 (长度: {chrom_length/1e6:.2f} Mb)...")
-        try:
-            wgs_bins, wgs_counts = get_counts(bam_path, target_chrom, 0, chrom_length, wgs_bin)
-            wgs_fname = os.path.join(out_dir, f"{sample_prefix}_chromosome_{target_chrom}_step{wgs_bin}.png")
-            plot_data(wgs_bins, wgs_counts, target_chrom, wgs_bin,
-                     f"WORF-Seq Chromosome-wide Coverage\\n{target_chrom} (Step: {wgs_bin:,} bp)", 
-                     wgs_fname, target_pos=target_pos)
-            if os.path.exists(wgs_fname) and os.path.getsize(wgs_fname) > 0:
-                generated_files.append(wgs_fname)
-            else:
-                print(f"[WARN] 未生成全染色体图: {wgs_fname}")
-        except FileNotFoundError as e:
-            print(f"[ERROR] 全染色体分析失败 (依赖缺失): {e}")
-            sys.exit(1)
-        except Exception as e:
-            print(f"[ERROR] 全染色体分析失败: {e}")
-    else:
-        print("[INFO] 跳过全染色体分析")
+        chrom_mapped = {stat.name: stat.mapped for stat in stats}
+        for stat in stats:
+            if stat.name in target_chroms:
+                print(f"[INFO] {stat.name}: 已比对 {stat.mapped:,} 条, 未比对 {stat.unmapped:,} 条")
 
-    # --- 执行精细分析 ---
-    micro_bin = 500
-    micro_start = max(0, target_pos - 50000)
-    micro_end = min(chrom_length, target_pos + 50000)
+        generated_files = []
+        # 结构化进度事件：绘图阶段按 染色体背景 + 目标区间 的完成数上报
+        events = EventWriter()
+        plot_total = (len(target_chroms) if do_background else 0) + len(windows)
+        plot_done = 0
 
-    print(f"[INFO] [2/2] 正在分析目标区域 (+/- 50kb 范围)...")
-    try:
-        m_bins, m_counts = get_counts(bam_path, target_chrom, micro_start, micro_end, micro_bin)
-        target_fname = os.path.join(out_dir, f"{sample_prefix}_target_region_{target_chrom}_{target_pos}.png")
-        plot_data(m_bins, m_counts, target_chrom, micro_bin,
-                 f"WORF-Seq Target Region Coverage\\n{target_chrom}:{micro_start:,}-{micro_end:,}", 
-                 target_fname, target_pos=target_pos)
-        if os.path.exists(target_fname) and os.path.getsize(target_fname) > 0:
-            generated_files.append(target_fname)
+        # --- 全基因组扫描（可选）：所有染色体同时分bin ---
+        genome_counts = None
+        if args.genome_wide:
+            mode = "顺序读取整个BAM" if args.workers <= 1 else f"{args.workers} 个进程按染色体并行"
+            print(f"\n[INFO] [全基因组] 正在对全部染色体分bin计数 (步长: {wgs_bin:,} bp, {mode})...")
+            try:
+                genome_counts = count_genome(reader, wgs_bin, args.count_rule, workers=args.workers)
+            except (OSError, ValueError) as e:
+                print(f"[ERROR] 全基因组扫描失败: {e}")
+            if genome_counts:
+                if cache is not None:
+                    # 写入缓存，之后以任一染色体为目标的运行可直接命中背景计数
+                    for chrom, counts in genome_counts.items():
+                        try:
+                            cache.put(bam_path, chrom, 0, chrom_lengths[chrom], wgs_bin, args.count_rule, counts)
+                        except OSError as e:
+                            print(f"[WARN] 写入覆盖度缓存失败: {e}")
+                            break
+                genome_fname = os.path.join(out_dir, f"{sample_prefix}_genome_wide_step{wgs_bin}.png")
+                table_fname = os.path.join(out_dir, f"{sample_prefix}_genome_bins_step{wgs_bin}.tsv")
+                try:
+                    genome_preview = plot_genome(genome_counts, wgs_bin,
+                                                 f"WORF-Seq Genome-wide Coverage (Step: {wgs_bin:,} bp)", genome_fname,
+                                                 targets=[(t.chrom, t.pos) for t in targets], total_mapped=total_mapped,
+                                                 dpi=args.dpi, preview_dpi=args.preview_dpi)
+                    generated_files.append(genome_fname)
+                    if genome_preview:
+                        generated_files.append(genome_preview)
+                    write_bin_table(genome_counts, wgs_bin, table_fname, chrom_lengths, total_mapped)
+                    generated_files.append(table_fname)
+                except Exception as e:
+                    print(f"[ERROR] 全基因组结果输出失败: {e}")
+
+        # 覆盖度金字塔：一次遍历目标染色体，供 app 任意窗口缩放；raw 规则下背景与目标区计数也可直接由其还原。
+        # 已有由同一BAM生成、且包含全部目标染色体的金字塔时直接复用（例如只改变 --center 重新运行）；
+        # 否则基础层经覆盖度缓存读取，与缓存共用一次BAM遍历
+        pyramid = None
+        if do_background and not args.no_pyramid:
+            pyramid_fname = os.path.join(out_dir, f"{sample_prefix}_coverage_pyramid.wcp")
+            try:
+                real_path, bam_size, bam_mtime_ns = bam_identity(bam_path)
+                source = {'bam': real_path, 'size': bam_size, 'mtime_ns': bam_mtime_ns,
+                          'references': [[name, length] for name, length in chrom_lengths.items()]}
+                existing = open_matching_pyramid(pyramid_fname, source)
+                if existing is not None and all(c in existing.chroms for c in target_chroms):
+                    pyramid = existing
+                    print(f"[INFO] 复用已有覆盖度金字塔，跳过BAM读取: {pyramid_fname}")
+                else:
+                    # 保留已有金字塔中的其他染色体（其基础层通常可由缓存命中）
+                    build_chroms = list(dict.fromkeys((list(existing.chroms) if existing else []) + target_chroms))
+                    print(f"[INFO] 正在构建覆盖度金字塔 ({', '.join(build_chroms)})...")
+
+                    def count_base(name, length):
+                        _, counts, hit = get_counts_cached(cache, reader, bam_path, name, 0, length, BASE_BIN, 'raw')
+                        if hit:
+                            print(f"[INFO] {name} 基础层命中覆盖度缓存，跳过BAM读取")
+                        return counts
+
+                    write_pyramid(pyramid_fname, build_pyramid(reader, [(c, chrom_lengths[c]) for c in build_chroms],
+                                                               count_base=count_base), source=source)
+                    pyramid = CoveragePyramid(pyramid_fname)
+                generated_files.append(pyramid_fname)
+                print(f"[INFO] 覆盖度金字塔已保存: {pyramid_fname} (层级: {', '.join(f'{bs:,} bp' for bs in pyramid.bin_sizes(target_chrom))})")
+            except (OSError, ValueError) as e:
+                print(f"[WARN] 构建覆盖度金字塔失败: {e}")
+
+        def pyramid_counts(chrom, start, end, bin_size):
+            """raw 规则下尝试由金字塔精确还原计数，不可用时返回 None"""
+            if pyramid is None or args.count_rule != 'raw':
+                return None
+            return pyramid.counts_for(chrom, start, end, bin_size)
+
+        def region_counts(chrom, start, end, bin_size, source=None):
+            """优先复用全基因组扫描结果或由金字塔还原（仅 raw 规则可逐级相加），否则经缓存读取BAM
+
+            source 为覆盖该区间的切片后端时从切片读取；切片记录与原BAM相同，缓存仍以原BAM为键。
+            """
+            if genome_counts and chrom in genome_counts and (start, end, bin_size) == (0, chrom_lengths[chrom], wgs_bin):
+                print("[INFO] 复用全基因组扫描计数，跳过BAM读取")
+                return list(range(start, end, bin_size)), genome_counts[chrom].tolist()
+            counts = pyramid_counts(chrom, start, end, bin_size)
+            if counts is not None:
+                print("[INFO] 由覆盖度金字塔还原计数，跳过BAM读取")
+                return list(range(start, end, bin_size)), counts.tolist()
+            bins, counts, hit = get_counts_cached(cache, source or reader, bam_path, chrom,
+                                                  start, end, bin_size, args.count_rule)
+            if hit:
+                print("[INFO] 命中覆盖度缓存，跳过BAM读取")
+            return bins, counts
+
+        # --- 执行全长分析 ---
+        wgs_counts = {}
+        if do_background:
+            for chrom in target_chroms:
+                chrom_len = chrom_lengths[chrom]
+                print(f"\n[INFO] [1/2] 正在分析 {chrom} 全长背景 (长度: {chrom_len/1e6:.2f} Mb)...")
+                try:
+                    wgs_bins, wgs_counts[chrom] = region_counts(chrom, 0, chrom_len, wgs_bin)
+                    wgs_fname = os.path.join(out_dir, f"{sample_prefix}_chromosome_{chrom}_step{wgs_bin}.png")
+                    positions = [t.pos for t in targets if t.chrom == chrom]
+                    wgs_preview = plot_data(wgs_bins, wgs_counts[chrom], chrom, wgs_bin,
+                             f"WORF-Seq Chromosome-wide Coverage\\n{chrom} (Step: {wgs_bin:,} bp)", 
+                             wgs_fname, target_pos=positions[0] if len(positions) == 1 else positions,
+                             total_mapped=total_mapped, dpi=args.dpi, preview_dpi=args.preview_dpi)
+                    if os.path.exists(wgs_fname) and os.path.getsize(wgs_fname) > 0:
+                        generated_files.append(wgs_fname)
+                        if wgs_preview:
+                            generated_files.append(wgs_preview)
+                    else:
+                        print(f"[WARN] 未生成全染色体图: {wgs_fname}")
+                except FileNotFoundError as e:
+                    print(f"[ERROR] 全染色体分析失败 (依赖缺失): {e}")
+                    sys.exit(1)
+                except Exception as e:
+                    print(f"[ERROR] 全染色体分析失败: {e}")
+                plot_done += 1
+                events.emit("progress", stage="plot", step="background", records=plot_done, total=plot_total)
         else:
-            print(f"[WARN] 未生成目标区域图: {target_fname}")
-    except FileNotFoundError as e:
-        print(f"[ERROR] 目标区域分析失败 (依赖缺失): {e}")
-        sys.exit(1)
-    except Exception as e:
-        print(f"[ERROR] 目标区域分析失败: {e}")
-    
-    # 生成摘要报告
-    summary_fname = os.path.join(out_dir, f"{sample_prefix}_worf_seq_summary.txt")
-    try:
-        with open(summary_fname, 'w') as f:
-            f.write("WORF-Seq Analysis Summary Report\\n")
-            f.write("=" * 40 + "\\n")
-            f.write(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\\n")
-            f.write(f"BAM File: {bam_path}\\n")
-            f.write(f"Target Chromosome: {target_chrom}\\n")
-            f.write(f"Center Position: {target_pos:,}\\n")
-            f.write(f"Genome-wide Step Size: {wgs_bin:,} bp\\n")
-            f.write(f"Background Analysis: {'Yes' if do_background else 'No'}\\n")
-            f.write(f"Chromosome Length: {chrom_length:,} bp\\n\\n")
-            f.write("Generated Files:\\n")
-            for file in generated_files:
-                f.write(f"- {file}\\n")
-        generated_files.append(summary_fname)
-        print(f"[INFO] 摘要报告已保存: {summary_fname}")
-    except Exception as e:
-        print(f"[ERROR] 生成摘要报告失败: {e}")
-    if not generated_files:
-        print("\n[ERROR] 分析未生成任何输出文件，可能发生错误")
-        sys.exit(1)
+            print("[INFO] 跳过全染色体分析")
+
+        # --- 执行精细分析：重叠的 ±50kb 窗口合并后每个区间只读取一次BAM ---
+        micro_bin = MICRO_BIN
+        target_rows = []
+        # 已有与当前BAM对应、且覆盖全部窗口的目标区域切片时，从切片读取而不是原BAM
+        slice_fname = os.path.join(out_dir, f"{sample_prefix}_target_slice.bam")
+        slice_regions = [(chrom, w_start, w_end) for chrom, w_start, w_end, _ in windows]
+        slice_info = find_slice(slice_fname, bam_path) if input_slice is None else None
+        if slice_info is not None and all(slice_covers(slice_info, *r) for r in slice_regions):
+            try:
+                micro_reader = open_backend(slice_fname, args.backend)
+                print(f"[INFO] 使用已有目标区域切片: {slice_fname}")
+            except (FileNotFoundError, ImportError, OSError, ValueError) as e:
+                print(f"[WARN] 无法打开目标区域切片，改为读取原BAM: {e}")
+        print(f"[INFO] [2/2] 正在分析目标区域 (+/- {MICRO_FLANK // 1000}kb 范围)...")
+        for chrom, w_start, w_end, group in windows:
+            regions = [(max(0, t.pos - MICRO_FLANK), min(chrom_lengths[chrom], t.pos + MICRO_FLANK)) for t in group]
+            plot_done += 1
+            events.emit("progress", stage="plot", step="targets", records=plot_done, total=plot_total)
+            try:
+                if len(group) == 1:
+                    group_counts = [region_counts(chrom, *regions[0], micro_bin, source=micro_reader)[1]]
+                else:
+                    group_counts = [pyramid_counts(chrom, start, end, micro_bin) for start, end in regions]
+                    if any(c is None for c in group_counts):
+                        print(f"[INFO] 读取合并区间 {chrom}:{w_start:,}-{w_end:,} ({len(group)} 个目标)")
+                        group_counts = count_bins_multi(micro_reader or reader, chrom, regions, micro_bin, args.count_rule)
+                    else:
+                        print(f"[INFO] 由覆盖度金字塔还原 {chrom}:{w_start:,}-{w_end:,} ({len(group)} 个目标)")
+            except FileNotFoundError as e:
+                print(f"[ERROR] 目标区域分析失败 (依赖缺失): {e}")
+                sys.exit(1)
+            except Exception as e:
+                print(f"[ERROR] 目标区域分析失败 ({chrom}:{w_start:,}-{w_end:,}): {e}")
+                continue
+
+            for t, (micro_start, micro_end), m_counts in zip(group, regions, group_counts):
+                m_counts = np.asarray(m_counts)
+                m_bins = list(range(micro_start, micro_end, micro_bin))
+                target_fname = os.path.join(out_dir, f"{sample_prefix}_target_region_{chrom}_{t.pos}.png")
+                try:
+                    target_preview = plot_data(m_bins, m_counts.tolist(), chrom, micro_bin,
+                             f"WORF-Seq Target Region Coverage\\n{chrom}:{micro_start:,}-{micro_end:,}", 
+                             target_fname, target_pos=t.pos, total_mapped=total_mapped,
+                             dpi=args.dpi, preview_dpi=args.preview_dpi)
+                    if os.path.exists(target_fname) and os.path.getsize(target_fname) > 0:
+                        generated_files.append(target_fname)
+                        if target_preview:
+                            generated_files.append(target_preview)
+                    else:
+                        print(f"[WARN] 未生成目标区域图: {target_fname}")
+                        target_fname = ''
+                except Exception as e:
+                    print(f"[ERROR] 目标区域绘图失败 ({t.name}): {e}")
+                    target_fname = ''
+                target_rows.append(target_summary_row(t, micro_start, micro_end, micro_bin, m_counts, chrom_lengths[chrom],
+                                                      chrom_mapped.get(chrom), total_mapped, target_fname))
+
+        # 目标区域切片：供 app 下载与后续重新分析（已有且有效时复用）
+        if not args.no_slice and target_rows:
+            if micro_reader is not None:
+                generated_files += [slice_fname, slice_fname + '.bai']
+            elif not os.path.exists(bam_path + '.bai'):
+                print("[WARN] 原BAM没有索引，跳过目标区域切片")
+            else:
+                try:
+                    n_slice = write_bam_slice(bam_path, slice_fname, slice_regions, stats=stats or None, label='targets')
+                    generated_files += [slice_fname, slice_fname + '.bai']
+                    print(f"[INFO] 目标区域切片已保存: {slice_fname} ({n_slice:,} 条reads, "
+                          f"{os.path.getsize(slice_fname) / 1024 / 1024:.2f} MB)")
+                except (OSError, ValueError) as e:
+                    print(f"[WARN] 写入目标区域切片失败: {e}")
+
+        # 批量模式：所有目标的汇总表
+        if args.targets and target_rows:
+            table_fname = os.path.join(out_dir, f"{sample_prefix}_targets_summary.tsv")
+            try:
+                write_targets_table(target_rows, table_fname)
+                generated_files.append(table_fname)
+                print(f"[INFO] 目标汇总表已保存: {table_fname}")
+            except OSError as e:
+                print(f"[ERROR] 生成目标汇总表失败: {e}")
+
+        # --- 热点扫描：全基因组计数优先，否则使用目标染色体背景 ---
+        hotspots = None
+        hotspot_source = genome_counts.items() if genome_counts else (wgs_counts.items() if wgs_counts else None)
+        if hotspot_source is not None and not args.no_hotspots:
+            hotspot_fname = os.path.join(out_dir, f"{sample_prefix}_hotspots_step{wgs_bin}.tsv")
+            try:
+                hotspots = rank_hotspots(scan_hotspots(hotspot_source, wgs_bin, chrom_lengths, test=args.hotspot_test,
+                                                       pvalue=args.hotspot_pvalue, z=args.hotspot_z,
+                                                       min_fold=args.hotspot_min_fold))
+                write_hotspot_table(hotspots, hotspot_fname, chrom_lengths)
+                generated_files.append(hotspot_fname)
+                print(f"[INFO] 检出 {len(hotspots)} 个富集热点 ({args.hotspot_test})，已保存: {hotspot_fname}")
+                for rank, h in enumerate(hotspots[:5], 1):
+                    print(f"[INFO]   #{rank} {h.chrom}:{h.start:,}-{h.end:,} count={h.count:,} fold={h.fold} score={h.score}")
+            except (OSError, ValueError) as e:
+                print(f"[WARN] 热点扫描失败: {e}")
+
+        # 可选：前N个热点的切片
+        if hotspots and args.slice_hotspots > 0 and os.path.exists(bam_path + '.bai'):
+            hotspot_slice = os.path.join(out_dir, f"{sample_prefix}_hotspots_slice.bam")
+            hotspot_regions = [(h.chrom, h.start, h.end) for h in hotspots[:args.slice_hotspots]]
+            try:
+                existing = find_slice(hotspot_slice, bam_path)
+                if existing is None or not all(slice_covers(existing, *r) for r in hotspot_regions):
+                    n_slice = write_bam_slice(bam_path, hotspot_slice, hotspot_regions, stats=stats or None, label='hotspots')
+                    print(f"[INFO] 前 {len(hotspot_regions)} 个热点切片已保存: {hotspot_slice} ({n_slice:,} 条reads)")
+                generated_files += [hotspot_slice, hotspot_slice + '.bai']
+            except (OSError, ValueError) as e:
+                print(f"[WARN] 写入热点切片失败: {e}")
+
+        # 生成摘要报告
+        summary_fname = os.path.join(out_dir, f"{sample_prefix}_worf_seq_summary.txt")
+        try:
+            with open(summary_fname, 'w') as f:
+                f.write("WORF-Seq Analysis Summary Report\\n")
+                f.write("=" * 40 + "\\n")
+                f.write(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\\n")
+                f.write(f"BAM File: {bam_path}\\n")
+                if args.targets:
+                    f.write(f"Targets File: {args.targets}\\n")
+                    f.write(f"Targets: {len(targets)} in {len(windows)} merged windows on {len(target_chroms)} chromosomes\\n")
+                else:
+                    f.write(f"Target Chromosome: {target_chrom}\\n")
+                    f.write(f"Center Position: {target_pos:,}\\n")
+                f.write(f"Genome-wide Step Size: {wgs_bin:,} bp\\n")
+                f.write(f"Background Analysis: {'Yes' if do_background else 'No'}\\n")
+                f.write(f"Count Rule: {args.count_rule} (backend: {reader.name})\\n")
+                f.write(f"Genome-wide Scan: {'Yes' if genome_counts else 'No'}\\n")
+                if hotspots is not None:
+                    f.write(f"Hotspots ({args.hotspot_test}): {len(hotspots)}\\n")
+                    for rank, h in enumerate(hotspots[:10], 1):
+                        f.write(f"  #{rank} {h.chrom}:{h.start:,}-{h.end:,} count={h.count:,} fold={h.fold} score={h.score}\\n")
+                if not args.targets:
+                    f.write(f"Chromosome Length: {chrom_length:,} bp\\n")
+                if total_mapped is not None:
+                    f.write(f"Total Mapped Reads: {total_mapped:,} (CPM normalization)\\n")
+                f.write("\\n")
+                f.write("Generated Files:\\n")
+                for file in generated_files:
+                    f.write(f"- {file}\\n")
+            generated_files.append(summary_fname)
+            print(f"[INFO] 摘要报告已保存: {summary_fname}")
+        except Exception as e:
+            print(f"[ERROR] 生成摘要报告失败: {e}")
+        if not generated_files:
+            print("\n[ERROR] 分析未生成任何输出文件，可能发生错误")
+            sys.exit(1)
 
-    print(f"\n[SUCCESS] 分析完成！生成了 {len(generated_files)} 个文件：")
-    for file in generated_files:
-        print(f"[INFO]   - {file}")
+        print(f"\n[SUCCESS] 分析完成！生成了 {len(generated_files)} 个文件：")
+        for file in generated_files:
+            print(f"[INFO]   - {file}")
+    finally:
+        for backend in (reader, micro_reader):
+            if backend is not None and hasattr(backend, 'close'):
+                backend.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,760 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WORF-Seq BAM读取后端与bin计数
+
+统一 WORF_Seq/WGSmapping.py（samtools 原始计数）与 WORF-Seq/WGSmapping.py
+（pysam + 重叠>50%规则）两套实现，提供可选择的读取后端：
+
+- samtools: 单个 `samtools view` 子进程流式读取
+- pysam:    通过 pysam 索引 fetch
+- pure:     纯 Python BGZF/BAI 读取器，无需 samtools 与 pysam
+
+两种计数规则都通过 get_counts 暴露：
+
+- raw:       每条记录计入其比对起点所在的bin（不过滤flag）
+- overlap50: 跳过未比对/次要比对，read 在某个bin内的比对碱基数
+             超过 read 长度的 50% 时计入该bin
+"""
+import os
+import re
+import struct
+import subprocess
+import tempfile
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+BACKENDS = ('pysam', 'samtools', 'pure')
+COUNT_RULES = ('raw', 'overlap50')
+
+# SAM flag
+FLAG_UNMAPPED = 0x4
+FLAG_SECONDARY = 0x100
+
+# 每批返回的read数量，计数内存只与bin数和批大小相关
+READ_CHUNK_SIZE = 1_000_000
+
+# CIGAR 操作编码: M I D N S H P = X
+CIGAR_OPS = 'MIDNSHP=X'
+_CIGAR_RE = re.compile(rb'(\d+)([MIDNSHP=X])')
+# 消耗参考序列的操作 (M D N = X) 与计入比对碱基的操作 (M = X)
+_REF_CONSUMING = frozenset((0, 2, 3, 7, 8))
+_ALIGNED = frozenset((0, 7, 8))
+
+# 一批reads的列式表示；blocks 为比对无gap片段 (M/=/X)，block_read 为其所属read在批内的下标
+ReadBatch = namedtuple('ReadBatch', ['pos', 'flag', 'qlen', 'block_read', 'block_start', 'block_end'])
+
+
+class _BatchBuilder:
+    """逐条累积read，攒满 READ_CHUNK_SIZE 条后转换为 ReadBatch"""
+
+    def __init__(self, with_blocks):
+        self.with_blocks = with_blocks
+        self.reset()
+
+    def reset(self):
+        self.pos = []
+        self.flag = []
+        self.qlen = []
+        self.block_read = []
+        self.block_start = []
+        self.block_end = []
+
+    def __len__(self):
+        return len(self.pos)
+
+    def add(self, pos, flag, qlen, blocks=()):
+        index = len(self.pos)
+        self.pos.append(pos)
+        self.flag.append(flag)
+        self.qlen.append(qlen)
+        if self.with_blocks:
+            for b_start, b_end in blocks:
+                self.block_read.append(index)
+                self.block_start.append(b_start)
+                self.block_end.append(b_end)
+
+    def build(self):
+        batch = ReadBatch(
+            np.asarray(self.pos, dtype=np.int64),
+            np.asarray(self.flag, dtype=np.int64),
+            np.asarray(self.qlen, dtype=np.int64),
+            np.asarray(self.block_read, dtype=np.int64),
+            np.asarray(self.block_start, dtype=np.int64),
+            np.asarray(self.block_end, dtype=np.int64),
+        )
+        self.reset()
+        return batch
+
+
+def cigar_blocks(pos, cigar):
+    """根据 (op, length) 列表计算比对片段与参考终点
+
+    返回:
+        (blocks, ref_end)，blocks 为 [(start, end), ...]，语义与 pysam get_blocks 一致
+    """
+    blocks = []
+    ref = pos
+    for op, length in cigar:
+        if op in _ALIGNED:
+            blocks.append((ref, ref + length))
+        if op in _REF_CONSUMING:
+            ref += length
+    return blocks, ref
+
+
+# ---------------------------------------------------------------------------
+# samtools 后端
+# ---------------------------------------------------------------------------
+
+class SamtoolsBackend:
+    """通过单个 `samtools view` 子进程流式读取区域"""
+
+    name = 'samtools'
+
+    def __init__(self, bam_path):
+        # 缺失samtools视为依赖错误，交由调用方决定是否退出
+        try:
+            subprocess.run(['samtools', '--version'], capture_output=True, check=True)
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            raise FileNotFoundError("samtools not found in PATH") from e
+        self.bam_path = bam_path
+
+    def references(self):
+        """返回 [(染色体名, 长度), ...]"""
+        result = subprocess.run(['samtools', 'view', '-H', self.bam_path],
+                                capture_output=True, text=True, check=True)
+        refs = []
+        for line in result.stdout.split('\n'):
+            if not line.startswith('@SQ'):
+                continue
+            fields = dict(part.split(':', 1) for part in line.split('\t')[1:] if ':' in part)
+            refs.append((fields['SN'], int(fields['LN'])))
+        return refs
+
+    def fetch(self, chrom, start, end, with_blocks=True):
+        """流式读取与 [start, end) 重叠的reads，按批产出 ReadBatch"""
+        # samtools 区域为 1-based 闭区间，对应 0-based 半开区间 [start, end)
+        cmd = ['samtools', 'view', self.bam_path, f'{chrom}:{start + 1}-{end}']
+        # stderr 写入临时文件而非管道：samtools 大量告警时不会写满管道而阻塞
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+            try:
+                builder = _BatchBuilder(with_blocks)
+                for line in process.stdout:
+                    fields = line.split(b'\t', 10)
+                    # SAM 第4列为 1-based 起点
+                    pos = int(fields[3]) - 1
+                    blocks = ()
+                    if with_blocks and fields[5] != b'*':
+                        cigar = [(CIGAR_OPS.index(op.decode()), int(n)) for n, op in _CIGAR_RE.findall(fields[5])]
+                        blocks, _ = cigar_blocks(pos, cigar)
+                    seq = fields[9]
+                    builder.add(pos, int(fields[1]), 0 if seq == b'*' else len(seq), blocks)
+                    if len(builder) >= READ_CHUNK_SIZE:
+                        yield builder.build()
+                if len(builder):
+                    yield builder.build()
+
+                if process.wait() != 0:
+                    # 如果区域不存在或samtools出错，按无reads处理
+                    print(f"[WARN] samtools view 失败 ({chrom}:{start + 1}-{end}): {_read_stderr(stderr)}")
+            finally:
+                _close_process(process)
+
+    def scan(self, with_blocks=True):
+        """单个 `samtools view` 顺序读取整个BAM，按染色体产出 (chrom, ReadBatch)；跳过无坐标reads"""
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(['samtools', 'view', self.bam_path], stdout=subprocess.PIPE, stderr=stderr)
+            try:
+                builder = _BatchBuilder(with_blocks)
+                current = None
+                for line in process.stdout:
+                    fields = line.split(b'\t', 10)
+                    if fields[2] != current:
+                        if len(builder):
+                            yield current.decode(), builder.build()
+                        current = fields[2]
+                    if current == b'*':
+                        continue
+                    pos = int(fields[3]) - 1
+                    blocks = ()
+                    if with_blocks and fields[5] != b'*':
+                        cigar = [(CIGAR_OPS.index(op.decode()), int(n)) for n, op in _CIGAR_RE.findall(fields[5])]
+                        blocks, _ = cigar_blocks(pos, cigar)
+                    seq = fields[9]
+                    builder.add(pos, int(fields[1]), 0 if seq == b'*' else len(seq), blocks)
+                    if len(builder) >= READ_CHUNK_SIZE:
+                        yield current.decode(), builder.build()
+                if len(builder):
+                    yield current.decode(), builder.build()
+
+                if process.wait() != 0:
+                    raise OSError(f"samtools view 失败: {_read_stderr(stderr)}")
+            finally:
+                _close_process(process)
+
+
+def _read_stderr(stderr):
+    """读取写入临时文件的子进程 stderr"""
+    stderr.seek(0)
+    return stderr.read().decode(errors='replace').strip()
+
+
+def _close_process(process):
+    """结束 samtools 子进程：调用方提前停止迭代时终止进程，并始终回收"""
+    if process.poll() is None:
+        process.kill()
+    process.stdout.close()
+    process.wait()
+
+
+# ---------------------------------------------------------------------------
+# pysam 后端
+# ---------------------------------------------------------------------------
+
+class PysamBackend:
+    """通过 pysam 的索引 fetch 读取区域"""
+
+    name = 'pysam'
+
+    def __init__(self, bam_path):
+        import pysam
+        self.bam_path = bam_path
+        self.samfile = pysam.AlignmentFile(bam_path, "rb")
+
+    def references(self):
+        return list(zip(self.samfile.references, self.samfile.lengths))
+
+    def fetch(self, chrom, start, end, with_blocks=True):
+        builder = _BatchBuilder(with_blocks)
+        try:
+            reads = self.samfile.fetch(chrom, start, end)
+        except ValueError:
+            # 如果染色体名称在BAM里找不到，按无reads处理
+            return
+        for read in reads:
+            blocks = read.get_blocks() if with_blocks and not read.is_unmapped else ()
+            builder.add(read.reference_start, read.flag, read.query_length, blocks)
+            if len(builder) >= READ_CHUNK_SIZE:
+                yield builder.build()
+        if len(builder):
+            yield builder.build()
+
+    def scan(self, with_blocks=True):
+        """按文件顺序读取整个BAM（不经索引），按染色体产出 (chrom, ReadBatch)；跳过无坐标reads"""
+        builder = _BatchBuilder(with_blocks)
+        current = None
+        for read in self.samfile.fetch(until_eof=True):
+            chrom = read.reference_name
+            if chrom != current:
+                if len(builder):
+                    yield current, builder.build()
+                current = chrom
+            if chrom is None:
+                continue
+            blocks = read.get_blocks() if with_blocks and not read.is_unmapped else ()
+            builder.add(read.reference_start, read.flag, read.query_length, blocks)
+            if len(builder) >= READ_CHUNK_SIZE:
+                yield current, builder.build()
+        if len(builder):
+            yield current, builder.build()
+
+    def close(self):
+        self.samfile.close()
+
+
+# ---------------------------------------------------------------------------
+# 纯 Python BGZF/BAI 后端
+# ---------------------------------------------------------------------------
+
+class BgzfReader:
+    """最小化的 BGZF 读取器，支持按虚拟偏移 seek/tell"""
+
+    def __init__(self, path):
+        self.handle = open(path, 'rb')
+        self._block_offset = 0
+        self._next_block_offset = 0
+        self._data = b''
+        self._within = 0
+
+    def _load_block(self, offset):
+        self.handle.seek(offset)
+        header = self.handle.read(18)
+        if len(header) < 18:
+            self._block_offset = offset
+            self._next_block_offset = offset
+            self._data = b''
+            self._within = 0
+            return False
+        if header[:4] != b'\x1f\x8b\x08\x04':
+            raise ValueError(f"不是有效的BGZF块 (offset {offset})")
+        block_size = struct.unpack_from('<H', header, 16)[0] + 1
+        payload = self.handle.read(block_size - 18)
+        self._block_offset = offset
+        self._next_block_offset = offset + block_size
+        self._data = zlib.decompress(payload[:-8], -15)
+        self._within = 0
+        return True
+
+    def seek(self, virtual_offset):
+        offset, within = virtual_offset >> 16, virtual_offset & 0xFFFF
+        if offset != self._block_offset or not self._data:
+            self._load_block(offset)
+        self._within = within
+
+    def tell(self):
+        if self._within >= len(self._data) and self._data:
+            # 当前块已读完，虚拟偏移指向下一块起点
+            return self._next_block_offset << 16
+        return (self._block_offset << 16) | self._within
+
+    def read(self, size):
+        parts = []
+        while size > 0:
+            if self._within >= len(self._data):
+                if not self._load_block(self._next_block_offset):
+                    break
+                if not self._data:
+                    # 空块（如EOF标记块）
+                    continue
+            chunk = self._data[self._within:self._within + size]
+            self._within += len(chunk)
+            size -= len(chunk)
+            parts.append(chunk)
+        return b''.join(parts)
+
+    def close(self):
+        self.handle.close()
+
+
+def read_bam_header(reader):
+    """读取BAM头，返回 (header_text, [(name, length), ...])"""
+    if reader.read(4) != b'BAM\x01':
+        raise ValueError("不是有效的BAM文件")
+    l_text = struct.unpack('<i', reader.read(4))[0]
+    text = reader.read(l_text).rstrip(b'\x00').decode(errors='replace')
+    n_ref = struct.unpack('<i', reader.read(4))[0]
+    refs = []
+    for _ in range(n_ref):
+        l_name = struct.unpack('<i', reader.read(4))[0]
+        name = reader.read(l_name).rstrip(b'\x00').decode()
+        l_ref = struct.unpack('<i', reader.read(4))[0]
+        refs.append((name, l_ref))
+    return text, refs
+
+
+def read_bai(bai_path):
+    """解析 .bai 索引
+
+    返回:
+        (index, n_no_coor)；index 每个参考序列一项
+        {'bins': {bin: [(beg, end), ...]}, 'intervals': [ioffset, ...]}，
+        n_no_coor 为没有坐标的未比对reads数（索引中未记录时为 None）
+    """
+    with open(bai_path, 'rb') as f:
+        data = f.read()
+    if data[:4] != b'BAI\x01':
+        raise ValueError(f"不是有效的BAI索引: {bai_path}")
+    n_ref = struct.unpack_from('<i', data, 4)[0]
+    offset = 8
+    index = []
+    for _ in range(n_ref):
+        n_bin = struct.unpack_from('<i', data, offset)[0]
+        offset += 4
+        bins = {}
+        for _ in range(n_bin):
+            bin_id, n_chunk = struct.unpack_from('<Ii', data, offset)
+            offset += 8
+            chunks = struct.unpack_from(f'<{2 * n_chunk}Q', data, offset)
+            offset += 16 * n_chunk
+            bins[bin_id] = list(zip(chunks[0::2], chunks[1::2]))
+        n_intv = struct.unpack_from('<i', data, offset)[0]
+        offset += 4
+        intervals = list(struct.unpack_from(f'<{n_intv}Q', data, offset))
+        offset += 8 * n_intv
+        index.append({'bins': bins, 'intervals': intervals})
+    n_no_coor = struct.unpack_from('<Q', data, offset)[0] if len(data) >= offset + 8 else None
+    return index, n_no_coor
+
+
+# 每条参考序列的索引统计，字段与 samtools idxstats 输出一致
+IndexStat = namedtuple('IndexStat', ['name', 'length', 'mapped', 'unmapped'])
+
+# BAI 中记录 mapped/unmapped 数量的伪bin
+_PSEUDO_BIN = 37450
+
+
+def index_stats(bam_path):
+    """只读取BAM头与 .bai 索引，得到每条染色体的 mapped/unmapped 数
+
+    等价于 `samtools idxstats`，无需解压整个BAM。
+    返回:
+        IndexStat 列表，末尾追加 ('*', 0, 0, 无坐标reads数)
+    """
+    bai_path = bam_path + '.bai'
+    if not os.path.exists(bai_path):
+        raise FileNotFoundError(f"未找到索引文件 (.bai): {bai_path}")
+    reader = BgzfReader(bam_path)
+    try:
+        _, refs = read_bam_header(reader)
+    finally:
+        reader.close()
+    index, n_no_coor = read_bai(bai_path)
+    stats = []
+    for (name, length), ref_index in zip(refs, index):
+        pseudo = ref_index['bins'].get(_PSEUDO_BIN)
+        mapped, unmapped = pseudo[1] if pseudo and len(pseudo) > 1 else (0, 0)
+        stats.append(IndexStat(name, length, mapped, unmapped))
+    stats.append(IndexStat('*', 0, 0, n_no_coor or 0))
+    return stats
+
+
+def total_reads(stats):
+    """返回 (mapped总数, 全部记录数)，与 `samtools view -c` 计数口径一致"""
+    mapped = sum(s.mapped for s in stats)
+    return mapped, mapped + sum(s.unmapped for s in stats)
+
+
+def reg2bins(beg, end):
+    """返回与 [beg, end) 可能重叠的所有 BAI bin 编号（SAM规范 UCSC binning）"""
+    end -= 1
+    bins = [0]
+    for shift, first in ((26, 1), (23, 9), (20, 73), (17, 585), (14, 4681)):
+        bins.extend(range(first + (beg >> shift), first + (end >> shift) + 1))
+    return bins
+
+
+class PureBamBackend:
+    """纯 Python BAM 读取：BGZF 解压 + BAI 区间查询"""
+
+    name = 'pure'
+
+    def __init__(self, bam_path):
+        self.bam_path = bam_path
+        reader = BgzfReader(bam_path)
+        try:
+            self.header_text, self._refs = read_bam_header(reader)
+            # 头部之后第一条记录的虚拟偏移，供顺序扫描使用
+            self.first_record_offset = reader.tell()
+        finally:
+            reader.close()
+        self._tid = {name: i for i, (name, _) in enumerate(self._refs)}
+        self._index = None
+
+    def references(self):
+        return list(self._refs)
+
+    def _chunks(self, tid, start, end):
+        if self._index is None:
+            bai_path = self.bam_path + '.bai'
+            if not os.path.exists(bai_path):
+                raise FileNotFoundError(f"未找到索引文件 (.bai): {bai_path}")
+            self._index, _ = read_bai(bai_path)
+        ref_index = self._index[tid]
+        # 线性索引给出区间起点之前可以跳过的最小偏移
+        intervals = ref_index['intervals']
+        min_offset = intervals[min(start >> 14, len(intervals) - 1)] if intervals else 0
+        chunks = []
+        for bin_id in reg2bins(start, end):
+            for beg, chunk_end in ref_index['bins'].get(bin_id, ()):
+                if chunk_end > min_offset:
+                    chunks.append((max(beg, min_offset), chunk_end))
+        chunks.sort()
+        merged = []
+        for beg, chunk_end in chunks:
+            if merged and beg <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], chunk_end)
+            else:
+                merged.append([beg, chunk_end])
+        return merged
+
+    @staticmethod
+    def _parse_record(data):
+        """解析一条BAM记录（不含 block_size 前缀），返回 (tid, pos, flag, qlen, blocks, ref_end)"""
+        tid, pos, l_read_name, _mapq, _bin, n_cigar, flag, l_seq = struct.unpack_from('<iiBBHHHi', data, 0)
+        ref_end = pos + 1
+        blocks = ()
+        if n_cigar:
+            # 无论是否需要blocks都解析CIGAR，以得到判断区间重叠所需的参考终点
+            raw = struct.unpack_from(f'<{n_cigar}I', data, 32 + l_read_name)
+            blocks, end = cigar_blocks(pos, [(c & 0xF, c >> 4) for c in raw])
+            ref_end = max(end, ref_end)
+        return tid, pos, flag, l_seq, blocks, ref_end
+
+    def _iter_records(self, reader, stop_offset=None):
+        """从当前位置逐条读取原始记录；到达 stop_offset 或文件末尾时停止"""
+        while stop_offset is None or reader.tell() < stop_offset:
+            size_bytes = reader.read(4)
+            if len(size_bytes) < 4:
+                return
+            block_size = struct.unpack('<i', size_bytes)[0]
+            yield reader.read(block_size)
+
+    def fetch_records(self, chrom, start, end):
+        """经索引产出与 [start, end) 重叠的原始记录
+
+        产出 (虚拟偏移, 记录字节(不含 block_size 前缀), _parse_record 结果)；
+        虚拟偏移可用于跨区间去重。
+        """
+        tid = self._tid.get(chrom)
+        if tid is None:
+            # 如果染色体名称在BAM里找不到，按无reads处理
+            return
+        reader = BgzfReader(self.bam_path)
+        try:
+            for chunk_beg, chunk_end in self._chunks(tid, start, end):
+                reader.seek(chunk_beg)
+                while reader.tell() < chunk_end:
+                    voffset = reader.tell()
+                    data = next(self._iter_records(reader), None)
+                    if data is None:
+                        break
+                    record = self._parse_record(data)
+                    r_tid, pos, ref_end = record[0], record[1], record[5]
+                    if r_tid != tid or pos >= end:
+                        break
+                    if ref_end <= start:
+                        continue
+                    yield voffset, data, record
+        finally:
+            reader.close()
+
+    def fetch(self, chrom, start, end, with_blocks=True):
+        builder = _BatchBuilder(with_blocks)
+        for _, _, (_, pos, flag, qlen, blocks, _) in self.fetch_records(chrom, start, end):
+            builder.add(pos, flag, qlen, blocks)
+            if len(builder) >= READ_CHUNK_SIZE:
+                yield builder.build()
+        if len(builder):
+            yield builder.build()
+
+
+    def scan(self, with_blocks=True):
+        """从第一条记录起顺序解压整个BAM（不经索引），按染色体产出 (chrom, ReadBatch)；跳过无坐标reads"""
+        builder = _BatchBuilder(with_blocks)
+        current = None
+        reader = BgzfReader(self.bam_path)
+        try:
+            reader.seek(self.first_record_offset)
+            for data in self._iter_records(reader):
+                tid, pos, flag, qlen, blocks, _ = self._parse_record(data)
+                if tid != current:
+                    if len(builder):
+                        yield self._refs[current][0], builder.build()
+                    current = tid
+                if tid < 0:
+                    # 无坐标reads排在文件末尾
+                    break
+                builder.add(pos, flag, qlen, blocks)
+                if len(builder) >= READ_CHUNK_SIZE:
+                    yield self._refs[current][0], builder.build()
+        finally:
+            reader.close()
+        if len(builder):
+            yield self._refs[current][0], builder.build()
+
+    def close(self):
+        """每次读取各自打开并关闭文件，这里只释放缓存的索引"""
+        self._index = None
+
+
+def open_backend(bam_path, backend='auto'):
+    """按名称创建读取后端；auto 依次尝试 pysam、samtools、pure"""
+    if backend == 'auto':
+        for name in BACKENDS:
+            try:
+                return open_backend(bam_path, name)
+            except (ImportError, FileNotFoundError):
+                continue
+        raise FileNotFoundError("没有可用的BAM读取后端")
+    if backend == 'pysam':
+        return PysamBackend(bam_path)
+    if backend == 'samtools':
+        return SamtoolsBackend(bam_path)
+    if backend == 'pure':
+        return PureBamBackend(bam_path)
+    raise ValueError(f"未知的BAM后端: {backend}（可选: auto, {', '.join(BACKENDS)}）")
+
+
+# ---------------------------------------------------------------------------
+# 计数规则
+# ---------------------------------------------------------------------------
+
+def _count_raw(batch, start, end, bin_size, n_bins):
+    """raw 规则：每条记录计入起点所在bin，起点落在区间外的不计"""
+    pos = batch.pos[(batch.pos >= start) & (batch.pos < end)]
+    return np.bincount((pos - start) // bin_size, minlength=n_bins)[:n_bins]
+
+
+def _count_overlap50(batch, start, end, bin_size, n_bins):
+    """overlap50 规则：read 在bin内的比对碱基数 / read长度 > 0.5 时计入该bin
+
+    向量化实现：把每个比对片段 (block) 展开为它跨越的 (block, bin) 对，
+    计算每对的重叠碱基数，再按 (read, bin) 求和后统一判断，结果与逐bin
+    调用 pysam get_overlap 的原始算法一致。
+    """
+    keep = (batch.flag & (FLAG_UNMAPPED | FLAG_SECONDARY)) == 0
+    block_keep = keep[batch.block_read]
+    block_read = batch.block_read[block_keep]
+    block_start = batch.block_start[block_keep]
+    block_end = batch.block_end[block_keep]
+
+    # 每个block跨越的bin范围，截断到 [0, n_bins)
+    first_bin = np.maximum((block_start - start) // bin_size, 0)
+    last_bin = np.minimum((block_end - 1 - start) // bin_size, n_bins - 1)
+    span = last_bin - first_bin + 1
+    valid = span > 0
+    block_read, block_start, block_end = block_read[valid], block_start[valid], block_end[valid]
+    first_bin, span = first_bin[valid], span[valid]
+    if span.size == 0:
+        return np.zeros(n_bins, dtype=np.int64)
+
+    # 展开为 (block, bin) 对：pair_bin = first_bin + 0..span-1
+    pair_block = np.repeat(np.arange(span.size), span)
+    pair_offset = np.arange(pair_block.size) - np.repeat(np.cumsum(span) - span, span)
+    pair_bin = first_bin[pair_block] + pair_offset
+    bin_start = start + pair_bin * bin_size
+    overlap = (np.minimum(block_end[pair_block], bin_start + bin_size)
+               - np.maximum(block_start[pair_block], bin_start))
+
+    # 同一read的block按参考坐标递增，(read, bin) 相同的对在数组中连续，分段求和
+    pair_read = block_read[pair_block]
+    new_group = np.empty(pair_bin.size, dtype=bool)
+    new_group[0] = True
+    new_group[1:] = (pair_read[1:] != pair_read[:-1]) | (pair_bin[1:] != pair_bin[:-1])
+    group_first = np.flatnonzero(new_group)
+    group_overlap = np.add.reduceat(overlap, group_first)
+    group_read = pair_read[group_first]
+    group_bin = pair_bin[group_first]
+
+    read_len = np.maximum(batch.qlen[group_read], 0)
+    read_len[read_len == 0] = 1
+    # 核心算法：重叠部分 > 50%（整数比较，等价于 overlap / read_len > 0.5）
+    passed = group_overlap * 2 > read_len
+    return np.bincount(group_bin[passed], minlength=n_bins)[:n_bins]
+
+
+_RULES = {
+    'raw': _count_raw,
+    'overlap50': _count_overlap50,
+}
+
+
+def count_bins(backend, chrom, start, end, bin_size, rule='raw'):
+    """使用已打开的后端对 [start, end) 单次遍历计数，返回与bin一一对应的 numpy 数组"""
+    if rule not in _RULES:
+        raise ValueError(f"未知的计数规则: {rule}（可选: {', '.join(COUNT_RULES)}）")
+    n_bins = len(range(start, end, bin_size))
+    counts = np.zeros(n_bins, dtype=np.int64)
+    if n_bins == 0:
+        return counts
+    # overlap50 需要覆盖到最后一个bin的完整范围
+    fetch_end = start + n_bins * bin_size if rule == 'overlap50' else end
+    for batch in backend.fetch(chrom, start, fetch_end, with_blocks=(rule == 'overlap50')):
+        counts += _RULES[rule](batch, start, end, bin_size, n_bins)
+    return counts
+
+
+def count_bins_multi(backend, chrom, regions, bin_size, rule='raw'):
+    """对同一染色体上相互重叠/相邻的多个区间只读取一次BAM，分别计数
+
+    参数:
+        regions: [(start, end), ...]，读取范围为它们的并集外包区间
+    返回:
+        与 regions 一一对应的 numpy 数组列表，每个结果与单独调用 count_bins 相同
+    """
+    if rule not in _RULES:
+        raise ValueError(f"未知的计数规则: {rule}（可选: {', '.join(COUNT_RULES)}）")
+    n_bins = [len(range(start, end, bin_size)) for start, end in regions]
+    results = [np.zeros(n, dtype=np.int64) for n in n_bins]
+    active = [i for i, n in enumerate(n_bins) if n]
+    if not active:
+        return results
+    fetch_start = min(regions[i][0] for i in active)
+    if rule == 'overlap50':
+        fetch_end = max(regions[i][0] + n_bins[i] * bin_size for i in active)
+    else:
+        fetch_end = max(regions[i][1] for i in active)
+    for batch in backend.fetch(chrom, fetch_start, fetch_end, with_blocks=(rule == 'overlap50')):
+        for i in active:
+            start, end = regions[i]
+            results[i] += _RULES[rule](batch, start, end, bin_size, n_bins[i])
+    return results
+
+
+def get_counts(bam_file, chrom, start, end, bin_size, backend='auto', rule='raw'):
+    """计算指定区间内每个bin的符合条件的reads数
+
+    参数:
+        bam_file: 已排序并建立索引的BAM路径，或已打开的后端对象
+        backend: auto / pysam / samtools / pure
+        rule: raw（按起点计数）/ overlap50（比对重叠 > 50%）
+    返回:
+        (bins, counts)，bins 为每个bin的起点列表
+    """
+    bins = range(start, end, bin_size)
+    owned = isinstance(bam_file, str)
+    reader = open_backend(bam_file, backend) if owned else bam_file
+    try:
+        counts = count_bins(reader, chrom, start, end, bin_size, rule)
+    finally:
+        # 只关闭本函数自己打开的后端，传入的后端由调用方管理
+        if owned and hasattr(reader, 'close'):
+            reader.close()
+    return list(bins), counts.tolist()
+
+
+def _count_contig(bam_path, backend, chrom, length, bin_size, rule):
+    """并行工作进程：各自打开后端，经索引读取单条染色体"""
+    reader = open_backend(bam_path, backend)
+    try:
+        return chrom, count_bins(reader, chrom, 0, length, bin_size, rule)
+    finally:
+        if hasattr(reader, 'close'):
+            reader.close()
+
+
+def count_genome(bam_file, bin_size, rule='raw', backend='auto', workers=1, chroms=None):
+    """对全部染色体分bin计数
+
+    workers <= 1 时单次顺序读取整个BAM（不经索引），所有染色体同时分bin；
+    workers > 1 时每条染色体一个任务，由进程池经索引并行读取。
+    参数:
+        bam_file: BAM路径或已打开的后端对象
+        chroms: [(染色体名, 长度), ...]，默认为BAM头中全部长度大于0的序列
+    返回:
+        {染色体名: counts数组}，按 chroms 顺序
+    """
+    if rule not in _RULES:
+        raise ValueError(f"未知的计数规则: {rule}（可选: {', '.join(COUNT_RULES)}）")
+    owned = isinstance(bam_file, str)
+    reader = open_backend(bam_file, backend) if owned else bam_file
+    try:
+        if chroms is None:
+            chroms = [(name, length) for name, length in reader.references() if length > 0]
+        lengths = dict(chroms)
+
+        if workers <= 1:
+            counts = {name: np.zeros(len(range(0, length, bin_size)), dtype=np.int64) for name, length in chroms}
+            for chrom, batch in reader.scan(with_blocks=(rule == 'overlap50')):
+                if chrom in counts:
+                    counts[chrom] += _RULES[rule](batch, 0, lengths[chrom], bin_size, len(counts[chrom]))
+            return counts
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # 长染色体先提交，减少尾部等待
+            futures = [pool.submit(_count_contig, reader.bam_path, reader.name, name, length, bin_size, rule)
+                       for name, length in sorted(chroms, key=lambda c: -c[1])]
+            for future in futures:
+                chrom, chrom_counts = future.result()
+                results[chrom] = chrom_counts
+        return {name: results[name] for name, _ in chroms}
+    finally:
+        if owned and hasattr(reader, 'close'):
+            reader.close()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WORF-Seq 目标区域 BAM 切片
+
+把目标位点 ±50 kb 窗口（以及可选的富集热点）内的reads原样复制到一个
+带 .bai 索引的小BAM，供 app 下载和 WGSmapping 重新分析，避免每次
+读取/传输数 GB 的原始BAM。
+
+切片用纯 Python 写出（BGZF 压缩 + 构建 BAI），不依赖 samtools/pysam；
+记录字节与原BAM完全相同，因此任何后端对切片区间的计数与原BAM一致。
+
+BAM头末尾追加一行 @CO，记录切片来源与原BAM的索引统计，用于:
+    - 判断切片是否仍对应当前的原BAM（路径、大小、修改时间）
+    - 直接以切片作为输入重新分析时保持 CPM 标准化口径不变
+"""
+import json
+import os
+import struct
+import sys
+import zlib
+
+from bam_backends import IndexStat, BgzfReader, PureBamBackend, index_stats, read_bam_header, total_reads
+from coverage_cache import bam_identity
+
+SLICE_TAG = 'WORF-Seq-slice'
+SLICE_VERSION = 1
+# 每个BGZF块未压缩数据上限（与 htslib 一致，保证压缩后不超过 64 KB）
+BGZF_BLOCK_SIZE = 0xff00
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+# BAI 线性索引窗口 16 kb
+LINEAR_SHIFT = 14
+_PSEUDO_BIN = 37450
+
+
+class BgzfWriter:
+    """最小化的 BGZF 写入器，tell() 返回下一字节的虚拟偏移"""
+
+    def __init__(self, path, level=6):
+        self.handle = open(path, 'wb')
+        self.level = level
+        self._buffer = bytearray()
+        self._block_offset = 0
+
+    def tell(self):
+        return (self._block_offset << 16) | len(self._buffer)
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= BGZF_BLOCK_SIZE:
+            self._flush_block(bytes(self._buffer[:BGZF_BLOCK_SIZE]))
+            del self._buffer[:BGZF_BLOCK_SIZE]
+
+    def write_record(self, data):
+        """写入一条记录并返回其起始虚拟偏移；当前块放不下时先换块，避免记录跨块"""
+        if self._buffer and len(self._buffer) + len(data) > BGZF_BLOCK_SIZE:
+            self.flush()
+        voffset = self.tell()
+        self.write(data)
+        return voffset
+
+    def flush(self):
+        if self._buffer:
+            self._flush_block(bytes(self._buffer))
+            self._buffer.clear()
+
+    def _flush_block(self, data):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        cdata = compressor.compress(data) + compressor.flush()
+        block_size = 18 + len(cdata) + 8
+        header = struct.pack('<4BIBBHBBHH', 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, 66, 67, 2, block_size - 1)
+        self.handle.write(header + cdata + struct.pack('<II', zlib.crc32(data), len(data)))
+        self._block_offset += block_size
+
+    def close(self):
+        self.flush()
+        self.handle.write(BGZF_EOF)
+        self.handle.close()
+
+
+def reg2bin(beg, end):
+    """返回完全包含 [beg, end) 的最小 BAI bin（SAM规范）"""
+    end -= 1
+    for shift, first in ((14, 4681), (17, 585), (20, 73), (23, 9), (26, 1)):
+        if beg >> shift == end >> shift:
+            return first + (beg >> shift)
+    return 0
+
+
+class _RefIndex:
+    """单条参考序列的 BAI 索引累加器"""
+
+    def __init__(self):
+        self.bins = {}
+        self.intervals = []
+        self.first = None
+        self.last = None
+        self.mapped = 0
+        self.unmapped = 0
+
+    def add(self, beg, end, voff_beg, voff_end, unmapped):
+        chunks = self.bins.setdefault(reg2bin(beg, end), [])
+        if chunks and chunks[-1][1] == voff_beg:
+            chunks[-1][1] = voff_end
+        else:
+            chunks.append([voff_beg, voff_end])
+        for window in range(beg >> LINEAR_SHIFT, ((end - 1) >> LINEAR_SHIFT) + 1):
+            if window >= len(self.intervals):
+                self.intervals.extend([0] * (window + 1 - len(self.intervals)))
+            if not self.intervals[window]:
+                self.intervals[window] = voff_beg
+        if self.first is None:
+            self.first = voff_beg
+        self.last = voff_end
+        if unmapped:
+            self.unmapped += 1
+        else:
+            self.mapped += 1
+
+    def pack(self):
+        bins = dict(self.bins)
+        if self.first is not None:
+            bins[_PSEUDO_BIN] = [[self.first, self.last], [self.mapped, self.unmapped]]
+        # 空窗口沿用前一个非零偏移（与 htslib 一致）
+        intervals = list(self.intervals)
+        for i in range(1, len(intervals)):
+            if not intervals[i]:
+                intervals[i] = intervals[i - 1]
+        parts = [struct.pack('<i', len(bins))]
+        for bin_id, chunks in bins.items():
+            parts.append(struct.pack('<Ii', bin_id, len(chunks)))
+            parts.extend(struct.pack('<QQ', *chunk) for chunk in chunks)
+        parts.append(struct.pack('<i', len(intervals)))
+        parts.append(struct.pack(f'<{len(intervals)}Q', *intervals))
+        return b''.join(parts)
+
+
+def merge_regions(regions):
+    """按染色体合并重叠/相邻区间，返回 {chrom: [(start, end), ...]}（保持染色体首次出现顺序）"""
+    by_chrom = {}
+    for chrom, start, end in regions:
+        by_chrom.setdefault(chrom, []).append((max(0, int(start)), int(end)))
+    merged = {}
+    for chrom, spans in by_chrom.items():
+        out = []
+        for start, end in sorted(spans):
+            if out and start <= out[-1][1]:
+                out[-1] = (out[-1][0], max(out[-1][1], end))
+            else:
+                out.append((start, end))
+        merged[chrom] = out
+    return merged
+
+
+def _encode_header(text, refs):
+    data = [b'BAM\x01', struct.pack('<i', len(text)), text.encode(), struct.pack('<i', len(refs))]
+    for name, length in refs:
+        name_bytes = name.encode() + b'\x00'
+        data += [struct.pack('<i', len(name_bytes)), name_bytes, struct.pack('<i', length)]
+    return b''.join(data)
+
+
+def write_bam_slice(bam_path, out_path, regions, stats=None, label=None):
+    """把 regions 内的reads写成带 .bai 索引的切片BAM
+
+    参数:
+        bam_path: 已建索引的坐标排序BAM
+        out_path: 输出切片路径（同时写 out_path + '.bai'）
+        regions: [(chrom, start, end), ...]，重叠区间自动合并，跨区间的read只写一次
+        stats: 原BAM的 index_stats 结果，省略时从索引读取
+        label: 写入元数据的说明（如 'targets' / 'hotspots'）
+    返回:
+        写入的记录数
+    """
+    source = PureBamBackend(bam_path)
+    try:
+        if stats is None:
+            stats = index_stats(bam_path)
+        refs = source.references()
+        tid_of = {name: i for i, (name, _) in enumerate(refs)}
+        merged = merge_regions(regions)
+        # 按BAM中的染色体顺序写出，保证切片仍是坐标排序
+        ordered = sorted((c for c in merged if c in tid_of), key=tid_of.get)
+        real_path, size, mtime_ns = bam_identity(bam_path)
+        meta = {
+            'version': SLICE_VERSION, 'label': label, 'source': real_path, 'size': size, 'mtime_ns': mtime_ns,
+            'regions': [[c, s, e] for c in ordered for s, e in merged[c]],
+            'index_stats': [list(stat) for stat in stats],
+        }
+        header_text = source.header_text.rstrip('\n')
+        header_text = (header_text + '\n' if header_text else '') + f"@CO\t{SLICE_TAG}\t{json.dumps(meta, separators=(',', ':'))}\n"
+
+        tmp_path = out_path + '.tmp'
+        writer = BgzfWriter(tmp_path)
+        indexes = [_RefIndex() for _ in refs]
+        n_records = 0
+        try:
+            writer.write(_encode_header(header_text, refs))
+            # 头部单独成块，第一条记录从新块开始
+            writer.flush()
+            for chrom in ordered:
+                ref_index = indexes[tid_of[chrom]]
+                seen = set()
+                for start, end in merged[chrom]:
+                    for voffset, data, (_, pos, flag, _, _, ref_end) in source.fetch_records(chrom, start, end):
+                        if voffset in seen:
+                            continue
+                        seen.add(voffset)
+                        voff_beg = writer.write_record(struct.pack('<i', len(data)) + data)
+                        ref_index.add(pos, max(ref_end, pos + 1), voff_beg, writer.tell(), flag & 0x4)
+                        n_records += 1
+            writer.close()
+            with open(out_path + '.bai.tmp', 'wb') as f:
+                f.write(b'BAI\x01' + struct.pack('<i', len(refs)))
+                for ref_index in indexes:
+                    f.write(ref_index.pack())
+                f.write(struct.pack('<Q', 0))
+        except BaseException:
+            writer.handle.close()
+            for path in (tmp_path, out_path + '.bai.tmp'):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        os.replace(tmp_path, out_path)
+        os.replace(out_path + '.bai.tmp', out_path + '.bai')
+        return n_records
+    finally:
+        source.close()
+
+
+def read_slice_info(bam_path):
+    """读取切片BAM头中的元数据；不是切片（或无法读取）时返回 None"""
+    try:
+        reader = BgzfReader(bam_path)
+        try:
+            text, _ = read_bam_header(reader)
+        finally:
+            reader.close()
+    except (OSError, ValueError, struct.error):
+        return None
+    for line in text.splitlines():
+        fields = line.split('\t', 2)
+        if len(fields) == 3 and fields[0] == '@CO' and fields[1] == SLICE_TAG:
+            try:
+                info = json.loads(fields[2])
+            except ValueError:
+                return None
+            info['regions'] = [tuple(r) for r in info.get('regions', [])]
+            info['index_stats'] = [IndexStat(*s) for s in info.get('index_stats', [])]
+            return info
+    return None
+
+
+def slice_covers(info, chrom, start, end):
+    """切片是否完整覆盖 [start, end)"""
+    return any(c == chrom and s <= start and end <= e for c, s, e in info['regions'])
+
+
+def find_slice(slice_path, bam_path):
+    """返回与 bam_path 当前内容对应的切片元数据；切片不存在、无索引或已过期时返回 None"""
+    if not (os.path.exists(slice_path) and os.path.exists(slice_path + '.bai')):
+        return None
+    info = read_slice_info(slice_path)
+    if info is None or info.get('version') != SLICE_VERSION:
+        return None
+    try:
+        if (info['source'], info['size'], info['mtime_ns']) != bam_identity(bam_path):
+            return None
+    except OSError:
+        return None
+    return info
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Write an indexed BAM slice of target regions, or show slice metadata')
+    parser.add_argument('bam', help='Input sorted/indexed BAM (or a slice with --info)')
+    parser.add_argument('--region', action='append', default=[], help='chrom:start-end, may be repeated')
+    parser.add_argument('--out', help='Output slice BAM path')
+    parser.add_argument('--info', action='store_true', help='Print the metadata stored in a slice BAM')
+    args = parser.parse_args()
+
+    if args.info:
+        info = read_slice_info(args.bam)
+        if info is None:
+            print(f"[ERROR] 不是 WORF-Seq 切片BAM: {args.bam}")
+            sys.exit(1)
+        mapped, records = total_reads(info['index_stats'])
+        print(f"[INFO] 来源: {info['source']} ({info['size']:,} bytes)")
+        print(f"[INFO] 原BAM reads: {records:,} (已比对 {mapped:,})")
+        for chrom, start, end in info['regions']:
+            print(f"{chrom}\t{start}\t{end}")
+        sys.exit(0)
+    if not args.region or not args.out:
+        parser.error('--region and --out are required unless --info is given')
+    regions = []
+    for region in args.region:
+        chrom, _, span = region.partition(':')
+        lo, _, hi = span.replace(',', '').partition('-')
+        regions.append((chrom, int(lo), int(hi)))
+    n = write_bam_slice(args.bam, args.out, regions)
+    print(f"[INFO] 已写入 {n:,} 条reads: {args.out}")
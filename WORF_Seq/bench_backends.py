@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BAM读取后端基准测试
+
+在同一个BAM区间上依次运行每个可用后端与计数规则，输出耗时、
+读取吞吐量 (reads/s)，并检查各后端的计数结果是否一致。
+
+使用示例:
+  python bench_backends.py --bam sample.sorted.bam --chrom chr6
+  python bench_backends.py --bam sample.sorted.bam --chrom chr6 --start 31000000 --end 32000000 --bin 500
+  python bench_backends.py --bam sample.sorted.bam --chrom chr6 --bin 500 --check-reference
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from bam_backends import BACKENDS, COUNT_RULES, count_bins, open_backend
+
+
+def count_records(reader, chrom, start, end):
+    """统计后端在区间内产出的read数量（用于计算吞吐量）"""
+    return sum(len(batch.pos) for batch in reader.fetch(chrom, start, end, with_blocks=False))
+
+
+def reference_overlap50(bam_path, chrom, start, end, bin_size):
+    """原始 WORF-Seq/WGSmapping.py 的 overlap50 实现：逐bin fetch 并调用 pysam get_overlap
+
+    仅用于校验向量化实现，速度很慢。
+    """
+    import pysam
+
+    counts = []
+    with pysam.AlignmentFile(bam_path, "rb") as samfile:
+        for b_start in range(start, end, bin_size):
+            b_end = b_start + bin_size
+            bin_count = 0
+            try:
+                for read in samfile.fetch(chrom, b_start, b_end):
+                    if read.is_unmapped or read.is_secondary:
+                        continue
+                    overlap = read.get_overlap(b_start, b_end)
+                    read_len = read.query_length if read.query_length > 0 else 1
+                    if (overlap / read_len) > 0.5:
+                        bin_count += 1
+            except ValueError:
+                bin_count = 0
+            counts.append(bin_count)
+    return np.asarray(counts, dtype=np.int64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较 WORF-Seq BAM 读取后端的吞吐量与计数一致性')
+    parser.add_argument('--bam', required=True, help='已排序并建立索引的BAM文件')
+    parser.add_argument('--chrom', required=True, help='测试染色体')
+    parser.add_argument('--start', type=int, default=0, help='区间起点 (0-based, 默认: 0)')
+    parser.add_argument('--end', type=int, default=None, help='区间终点 (默认: 染色体长度)')
+    parser.add_argument('--bin', type=int, default=100000, help='bin大小 (bp, 默认: 100000)')
+    parser.add_argument('--backends', default=','.join(BACKENDS),
+                        help=f'逗号分隔的后端列表 (默认: {",".join(BACKENDS)})')
+    parser.add_argument('--rules', default=','.join(COUNT_RULES),
+                        help=f'逗号分隔的计数规则 (默认: {",".join(COUNT_RULES)})')
+    parser.add_argument('--check-reference', action='store_true',
+                        help='同时运行原始逐bin pysam get_overlap 实现，校验 overlap50 结果完全一致（需要 pysam）')
+    args = parser.parse_args()
+
+    readers = []
+    for name in args.backends.split(','):
+        try:
+            readers.append(open_backend(args.bam, name))
+        except (ImportError, FileNotFoundError) as e:
+            print(f"[SKIP] 后端 {name} 不可用: {e}")
+    if not readers:
+        print("[ERROR] 没有可用的后端")
+        sys.exit(1)
+
+    end = args.end
+    if end is None:
+        end = dict(readers[0].references()).get(args.chrom)
+        if end is None:
+            print(f"[ERROR] BAM中不存在染色体 {args.chrom}")
+            sys.exit(1)
+
+    print(f"[INFO] 区间: {args.chrom}:{args.start:,}-{end:,}  bin: {args.bin:,} bp")
+    print(f"{'rule':<10} {'backend':<10} {'reads':>12} {'seconds':>9} {'reads/s':>12} {'total':>12}  consistent")
+
+    mismatches = 0
+    for rule in args.rules.split(','):
+        reference = None
+        for reader in readers:
+            n_reads = count_records(reader, args.chrom, args.start, end)
+            t0 = time.perf_counter()
+            counts = count_bins(reader, args.chrom, args.start, end, args.bin, rule)
+            elapsed = time.perf_counter() - t0
+            if reference is None:
+                reference = counts
+                consistent = '-'
+            else:
+                same = len(counts) == len(reference) and bool((counts == reference).all())
+                consistent = 'yes' if same else 'NO'
+                mismatches += 0 if same else 1
+            rate = n_reads / elapsed if elapsed > 0 else float('inf')
+            print(f"{rule:<10} {reader.name:<10} {n_reads:>12,} {elapsed:>9.3f} {rate:>12,.0f} {int(counts.sum()):>12,}  {consistent}")
+
+    if args.check_reference and 'overlap50' in args.rules.split(','):
+        try:
+            t0 = time.perf_counter()
+            expected = reference_overlap50(args.bam, args.chrom, args.start, end, args.bin)
+            elapsed = time.perf_counter() - t0
+        except ImportError:
+            print("[SKIP] 未安装 pysam，无法运行参考实现")
+        else:
+            for reader in readers:
+                counts = count_bins(reader, args.chrom, args.start, end, args.bin, 'overlap50')
+                same = len(counts) == len(expected) and bool((counts == expected).all())
+                mismatches += 0 if same else 1
+                if not same:
+                    diff = np.flatnonzero(counts != expected)[:5] if len(counts) == len(expected) else []
+                    print(f"[ERROR] {reader.name} 与参考实现不一致，前几个不同的bin: "
+                          f"{[(args.start + int(i) * args.bin, int(counts[i]), int(expected[i])) for i in diff]}")
+            print(f"{'overlap50':<10} {'reference':<10} {'':>12} {elapsed:>9.3f} {'':>12} {int(expected.sum()):>12,}  "
+                  f"{'yes' if not mismatches else 'NO'}")
+
+    if mismatches:
+        print(f"[ERROR] {mismatches} 个后端的计数结果与参考后端不一致")
+        sys.exit(1)
+    print("[SUCCESS] 所有后端计数结果一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WORF-Seq 分bin覆盖度磁盘缓存
+
+全染色体背景只取决于 BAM、染色体、步长与计数规则，与 --center 无关。
+缓存以 (BAM真实路径, 文件大小, 修改时间, 染色体, 区间, bin大小, 计数规则)
+为键，计数以压缩 .npz 存储；总大小超过上限时按最近使用时间 (LRU) 淘汰。
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from bam_backends import get_counts
+
+# 缓存格式或计数语义变化时递增，使旧缓存自动失效
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.environ.get('WORF_SEQ_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'worf_seq_cache'))
+DEFAULT_MAX_MB = 512
+
+
+def bam_identity(bam_path):
+    """返回标识BAM内容的 (真实路径, 大小, 修改时间ns)；临时目录中的符号链接会解析到同一文件"""
+    real_path = os.path.realpath(bam_path)
+    st = os.stat(real_path)
+    return real_path, st.st_size, st.st_mtime_ns
+
+
+def cache_key(bam_path, chrom, start, end, bin_size, rule):
+    """计算缓存键（sha1十六进制）"""
+    ident = [CACHE_VERSION, *bam_identity(bam_path), chrom, start, end, bin_size, rule]
+    return hashlib.sha1(json.dumps(ident).encode()).hexdigest()
+
+
+class CoverageCache:
+    """基于目录的 .npz 覆盖度缓存，按文件修改时间实现 LRU 淘汰"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, bam_path, chrom, start, end, bin_size, rule):
+        """命中时返回计数数组并刷新其LRU时间，否则返回 None"""
+        path = self._path(cache_key(bam_path, chrom, start, end, bin_size, rule))
+        try:
+            with np.load(path) as data:
+                counts = data['counts']
+        except (OSError, KeyError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return counts
+
+    def put(self, bam_path, chrom, start, end, bin_size, rule, counts):
+        """写入缓存（先写临时文件再原子替换），随后按容量上限淘汰"""
+        key = cache_key(bam_path, chrom, start, end, bin_size, rule)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, counts=np.asarray(counts, dtype=np.int64),
+                                    meta=json.dumps([chrom, start, end, bin_size, rule]))
+            # mkstemp 默认 0600，放宽为可被其他用户的运行读取
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """删除最久未使用的条目，直到总大小不超过上限"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def get_counts_cached(cache, reader, bam_path, chrom, start, end, bin_size, rule='raw'):
+    """带缓存的 get_counts；cache 为 None 时直接读取BAM
+
+    返回:
+        (bins, counts, hit)，hit 表示是否命中缓存（未读取BAM）
+    """
+    bins = list(range(start, end, bin_size))
+    if cache is not None:
+        counts = cache.get(bam_path, chrom, start, end, bin_size, rule)
+        if counts is not None and len(counts) == len(bins):
+            return bins, counts.tolist(), True
+    bins, counts = get_counts(reader, chrom, start, end, bin_size, rule=rule)
+    if cache is not None:
+        try:
+            cache.put(bam_path, chrom, start, end, bin_size, rule, counts)
+        except OSError as e:
+            print(f"[WARN] 写入覆盖度缓存失败: {e}")
+    return bins, counts, False
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WORF-Seq 多分辨率覆盖度金字塔（类似 bigWig 的缩放层级）
+
+一次BAM遍历得到 100 bp 基础层，再逐级求和得到 1 kb / 10 kb / 100 kb 层，
+写入单个紧凑二进制文件。读取端用 np.memmap 按需映射，任意窗口都从
+分辨率合适的层级切片，缩放/平移无需重新读取BAM。
+
+文件格式（小端）:
+    8 字节 magic  b'WORFPYR1'
+    4 字节 uint32 JSON头长度
+    JSON头        {"version", "base_bin", "rule", "source", "chroms": [{"name", "length",
+                   "levels": [{"bin_size", "n_bins", "offset"}]}]}
+                  source 记录生成金字塔的BAM {"bam", "size", "mtime_ns", "references"}，
+                  与当前BAM一致时可直接复用，无需重新遍历BAM
+    数据区        各层 uint32 计数数组，offset 为相对文件起点的字节偏移（8字节对齐）
+
+金字塔统一使用 raw 规则（按read起点计数），该计数可逐级相加；
+overlap50 依赖bin边界，不能由细层级求和得到。
+"""
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b'WORFPYR1'
+PYRAMID_VERSION = 1
+BASE_BIN = 100
+# 相邻层级的放大倍数：100 bp -> 1 kb -> 10 kb -> 100 kb
+LEVEL_FACTORS = (10, 10, 10)
+DEFAULT_MAX_BINS = 2000
+
+
+def pyramid_levels(base_counts, factors=LEVEL_FACTORS):
+    """由基础层逐级求和，返回 [(bin_size倍数, counts), ...]，第一项为基础层"""
+    levels = [(1, np.asarray(base_counts, dtype=np.uint32))]
+    scale = 1
+    for factor in factors:
+        prev = levels[-1][1]
+        n = -(-len(prev) // factor)
+        padded = np.zeros(n * factor, dtype=np.uint64)
+        padded[:len(prev)] = prev
+        scale *= factor
+        levels.append((scale, padded.reshape(n, factor).sum(axis=1).astype(np.uint32)))
+    return levels
+
+
+def build_pyramid(reader, chroms, base_bin=BASE_BIN, factors=LEVEL_FACTORS, count_base=None):
+    """对每条染色体做一次BAM遍历，返回 {chrom: (length, levels)}
+
+    参数:
+        reader: bam_backends 中已打开的后端
+        chroms: [(染色体名, 长度), ...]
+        count_base: 可选，count_base(染色体名, 长度) 返回基础层 raw 计数（例如经覆盖度缓存读取）；
+                    默认直接由 reader 计数
+    """
+    if count_base is None:
+        from bam_backends import count_bins
+
+        def count_base(name, length):
+            return count_bins(reader, name, 0, length, base_bin, 'raw')
+
+    pyramid = {}
+    for name, length in chroms:
+        base = np.asarray(count_base(name, length), dtype=np.int64)
+        if base.size and base.max() > np.iinfo(np.uint32).max:
+            raise ValueError(f"{name} 单个bin计数超出 uint32 范围")
+        pyramid[name] = (length, [(base_bin * scale, counts) for scale, counts in pyramid_levels(base, factors)])
+    return pyramid
+
+
+def write_pyramid(path, pyramid, base_bin=BASE_BIN, source=None):
+    """将 build_pyramid 的结果写入二进制文件（先写临时文件再原子替换）
+
+    source 为生成金字塔的BAM标识（见文件格式说明），供下次运行判断能否复用。
+    """
+    header = {'version': PYRAMID_VERSION, 'base_bin': base_bin, 'rule': 'raw', 'source': source, 'chroms': []}
+    arrays = []
+    offset = 0
+    for name, (length, levels) in pyramid.items():
+        entry = {'name': name, 'length': int(length), 'levels': []}
+        for bin_size, counts in levels:
+            entry['levels'].append({'bin_size': int(bin_size), 'n_bins': int(len(counts)), 'offset': offset})
+            arrays.append(counts)
+            offset += -(-counts.nbytes // 8) * 8
+        header['chroms'].append(entry)
+
+    # 数据区偏移依赖头长度，而头中又记录偏移；先确定头长度再整体平移
+    header_bytes = json.dumps(header).encode()
+    data_start = -(-(len(MAGIC) + 4 + len(header_bytes) + 64) // 8) * 8
+    for entry in header['chroms']:
+        for level in entry['levels']:
+            level['offset'] += data_start
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b' ' * (data_start - len(MAGIC) - 4 - len(header_bytes))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        for counts in arrays:
+            data = counts.astype('<u4').tobytes()
+            f.write(data)
+            f.write(b'\0' * (-len(data) % 8))
+    os.replace(tmp_path, path)
+    return path
+
+
+def open_matching_pyramid(path, source):
+    """打开由同一BAM（source 完全一致）生成的已有金字塔，不存在、无法读取或来源不同时返回 None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        pyramid = CoveragePyramid(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return pyramid if pyramid.source == source else None
+
+
+class CoveragePyramid:
+    """只读打开金字塔文件，各层以 np.memmap 延迟映射"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"不是覆盖度金字塔文件: {path}")
+            header_len, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_len))
+        if header.get('version') != PYRAMID_VERSION:
+            raise ValueError(f"不支持的金字塔版本: {header.get('version')}")
+        self.base_bin = header['base_bin']
+        self.rule = header['rule']
+        # 旧版本文件没有记录来源
+        self.source = header.get('source')
+        self.chroms = {c['name']: c for c in header['chroms']}
+        self._maps = {}
+
+    def references(self):
+        """返回 [(染色体名, 长度), ...]"""
+        return [(name, c['length']) for name, c in self.chroms.items()]
+
+    def bin_sizes(self, chrom):
+        return [level['bin_size'] for level in self._chrom(chrom)['levels']]
+
+    def _chrom(self, chrom):
+        if chrom not in self.chroms:
+            raise KeyError(f"金字塔中没有染色体 {chrom}")
+        return self.chroms[chrom]
+
+    def level(self, chrom, bin_size):
+        """返回指定层级的只读计数数组（memmap）"""
+        key = (chrom, bin_size)
+        if key not in self._maps:
+            level = next((lv for lv in self._chrom(chrom)['levels'] if lv['bin_size'] == bin_size), None)
+            if level is None:
+                raise KeyError(f"{chrom} 没有 {bin_size} bp 层级")
+            if level['n_bins'] == 0:
+                self._maps[key] = np.zeros(0, dtype='<u4')
+            else:
+                self._maps[key] = np.memmap(self.path, dtype='<u4', mode='r',
+                                            offset=level['offset'], shape=(level['n_bins'],))
+        return self._maps[key]
+
+    def counts_for(self, chrom, start, end, bin_size):
+        """从金字塔精确还原 [start, end) 按 bin_size 的 raw 计数
+
+        要求 start 与 bin_size 对齐基础层，且 end 对齐基础层或为染色体末端；
+        否则无法精确还原，返回 None。
+        """
+        c = self._chrom(chrom)
+        base = self.base_bin
+        end = min(end, c['length'])
+        if start % base or bin_size % base or (end % base and end != c['length']) or end <= start:
+            return None
+        # 选取能整除 bin_size 的最粗层级，减少求和量
+        level_bin = max(bs for bs in self.bin_sizes(chrom) if bin_size % bs == 0 and start % bs == 0)
+        fine = self.level(chrom, level_bin)[start // level_bin:-(-end // level_bin)]
+        factor = bin_size // level_bin
+        n = len(range(start, end, bin_size))
+        padded = np.zeros(n * factor, dtype=np.int64)
+        padded[:len(fine)] = fine
+        return padded.reshape(n, factor).sum(axis=1)
+
+    def query(self, chrom, start, end, max_bins=DEFAULT_MAX_BINS):
+        """按窗口大小自动选层，返回 (bin起点数组, 计数数组, bin_size)
+
+        选择 bin 数不超过 max_bins 的最细层级；最粗层级仍超出时再按整数倍合并。
+        """
+        c = self._chrom(chrom)
+        start = max(0, int(start))
+        end = min(c['length'], int(end))
+        if end <= start:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), self.base_bin
+        sizes = self.bin_sizes(chrom)
+        bin_size = next((bs for bs in sizes if -(-(end - start) // bs) <= max_bins), sizes[-1])
+        i0, i1 = start // bin_size, -(-end // bin_size)
+        counts = np.asarray(self.level(chrom, bin_size)[i0:i1], dtype=np.int64)
+        first = i0 * bin_size
+        merge = -(-len(counts) // max_bins)
+        if merge > 1:
+            n = -(-len(counts) // merge)
+            padded = np.zeros(n * merge, dtype=np.int64)
+            padded[:len(counts)] = counts
+            counts = padded.reshape(n, merge).sum(axis=1)
+            bin_size *= merge
+        starts = first + np.arange(len(counts), dtype=np.int64) * bin_size
+        return starts, counts, bin_size
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='查询覆盖度金字塔文件')
+    parser.add_argument('pyramid', help='*_coverage_pyramid.wcp 文件')
+    parser.add_argument('--region', help='chrom:start-end，省略时列出染色体与层级')
+    parser.add_argument('--max-bins', type=int, default=DEFAULT_MAX_BINS)
+    args = parser.parse_args()
+
+    pyr = CoveragePyramid(args.pyramid)
+    if not args.region:
+        for name, length in pyr.references():
+            print(f"{name}\t{length}\t{','.join(str(bs) for bs in pyr.bin_sizes(name))}")
+        sys.exit(0)
+    chrom, _, span = args.region.partition(':')
+    lo, _, hi = span.replace(',', '').partition('-')
+    starts, counts, bin_size = pyr.query(chrom, int(lo or 0), int(hi or pyr.chroms[chrom]['length']), args.max_bins)
+    print(f"# bin_size={bin_size}")
+    for s, n in zip(starts, counts):
+        print(f"{chrom}\t{s}\t{s + bin_size}\t{n}")
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WORF-Seq 富集热点扫描
+
+输入为分bin计数（get_counts / count_genome 的结果，或全基因组分bin计数表），
+逐条染色体流式处理：
+
+1. 局部背景: 以 ±window 个bin的滑动均值估计（排除中心 ±gap 个bin，避免峰自身抬高背景），
+   并以该染色体的平均计数为下限（与 MACS 取局部/全局背景较大值的做法一致）；
+   染色体末端被截短的bin按实际长度折算
+2. 检验: poisson（P(X >= count | 背景)）或 zscore（(count - 背景) / 局部标准差），
+   且计数须达到背景的 min_fold 倍——深度较高时 Poisson 检验对轻微的过度离散也极敏感
+3. 相邻的显著bin合并为热点，按得分降序输出排名表
+
+滑动窗口由累积和计算，并按块处理；除输入计数外只保留显著bin，内存为 O(bins)，可用于全基因组 100 bp bin。
+"""
+import argparse
+import gzip
+import math
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+HOTSPOT_TESTS = ('poisson', 'zscore')
+DEFAULT_WINDOW = 25
+DEFAULT_GAP = 2
+DEFAULT_PVALUE = 1e-5
+DEFAULT_Z = 5.0
+DEFAULT_MIN_FOLD = 2.0
+
+Hotspot = namedtuple('Hotspot', ['chrom', 'start', 'end', 'n_bins', 'count', 'background',
+                                 'fold', 'score', 'peak_start'])
+
+HOTSPOT_COLUMNS = ('rank', 'chrom', 'start', 'end', 'n_bins', 'count', 'background',
+                   'fold_enrichment', 'score', 'peak_start')
+
+
+# 每次处理的bin数；分块计算背景与检验，中间数组内存与染色体长度无关
+CHUNK_BINS = 1_000_000
+
+
+def local_background(counts, window=DEFAULT_WINDOW, gap=DEFAULT_GAP):
+    """返回 (背景均值, 背景标准差)，均为与 counts 等长的数组
+
+    背景取 [i-window, i+window] 中去掉 [i-gap, i+gap] 后的bin，数组两端按实际可用bin数计算。
+    两端补零后用累积和的切片差得到每个窗口的和，不需要下标数组。
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    n = counts.size
+
+    def window_sums(values, half):
+        padded = np.concatenate((np.zeros(window), values, np.zeros(window)))
+        c = np.concatenate(([0.0], np.cumsum(padded)))
+        return c[window + half + 1:window + half + 1 + n] - c[window - half:window - half + n]
+
+    ones = np.ones(n)
+    n_bg = window_sums(ones, window) - window_sums(ones, gap)
+    s1 = window_sums(counts, window) - window_sums(counts, gap)
+    s2 = window_sums(counts * counts, window) - window_sums(counts * counts, gap)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(n_bg > 0, s1 / np.maximum(n_bg, 1), 0.0)
+        var = np.where(n_bg > 1, (s2 - n_bg * mean * mean) / np.maximum(n_bg - 1, 1), 0.0)
+    return mean, np.sqrt(np.maximum(var, 0.0))
+
+
+def _log_factorial(k):
+    """整数数组的 ln(k!)，由 ln(1..max) 的累积和查表"""
+    k = np.asarray(k, dtype=np.int64)
+    if k.size == 0:
+        return np.zeros(0)
+    table = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, int(k.max()) + 1)))))
+    return table[k]
+
+
+def poisson_log_sf(k, lam):
+    """向量化 Poisson 上尾概率的自然对数 ln P(X >= k)，k 为非负整数，λ 为期望
+
+    仅对 k > λ 逐项求和 pmf(k) * Σ_j Π_{i<=j} λ/(k+i)（比值 < 1，级数收敛）；
+    k <= λ 的bin不可能显著，直接返回 0（P=1）。全程在对数空间，极端富集也不会下溢。
+    """
+    k = np.asarray(k, dtype=np.int64)
+    lam = np.asarray(lam, dtype=np.float64)
+    k, lam = np.broadcast_arrays(k, lam)
+    p = np.zeros(k.shape)
+    test = (k > lam) & (k > 0)
+    kk, ll = k[test].astype(np.float64), lam[test]
+    if kk.size == 0:
+        return p
+    zero_bg = ll <= 0
+    ll_safe = np.where(zero_bg, 1.0, ll)
+    log_pmf = kk * np.log(ll_safe) - ll_safe - _log_factorial(k[test])
+    # 级数部分：term_j = Π λ/(k+i)，逐项累加，已收敛的元素移出活动集
+    total = np.ones(kk.size)
+    term = np.ones(kk.size)
+    active = np.arange(kk.size)
+    j = 1
+    while active.size:
+        term[active] *= ll_safe[active] / (kk[active] + j)
+        total[active] += term[active]
+        active = active[term[active] > 1e-12 * total[active]]
+        j += 1
+    p[test] = np.where(zero_bg, -np.inf, np.minimum(log_pmf + np.log(total), 0.0))
+    return p
+
+
+def poisson_sf(k, lam):
+    """向量化 Poisson 上尾概率 P(X >= k)"""
+    return np.exp(poisson_log_sf(k, lam))
+
+
+def _test_chunk(counts, density, scale, lo, hi, floor, test, pvalue, z, window, gap, min_count, min_fold):
+    """检验 [lo, hi) 内的bin，返回 (显著bin下标, 得分, 背景)
+
+    density 为按完整bin长度折算后的计数，用于估计背景；scale 为各bin实际长度占 bin_size 的比例，
+    背景乘以 scale 后与原始计数比较。
+    背景只依赖 ±window 范围，取 [lo-window, hi+window) 计算后截取中间部分，结果与整条染色体一次计算相同。
+    """
+    a, b = max(lo - window, 0), min(hi + window, counts.size)
+    mean, std = local_background(density[a:b], window, gap)
+    lam = np.maximum(mean[lo - a:hi - a], floor) * scale[lo:hi]
+    chunk = counts[lo:hi]
+    # 只检验计数达到下限且达到背景 min_fold 倍的bin
+    candidates = np.flatnonzero((chunk >= min_count) & (chunk > lam) & (chunk >= min_fold * lam))
+    if candidates.size == 0:
+        return candidates, np.zeros(0), np.zeros(0)
+    k, lam_c = chunk[candidates], lam[candidates]
+    if test == 'poisson':
+        log_p = poisson_log_sf(k, lam_c)
+        keep = log_p <= math.log(pvalue)
+        # 背景为0时 p=0，得分记为有限的大值以便排序
+        score = np.minimum(-log_p / math.log(10), 1e6)
+    else:
+        # 局部标准差不低于 Poisson 标准差，避免平坦背景下 z 值虚高
+        sd = np.maximum(std[lo - a:hi - a][candidates] * scale[lo:hi][candidates], np.sqrt(np.maximum(lam_c, 1.0)))
+        score = (k - lam_c) / sd
+        keep = score >= z
+    return candidates[keep] + lo, score[keep], lam_c[keep]
+
+
+def call_hotspots(chrom, counts, bin_size, test='poisson', pvalue=DEFAULT_PVALUE, z=DEFAULT_Z,
+                  window=DEFAULT_WINDOW, gap=DEFAULT_GAP, min_count=5, min_fold=DEFAULT_MIN_FOLD,
+                  chrom_length=None):
+    """在一条染色体的分bin计数上检出热点，返回 Hotspot 列表
+
+    参数:
+        test: poisson（得分为 -log10 p）/ zscore（得分为 z）
+        min_count: bin计数低于该值时不判为显著
+        min_fold: bin计数低于背景的该倍数时不判为显著
+        chrom_length: 染色体长度；末端bin不足 bin_size 时按实际长度折算背景
+    连续的显著bin合并为同一热点，热点得分取其中最高的bin。
+    """
+    if test not in HOTSPOT_TESTS:
+        raise ValueError(f"未知的检验方法: {test}（可选: {', '.join(HOTSPOT_TESTS)}）")
+    counts = np.asarray(counts, dtype=np.int64)
+    if counts.size == 0:
+        return []
+    # 末端bin的实际长度比例；计数折算到完整bin长度后再估计背景
+    scale = np.ones(counts.size)
+    if chrom_length is not None:
+        scale[-1] = min(max(chrom_length - (counts.size - 1) * bin_size, 1) / bin_size, 1.0)
+    density = counts / scale
+    # 背景下限：该染色体每个完整bin的平均计数
+    floor = counts.sum() / scale.sum()
+    parts = [_test_chunk(counts, density, scale, lo, min(lo + CHUNK_BINS, counts.size), floor, test, pvalue, z,
+                         window, gap, min_count, min_fold)
+             for lo in range(0, counts.size, CHUNK_BINS)]
+    hits = np.concatenate([p[0] for p in parts])
+    if hits.size == 0:
+        return []
+    scores = np.concatenate([p[1] for p in parts])
+    lams = np.concatenate([p[2] for p in parts])
+    # 按间隔切分连续的显著bin
+    breaks = np.flatnonzero(np.diff(hits) > 1)
+    group_starts = np.concatenate(([0], breaks + 1))
+    group_ends = np.concatenate((breaks + 1, [hits.size]))
+
+    hotspots = []
+    for g0, g1 in zip(group_starts.tolist(), group_ends.tolist()):
+        first, last = int(hits[g0]), int(hits[g1 - 1])
+        observed = int(counts[first:last + 1].sum())
+        expected = float(lams[g0:g1].sum())
+        peak = g0 + int(np.argmax(scores[g0:g1]))
+        hotspots.append(Hotspot(chrom, first * bin_size, (last + 1) * bin_size, last - first + 1,
+                                observed, round(expected, 2),
+                                round(observed / expected, 2) if expected > 0 else float('inf'),
+                                round(float(scores[peak]), 2), int(hits[peak]) * bin_size))
+    return hotspots
+
+
+def scan_hotspots(chrom_counts, bin_size, chrom_lengths=None, **kwargs):
+    """对 (chrom, counts) 可迭代对象逐条染色体扫描，流式产出 Hotspot；chrom_lengths 用于折算末端bin"""
+    for chrom, counts in chrom_counts:
+        length = chrom_lengths.get(chrom) if chrom_lengths else None
+        yield from call_hotspots(chrom, counts, bin_size, chrom_length=length, **kwargs)
+
+
+def rank_hotspots(hotspots):
+    """按得分降序、计数降序排序"""
+    return sorted(hotspots, key=lambda h: (-h.score, -h.count, h.chrom, h.start))
+
+
+def write_hotspot_table(hotspots, filename, chrom_lengths=None):
+    """写出排名后的热点TSV，返回写出的热点数；chrom_lengths 用于截断末端bin"""
+    ranked = rank_hotspots(hotspots)
+    with open(filename, 'w') as f:
+        f.write('\t'.join(HOTSPOT_COLUMNS) + '\n')
+        for rank, h in enumerate(ranked, 1):
+            end = min(h.end, chrom_lengths[h.chrom]) if chrom_lengths and h.chrom in chrom_lengths else h.end
+            f.write(f"{rank}\t{h.chrom}\t{h.start}\t{end}\t{h.n_bins}\t{h.count}\t{h.background}\t"
+                    f"{h.fold}\t{h.score}\t{h.peak_start}\n")
+    return len(ranked)
+
+
+def read_bin_table(path):
+    """流式读取分bin计数表（chrom start end count ...），逐条染色体产出 (chrom, counts, bin_size, 染色体长度)
+
+    染色体长度取该染色体最后一个bin的 end（末端bin按染色体长度截断）。
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        header = f.readline().rstrip('\n').split('\t')
+        ci, si, ei, ni = (header.index(col) for col in ('chrom', 'start', 'end', 'count'))
+        chrom, counts, bin_size, end = None, [], None, None
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if fields[ci] != chrom:
+                if counts:
+                    yield chrom, np.asarray(counts, dtype=np.int64), bin_size, end
+                chrom, counts = fields[ci], []
+            # 染色体末端bin会被截短，取见到的最大宽度作为bin大小
+            end = int(fields[ei])
+            bin_size = max(bin_size or 0, end - int(fields[si]))
+            counts.append(int(fields[ni]))
+        if counts:
+            yield chrom, np.asarray(counts, dtype=np.int64), bin_size, end
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WORF-Seq hotspot scanner over binned coverage')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--table', help='Per-bin table from WGSmapping --genome-wide (*_genome_bins_step*.tsv)')
+    source.add_argument('--bam', help='Sorted, indexed BAM file')
+    parser.add_argument('--chrom', help='BAM mode: only scan this chromosome (default: all contigs)')
+    parser.add_argument('--bin', type=int, default=100000, help='BAM mode: bin size (bp)')
+    parser.add_argument('--backend', default='auto', help='BAM mode: reading backend')
+    parser.add_argument('--count-rule', default='raw', help='BAM mode: counting rule')
+    parser.add_argument('--test', default='poisson', choices=HOTSPOT_TESTS)
+    parser.add_argument('--pvalue', type=float, default=DEFAULT_PVALUE, help='Per-bin Poisson p-value threshold')
+    parser.add_argument('--z', type=float, default=DEFAULT_Z, help='Per-bin z-score threshold')
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW, help='Background flank size in bins')
+    parser.add_argument('--gap', type=int, default=DEFAULT_GAP, help='Bins excluded around the tested bin')
+    parser.add_argument('--min-count', type=int, default=5)
+    parser.add_argument('--min-fold', type=float, default=DEFAULT_MIN_FOLD,
+                        help=f'Minimum fold enrichment over the local background (default: {DEFAULT_MIN_FOLD})')
+    parser.add_argument('--output', required=True, help='Output hotspot TSV')
+    args = parser.parse_args()
+
+    options = dict(test=args.test, pvalue=args.pvalue, z=args.z, window=args.window, gap=args.gap,
+                   min_count=args.min_count, min_fold=args.min_fold)
+    hotspots = []
+    chrom_lengths = None
+    if args.table:
+        for chrom, counts, bin_size, length in read_bin_table(args.table):
+            hotspots.extend(call_hotspots(chrom, counts, bin_size, chrom_length=length, **options))
+    else:
+        from bam_backends import count_bins, count_genome, open_backend
+
+        reader = open_backend(args.bam, args.backend)
+        chrom_lengths = dict(reader.references())
+        if args.chrom:
+            if args.chrom not in chrom_lengths:
+                print(f"[ERROR] BAM中没有染色体 {args.chrom}")
+                sys.exit(1)
+            chrom_counts = [(args.chrom, count_bins(reader, args.chrom, 0, chrom_lengths[args.chrom],
+                                                    args.bin, args.count_rule))]
+        else:
+            chrom_counts = count_genome(reader, args.bin, args.count_rule).items()
+        hotspots.extend(scan_hotspots(chrom_counts, args.bin, chrom_lengths, **options))
+
+    n = write_hotspot_table(hotspots, args.output, chrom_lengths)
+    print(f"[INFO] 检出 {n} 个热点，已保存: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+overlap50 向量化计数与原始 pysam get_overlap 算法的一致性测试
+
+用 pysam 生成一个小BAM，包含跨bin边界的read、N/D/S/I CIGAR、
+恰好 50% 重叠的read、未比对/次要比对以及无序列 (长度为0) 的read，
+检查每个可用后端的 overlap50 计数都与逐bin调用 get_overlap 的结果一致。
+
+运行: python -m pytest -q test_overlap50.py
+"""
+import random
+import re
+import shutil
+
+import numpy as np
+import pytest
+
+pysam = pytest.importorskip("pysam")
+
+from bam_backends import BACKENDS, count_bins, count_bins_multi, open_backend
+from bench_backends import reference_overlap50
+
+CHROM = 'chr1'
+CHROM_LENGTH = 5000
+BIN_SIZE = 100
+
+# (起点, CIGAR, flag, 是否带序列)；起点均为0-based
+EDGE_CASES = [
+    (150, '100M', 0, True),            # 跨bin边界，各占50%，两个bin都不计入
+    (151, '100M', 0, True),            # 49/51，只计入第二个bin
+    (100, '100M', 0, True),            # 与bin完全对齐
+    (180, '10S40M10S', 0, True),       # 软剪切计入read长度，20/60 与 20/60
+    (190, '20M500N20M', 0, True),      # 内含子跨多个bin
+    (290, '10M30D10M', 0, True),       # 缺失不计入比对碱基
+    (395, '5M10I5M', 0, True),         # 插入计入read长度但不占参考
+    (480, '50M', 0, True),             # 恰好 20/50 与 30/50
+    (500, '10M', 0x100, True),         # 次要比对，跳过
+    (600, '50M', 0, False),            # 无序列，read长度按1处理
+    (700, '30M', 0x4, True),           # 带坐标的未比对read，跳过
+]
+
+
+def _cigar_length(cigar, ops):
+    return sum(int(n) for n, op in cigar if op in ops)
+
+
+def _random_cigar(rng):
+    """随机CIGAR：首尾可带软剪切，中间为 M 与 I/D/N 交替"""
+    parts = []
+    if rng.random() < 0.3:
+        parts.append((rng.randint(1, 20), 'S'))
+    parts.append((rng.randint(1, 150), 'M'))
+    for _ in range(rng.randint(0, 3)):
+        parts.append((rng.choice((rng.randint(1, 10), rng.randint(1, 400))), rng.choice('IDN')))
+        parts.append((rng.randint(1, 150), 'M'))
+    if rng.random() < 0.3:
+        parts.append((rng.randint(1, 20), 'S'))
+    return parts
+
+
+def _write_bam(path):
+    rng = random.Random(2024)
+    reads = [(pos, [(int(n), op) for n, op in re.findall(r'(\d+)([MIDNSHP=X])', cigar)],
+              flag, with_seq) for pos, cigar, flag, with_seq in EDGE_CASES]
+    for _ in range(400):
+        flag = rng.choice((0, 0, 0, 0x10, 0x100))
+        reads.append((rng.randint(0, CHROM_LENGTH - 1200), _random_cigar(rng), flag, rng.random() > 0.05))
+    reads.sort(key=lambda r: r[0])
+
+    header = {'HD': {'VN': '1.6', 'SO': 'coordinate'}, 'SQ': [{'SN': CHROM, 'LN': CHROM_LENGTH}]}
+    unsorted = str(path) + '.unsorted.bam'
+    with pysam.AlignmentFile(unsorted, 'wb', header=header) as out:
+        for i, (pos, cigar, flag, with_seq) in enumerate(reads):
+            seg = pysam.AlignedSegment(out.header)
+            seg.query_name = f'r{i}'
+            seg.flag = flag
+            seg.reference_id = 0
+            seg.reference_start = pos
+            seg.mapping_quality = 60
+            seg.cigartuples = [('MIDNSHP=X'.index(op), n) for n, op in cigar]
+            if with_seq:
+                seg.query_sequence = 'A' * _cigar_length(cigar, 'MIS=X')
+            out.write(seg)
+        # 完全未比对、无坐标的read
+        seg = pysam.AlignedSegment(out.header)
+        seg.query_name = 'unmapped'
+        seg.flag = 0x4
+        seg.reference_id = -1
+        seg.reference_start = -1
+        seg.query_sequence = 'ACGT'
+        out.write(seg)
+    pysam.sort('-o', str(path), unsorted)
+    pysam.index(str(path))
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def bam_path(tmp_path_factory):
+    return _write_bam(tmp_path_factory.mktemp('overlap50') / 'test.bam')
+
+
+def _available_backends():
+    params = []
+    for name in BACKENDS:
+        marks = []
+        if name == 'samtools' and shutil.which('samtools') is None:
+            marks.append(pytest.mark.skip(reason='samtools 不在 PATH 中'))
+        params.append(pytest.param(name, marks=marks))
+    return params
+
+
+# (start, end)：整段、未对齐的起点、非整bin的终点
+REGIONS = [(0, CHROM_LENGTH), (37, 2950), (450, 1001)]
+
+
+@pytest.mark.parametrize('backend', _available_backends())
+@pytest.mark.parametrize('start, end', REGIONS)
+def test_overlap50_matches_get_overlap(bam_path, backend, start, end):
+    reader = open_backend(bam_path, backend)
+    try:
+        counts = count_bins(reader, CHROM, start, end, BIN_SIZE, 'overlap50')
+    finally:
+        if hasattr(reader, 'close'):
+            reader.close()
+    expected = reference_overlap50(bam_path, CHROM, start, end, BIN_SIZE)
+    np.testing.assert_array_equal(counts, expected)
+
+
+@pytest.mark.parametrize('backend', _available_backends())
+def test_overlap50_multi_matches_single(bam_path, backend):
+    reader = open_backend(bam_path, backend)
+    try:
+        results = count_bins_multi(reader, CHROM, REGIONS, BIN_SIZE, 'overlap50')
+    finally:
+        if hasattr(reader, 'close'):
+            reader.close()
+    for (start, end), counts in zip(REGIONS, results):
+        np.testing.assert_array_equal(counts, reference_overlap50(bam_path, CHROM, start, end, BIN_SIZE))
+
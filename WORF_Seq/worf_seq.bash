@@ -1,21 +1,27 @@
 #!/bin/bash
 
 # WORF-Seq Analysis Pipeline
-# Usage: worf_seq.bash -f folder_name -c chromosome -p center_position -s step_size -b background_analysis
+# Usage: worf_seq.bash -f folder_name -c chromosome -p center_position -s step_size -b background_analysis [-g genome_wide]
 
 # 默认参数
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 REF_DIR="$(dirname "$SCRIPT_DIR")/WORF-Seq"
 LOG_FILE=""
 
+# 结构化进度事件（app 通过 NGS_EVENT_FILE 读取），缺失时退化为空操作
+if ! source "$(dirname "$SCRIPT_DIR")/pipeline_events.sh" 2>/dev/null; then
+    event_emit() { :; }; event_pipeline_start() { :; }; event_stage_start() { :; }; event_stage_end() { :; }; event_file_bytes() { echo 0; }
+fi
+
 # 解析命令行参数
-while getopts ":f:c:p:s:b:" opt; do
+while getopts ":f:c:p:s:b:g:" opt; do
     case $opt in
         f) FOLDER_NAME="$OPTARG" ;;
         c) CHROMOSOME="$OPTARG" ;;
         p) CENTER_POSITION="$OPTARG" ;;
         s) STEP_SIZE="$OPTARG" ;;
         b) BACKGROUND_ANALYSIS="$OPTARG" ;;
+        g) GENOME_WIDE="$OPTARG" ;;
         \?) echo "Invalid option -$OPTARG" >&2; exit 1 ;;
         :) echo "Option -$OPTARG requires an argument." >&2; exit 1 ;;
     esac
@@ -24,13 +30,15 @@ done
 # 检查必需参数
 if [[ -z "$FOLDER_NAME" || -z "$CHROMOSOME" || -z "$CENTER_POSITION" ]]; then
     echo "[ERROR] Missing required parameters"
-    echo "Usage: $0 -f folder_name -c chromosome -p center_position [-s step_size] [-b background_analysis]"
+    echo "Usage: $0 -f folder_name -c chromosome -p center_position [-s step_size] [-b background_analysis] [-g genome_wide]"
     exit 1
 fi
 
 # 设置默认值
 STEP_SIZE=${STEP_SIZE:-100000}
 BACKGROUND_ANALYSIS=${BACKGROUND_ANALYSIS:-true}
+# app 传入的布尔值为 True/False，统一转为小写
+GENOME_WIDE=$(echo "${GENOME_WIDE:-false}" | tr '[:upper:]' '[:lower:]')
 
 # 设置工作目录和日志文件：统一使用时间戳临时目录，避免目标目录权限问题
 FOLDER_BASENAME=$(basename "$FOLDER_NAME")
@@ -45,6 +53,7 @@ echo "[INFO] 原始数据仍从目录读取: $FOLDER_NAME"
 set -o pipefail
 
 echo "[INFO] WORF-Seq Analysis Pipeline Started" | tee "$LOG_FILE"
+event_pipeline_start worf_seq 4
 echo "[INFO] Timestamp: $(date)" | tee -a "$LOG_FILE"
 echo "[INFO] Parameters:" | tee -a "$LOG_FILE"
 echo "[INFO]   - Folder: $FOLDER_NAME" | tee -a "$LOG_FILE"
@@ -52,6 +61,7 @@ echo "[INFO]   - Chromosome: $CHROMOSOME" | tee -a "$LOG_FILE"
 echo "[INFO]   - Center Position: $CENTER_POSITION" | tee -a "$LOG_FILE"
 echo "[INFO]   - Step Size: $STEP_SIZE" | tee -a "$LOG_FILE"
 echo "[INFO]   - Background Analysis: $BACKGROUND_ANALYSIS" | tee -a "$LOG_FILE"
+echo "[INFO]   - Genome-wide Scan: $GENOME_WIDE" | tee -a "$LOG_FILE"
 echo "========================================" | tee -a "$LOG_FILE"
 
 # 检查输入文件是否存在
@@ -76,6 +86,7 @@ echo "========================================" | tee -a "$LOG_FILE"
 
 # 步骤1: 质控处理
 echo "[INFO] 步骤1: 开始质控处理 (fastp)" | tee -a "$LOG_FILE"
+event_stage_start qc 1 "质控 (fastp)"
 CLEAN_R1="${WORK_DIR}/${FOLDER_BASENAME}_clean_1.fq.gz"
 CLEAN_R2="${WORK_DIR}/${FOLDER_BASENAME}_clean_2.fq.gz"
 
@@ -109,10 +120,12 @@ else
         fi
     fi
 fi
+event_stage_end qc ok "bytes=$(( $(event_file_bytes "$CLEAN_R1") + $(event_file_bytes "$CLEAN_R2") ))"
 echo "========================================" | tee -a "$LOG_FILE"
 
 # 步骤2: 序列比对到参考基因组
 echo "[INFO] 步骤2: 序列比对 (minimap2)" | tee -a "$LOG_FILE"
+event_stage_start align 2 "序列比对 (minimap2)"
 SAM_FILE="${WORK_DIR}/${FOLDER_BASENAME}_aligned_minimap.sam"
 # 提前定义BAM路径用于跳过比对的检测
 BAM_FILE="${WORK_DIR}/${FOLDER_BASENAME}_aligned_minimap.sorted.bam"
@@ -203,6 +216,7 @@ if [[ "$RUN_ALIGNMENT" == "true" ]]; then
         fi
     fi
 fi
+event_stage_end align "$([[ "$RUN_ALIGNMENT" == "true" ]] && echo ok || echo skip)" "bytes=$(event_file_bytes "$SAM_FILE")"
 echo "========================================" | tee -a "$LOG_FILE"
 
 
@@ -210,6 +224,7 @@ echo "========================================" | tee -a "$LOG_FILE"
 
 # 步骤3: SAM转换为BAM文件
 echo "[INFO] 步骤3: SAM转BAM (samtools)" | tee -a "$LOG_FILE"
+event_stage_start bam 3 "SAM转BAM (samtools)"
 BAM_FILE="${WORK_DIR}/${FOLDER_BASENAME}_aligned_minimap.sorted.bam"
 BAM_INDEX="${BAM_FILE}.bai"
 
@@ -252,10 +267,12 @@ else
         exit 1
     fi
 fi
+event_stage_end bam ok "bytes=$(event_file_bytes "$BAM_FILE")"
 echo "========================================" | tee -a "$LOG_FILE"
 
 # 步骤4: 染色体比对图生成
 echo "[INFO] 步骤4: 染色体比对图生成 (WGSmapping.py)" | tee -a "$LOG_FILE"
+event_stage_start plot 4 "染色体比对图生成 (WGSmapping.py)"
 WGS_SCRIPT="${SCRIPT_DIR}/WGSmapping.py"
 
 # 预期的输出文件名
@@ -263,6 +280,8 @@ FOLDER_BASENAME=$(basename "$FOLDER_NAME")
 EXPECTED_TARGET_PLOT="${WORK_DIR}/${FOLDER_BASENAME}_target_region_${CHROMOSOME}_${CENTER_POSITION}.png"
 EXPECTED_CHROM_PLOT="${WORK_DIR}/${FOLDER_BASENAME}_chromosome_${CHROMOSOME}_step${STEP_SIZE}.png"
 EXPECTED_SUMMARY="${WORK_DIR}/${FOLDER_BASENAME}_worf_seq_summary.txt"
+EXPECTED_GENOME_PLOT="${WORK_DIR}/${FOLDER_BASENAME}_genome_wide_step${STEP_SIZE}.png"
+EXPECTED_GENOME_TABLE="${WORK_DIR}/${FOLDER_BASENAME}_genome_bins_step${STEP_SIZE}.tsv"
 
 # 检查图表文件是否已存在
 PLOTS_EXIST=true
@@ -284,6 +303,10 @@ for PLOT_FILE in "$EXPECTED_TARGET_PLOT" "$EXPECTED_CHROM_PLOT" "$EXPECTED_SUMMA
         fi
     fi
 done
+# 全基因组扫描的输出缺失时同样需要重新运行
+if [[ "$GENOME_WIDE" == "true" && ( ! -s "$EXPECTED_GENOME_PLOT" || ! -s "$EXPECTED_GENOME_TABLE" ) ]]; then
+    PLOTS_EXIST=false
+fi
 
 if [[ "$PLOTS_EXIST" == "true" ]]; then
     echo "[SKIP] 图表文件已存在，跳过染色体比对图生成步骤" | tee -a "$LOG_FILE"
@@ -296,6 +319,11 @@ if [[ "$PLOTS_EXIST" == "true" ]]; then
 else
     if [[ -f "$WGS_SCRIPT" ]]; then
         echo "[INFO] Running WGSmapping.py..." | tee -a "$LOG_FILE"
+        # 全基因组扫描：按染色体并行读取（进程数 NGS_WGS_WORKERS，默认为 CPU 核数）
+        GENOME_ARGS=()
+        if [[ "$GENOME_WIDE" == "true" ]]; then
+            GENOME_ARGS=(--genome-wide --workers "${NGS_WGS_WORKERS:-$(nproc)}")
+        fi
         # 运行 WGSmapping 并捕获子进程的退出码（避免 tee 掩盖）
         python3 "$WGS_SCRIPT" \
             --bam "$BAM_FILE" \
@@ -303,6 +331,7 @@ else
             --center "$CENTER_POSITION" \
             --step "$STEP_SIZE" \
             --background "$BACKGROUND_ANALYSIS" \
+            "${GENOME_ARGS[@]}" \
             --output "$WORK_DIR" 2>&1 | tee -a "$LOG_FILE"
         PY_EXIT=${PIPESTATUS[0]}
         if [[ $PY_EXIT -eq 0 ]]; then
@@ -322,6 +351,7 @@ else
         exit 1
     fi
 fi
+event_stage_end plot "$([[ "$PLOTS_EXIST" == "true" ]] && echo skip || echo ok)"
 echo "========================================" | tee -a "$LOG_FILE"
 
 # 统计信息
@@ -359,6 +389,12 @@ fi
 if [[ -f "$EXPECTED_SUMMARY" && -s "$EXPECTED_SUMMARY" ]]; then
     echo "[INFO]   - Summary: $EXPECTED_SUMMARY" | tee -a "$LOG_FILE"
 fi
+if [[ -f "$EXPECTED_GENOME_PLOT" && -s "$EXPECTED_GENOME_PLOT" ]]; then
+    echo "[INFO]   - Genome-wide plot: $EXPECTED_GENOME_PLOT" | tee -a "$LOG_FILE"
+fi
+if [[ -f "$EXPECTED_GENOME_TABLE" && -s "$EXPECTED_GENOME_TABLE" ]]; then
+    echo "[INFO]   - Genome-wide bin table: $EXPECTED_GENOME_TABLE" | tee -a "$LOG_FILE"
+fi
 
 echo "========================================" | tee -a "$LOG_FILE"
 
@@ -1,14 +1,15 @@
 import streamlit as st
-import subprocess
 import os
 import time
 from datetime import datetime
-import pandas as pd
+import importlib
 import threading
-import base64
 import json
-import requests
 from barcodes import BARCODES, get_barcode_sequence, generate_barcode_file, get_barcode_display_name
+import job_manager
+from log_monitor import EventTail, LogTail, find_markers, progress_from_markers
+from pipeline_events import EVENT_FILE_ENV
+from projects.common import LOG_DIR, get_file_download_link, rel_path
 
 # 设置页面配置
 st.set_page_config(
@@ -18,17 +19,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# 项目根目录与日志目录
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-LOG_DIR = os.path.join(BASE_DIR, "logs")
 os.makedirs(LOG_DIR, exist_ok=True)
-GENE_LOG_FILE = os.path.join(LOG_DIR, "gene_lookup.log")
-GENE_FAV_FILE = os.path.join(LOG_DIR, "gene_favorites.json")
-
-
-def rel_path(*parts):
-    """基于项目根目录拼接路径"""
-    return os.path.join(BASE_DIR, *parts)
+# 运行监控的自动刷新间隔（秒）与无变化时退避的上限
+MONITOR_INTERVAL = float(os.environ.get("NGS_MONITOR_INTERVAL", "2"))
+MONITOR_MAX_INTERVAL = 30.0
 
 # 自定义CSS
 st.markdown("""
@@ -293,13 +287,14 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# 项目配置
+# 项目配置；"page" 为项目页面模块（结果展示与项目专用的参数辅助区域），选中项目时才导入
 PROJECTS = {
     "Egg_Indel": {
         "name": "🧬 Egg Indel Analysis",
         "description": "CRISPR基因编辑indel突变分析，自动处理双端测序数据并计算编辑效率",
         "status": "available",
         "script": rel_path("Egg_Indel", "script", "egg_insel.bash"),
+        "page": "projects.egg_indel",
         "example": {
             "seq1": "/data/sunyuhong/data/20250720_ShangHaiJiaoTongDaXue-sunyuhong-1_1/00.mergeRawFq/test/UDI001_raw_1.fq.gz",
             "seq2": "/data/sunyuhong/data/20250720_ShangHaiJiaoTongDaXue-sunyuhong-1_1/00.mergeRawFq/test/UDI001_raw_2.fq.gz", 
@@ -320,6 +315,7 @@ PROJECTS = {
         "description": "纳米抗体序列分析，包括序列拼接、trim和结果统计",
         "status": "available", 
         "script": rel_path("Nanobody", "nanobody.bash"),
+        "page": "projects.nanobody",
         "example": {
             "seq1": "/data/sunyuhong/data/20251214_ShangHaiJiaoTongDaXue-hanpeijin-1_1/00.mergeRawFq/NGS_TSLP1-HIGH/NGS_TSLP1-HIGH_raw_1.fq.gz",
             "seq2": "/data/sunyuhong/data/20251214_ShangHaiJiaoTongDaXue-hanpeijin-1_1/00.mergeRawFq/NGS_TSLP1-HIGH/NGS_TSLP1-HIGH_raw_2.fq.gz",
@@ -336,23 +332,30 @@ PROJECTS = {
         "description": "WORF序列高通量ORF筛选分析，包含质控、比对、可视化和全染色体背景分析",
         "status": "available",
         "script": rel_path("WORF_Seq", "worf_seq.bash"),
+        "page": "projects.worf_seq",
         "example": {
             "folder_name": "/data/lulab_commonspace/sunyuhong/20251216_ShangHaiJiaoTongDaXue-yaozonglin-1_2/00.mergeRawFq/UDI002",
             "chromosome": "chr6",
             "center_position": 31236000,
             "step_size": 100000,
-            "background_analysis": True
+            "background_analysis": True,
+            "genome_wide": False
         },
         "params": {
             "folder_name": {"label": "📁 测序文件夹路径", "type": "text", "required": True, "help": "输入包含原始测序文件的文件夹绝对路径"},
             "chromosome": {"label": "🧬 目标染色体", "type": "select", "required": True, "options": ["chr1", "chr2", "chr3", "chr4", "chr5", "chr6", "chr7", "chr8", "chr9", "chr10", "chr11", "chr12", "chr13", "chr14", "chr15", "chr16", "chr17", "chr18", "chr19", "chr20", "chr21", "chr22", "chrX", "chrY", "chrM"]},
             "center_position": {"label": "📍 目标中心位置 (bp)", "type": "number", "required": True, "help": "基于参考基因组坐标的整数位置"},
             "step_size": {"label": "📏 全染色体绘图步长 (bp)", "type": "number", "default": 100000, "required": False, "help": "默认100000 bp"},
-            "background_analysis": {"label": "🔬 全染色体背景分析", "type": "select", "required": False, "options": [True, False], "default": True, "help": "是否进行全染色体背景分析"}
+            "background_analysis": {"label": "🔬 全染色体背景分析", "type": "select", "required": False, "options": [True, False], "default": True, "help": "是否进行全染色体背景分析"},
+            "genome_wide": {"label": "🌐 全基因组扫描", "type": "select", "required": False, "options": [False, True], "default": False, "help": "对所有染色体分bin计数，生成全基因组 Manhattan 图与分bin计数表，用于发现其他染色体上的脱靶整合"}
         }
     }
 }
 
+def get_page(project_key):
+    """项目的页面模块，首次选中该项目时导入（之后由 sys.modules 缓存）"""
+    return importlib.import_module(PROJECTS[project_key]["page"])
+
 def save_feedback(user_name, email, feedback_type, content):
     """保存用户反馈到文件"""
     try:
@@ -446,175 +449,13 @@ def check_file_exists(file_path):
         return False, f"文件不存在: {file_path}"
 
 
-def log_gene_lookup(message):
-    """将基因定位助手的调试信息写入日志文件"""
-    try:
-        with open(GENE_LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}\n")
-    except Exception:
-        pass
-
-
-def load_gene_favorites():
-    """加载基因收藏记录"""
-    if not os.path.exists(GENE_FAV_FILE):
-        return []
-    try:
-        with open(GENE_FAV_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return []
 
+def run_script(script_path, params, project=None):
+    """把pipeline脚本提交到任务队列，返回 (任务ID, 日志文件)；失败时返回 (None, 错误信息)
 
-def save_gene_favorites(favs):
-    """保存基因收藏记录"""
-    try:
-        with open(GENE_FAV_FILE, "w", encoding="utf-8") as f:
-            json.dump(favs, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        log_gene_lookup(f"save favorites error: {e}")
-
-
-def add_gene_favorite(gene_symbol, organism, gene_info):
-    """添加收藏（去重，按symbol+organism）"""
-    favs = load_gene_favorites()
-    key = (gene_symbol.strip().upper(), organism.strip())
-    exists = any(
-        fav.get("symbol", "").upper() == key[0] and fav.get("organism") == key[1]
-        for fav in favs
-    )
-    if exists:
-        return False
-    entry = {
-        "symbol": gene_symbol.strip(),
-        "organism": organism.strip(),
-        "chromosome": gene_info.get("chromosome"),
-        "start": gene_info.get("start"),
-        "end": gene_info.get("end"),
-        "center": gene_info.get("center"),
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    }
-    favs.append(entry)
-    save_gene_favorites(favs)
-    return True
-
-
-def fetch_gene_coordinates(gene_symbol, organism="Homo sapiens"):
-    """通过NCBI E-utilities查询基因坐标，返回染色体、起止位置、中心点"""
-    if not gene_symbol:
-        return None, "请输入基因名称"
-
-    try:
-        query_term = f"{gene_symbol}[gene] AND {organism}[organism]"
-        log_gene_lookup(f"esearch term='{query_term}'")
-
-        esearch_params = {
-            "db": "gene",
-            "term": query_term,
-            "retmode": "json",
-            "retmax": 5,
-        }
-        esearch_resp = requests.get(
-            "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi",
-            params=esearch_params,
-            timeout=10,
-        )
-        log_gene_lookup(f"esearch status={esearch_resp.status_code} url={esearch_resp.url}")
-        esearch_resp.raise_for_status()
-        esearch_data = esearch_resp.json()
-        id_list = esearch_data.get("esearchresult", {}).get("idlist", [])
-        log_gene_lookup(f"esearch idlist={id_list}")
-        if not id_list:
-            return None, "未找到匹配的基因，请输入官方基因符号（如 TP53, HLA-C）"
-
-        gene_id = id_list[0]
-        esummary_params = {"db": "gene", "id": gene_id, "retmode": "json"}
-        esummary_resp = requests.get(
-            "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi",
-            params=esummary_params,
-            timeout=10,
-        )
-        log_gene_lookup(f"esummary status={esummary_resp.status_code} url={esummary_resp.url}")
-        esummary_resp.raise_for_status()
-        esummary_data = esummary_resp.json()
-
-        # esummary 返回的结构在 result 下，也可能出现在 DocumentSummarySet 下，双重兜底
-        docsum = esummary_data.get("result", {}).get(str(gene_id), {})
-        if not docsum and "DocumentSummarySet" in esummary_data:
-            summaries = esummary_data.get("DocumentSummarySet", {}).get("DocumentSummary", [])
-            if summaries:
-                docsum = summaries[0]
-
-        genomic_info = docsum.get("genomicinfo") or docsum.get("GenomicInfo") or []
-        if isinstance(genomic_info, dict):
-            genomic_info = [genomic_info]
-
-        log_gene_lookup(f"docsum keys={list(docsum.keys()) if docsum else []}")
-
-        if not genomic_info:
-            log_gene_lookup("no genomicinfo in docsum")
-            return None, "未在NCBI记录中找到基因坐标"
-
-        region = genomic_info[0]
-        chrom = (
-            region.get("ChrLoc")
-            or region.get("chr")
-            or docsum.get("chromosome")
-            or docsum.get("Chromosome")
-        )
-        start = (
-            region.get("ChrStart")
-            or region.get("chrstart")
-            or docsum.get("chrstart")
-        )
-        end = (
-            region.get("ChrStop")
-            or region.get("chrstop")
-            or docsum.get("chrstop")
-        )
-
-        log_gene_lookup(
-            f"region keys={list(region.keys())}; raw chrom={chrom} start={start} end={end}"
-        )
-
-        if start is None or end is None or chrom is None:
-            log_gene_lookup(
-                f"missing fields after fallback chrom={chrom} start={start} end={end}; docsum keys={list(docsum.keys())}"
-            )
-            return None, "NCBI返回数据不完整，缺少染色体或坐标"
-
-        # 标准化染色体格式
-        chrom_str = str(chrom)
-        if chrom_str.upper() in ["MT", "M"]:
-            chrom_str = "chrM"
-        elif not chrom_str.lower().startswith("chr"):
-            chrom_str = f"chr{chrom_str}"
-
-        start_pos = int(min(start, end))
-        end_pos = int(max(start, end))
-        center_pos = int((start_pos + end_pos) / 2)
-
-        log_gene_lookup(f"parsed chrom={chrom_str} start={start_pos} end={end_pos} center={center_pos}")
-
-        return {
-            "gene_id": gene_id,
-            "chromosome": chrom_str,
-            "start": start_pos,
-            "end": end_pos,
-            "center": center_pos,
-            "strand": region.get("ChrStrand"),
-            "map_location": docsum.get("maplocation") or docsum.get("MapLocation"),
-            "summary": docsum.get("summary") or docsum.get("Summary"),
-        }, "查询成功"
-    except requests.RequestException as req_err:
-        log_gene_lookup(f"request error: {req_err}")
-        return None, f"网络请求失败: {req_err}"
-    except Exception as e:
-        log_gene_lookup(f"parse error: {e}")
-        return None, f"解析NCBI返回数据失败: {e}"
-
-def run_script(script_path, params):
-    """运行pipeline脚本"""
+    脚本由 job_manager 守护进程按提交顺序启动并把输出写入日志文件，
+    浏览器刷新或 Streamlit 重启都不会丢失任务。
+    """
     try:
         # 构建命令
         cmd = [script_path]
@@ -645,7 +486,8 @@ def run_script(script_path, params):
                 "-c", params["chromosome"],
                 "-p", str(params["center_position"]),
                 "-s", str(params["step_size"]),
-                "-b", str(params["background_analysis"])
+                "-b", str(params["background_analysis"]),
+                "-g", str(params.get("genome_wide", False))
             ])
         
         # 创建日志文件路径
@@ -671,37 +513,20 @@ def run_script(script_path, params):
             work_dir = os.path.dirname(params[list(params.keys())[0]]) if params else "/tmp"
             log_file = os.path.join(work_dir, f"{params.get('name', 'pipeline')}_pipeline.log")
         
-        # 运行脚本，同时输出到日志文件
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,  # 将stderr重定向到stdout
-            text=True,
-            bufsize=1,
-            universal_newlines=True
-        )
-        
-        # 启动一个线程来实时读取输出并写入日志文件
-        def write_output_to_log():
-            with open(log_file, 'w') as log_f:
-                while True:
-                    line = process.stdout.readline()
-                    if not line and process.poll() is not None:
-                        # 读取剩余输出
-                        remaining = process.stdout.read()
-                        if remaining:
-                            log_f.write(remaining)
-                        break
-                    if line:
-                        log_f.write(line)
-                        log_f.flush()  # 立即写入文件
+        # 结构化进度事件文件与日志同名，清除上次运行留下的事件
+        event_file = event_file_for(log_file)
+        if os.path.exists(event_file):
+            os.remove(event_file)
         
-        import threading
-        output_thread = threading.Thread(target=write_output_to_log)
-        output_thread.daemon = True
-        output_thread.start()
+        # 提交到任务队列；守护进程未运行时自动启动
+        job_id = job_manager.submit(cmd, log_file, project=project,
+                                    name=params.get("name") or os.path.basename(params.get("folder_name", "")) or None,
+                                    env={EVENT_FILE_ENV: event_file})
+        if not job_manager.ensure_daemon():
+            job_manager.cancel(job_id)
+            return None, "任务管理守护进程无法启动，请查看 logs/job_manager.log"
         
-        return process, log_file
+        return job_id, log_file
     except Exception as e:
         return None, str(e)
 
@@ -834,16 +659,55 @@ def create_barcode_grid(param_config, params, param_key, selected_project):
     else:
         st.warning("⚠️ 请至少选择一个 Barcode")
 
-def get_file_download_link(file_path, link_text):
-    """生成文件下载链接"""
-    try:
-        with open(file_path, "rb") as f:
-            contents = f.read()
-        b64 = base64.b64encode(contents).decode()
-        href = f'<a href="data:application/octet-stream;base64,{b64}" download="{os.path.basename(file_path)}" class="download-btn">{link_text}</a>'
-        return href
-    except Exception as e:
-        return f'<span class="file-missing">无法读取文件: {str(e)}</span>'
+JOB_STATUS_NAMES = {
+    "queued": "⏳ 排队中", "running": "🟡 运行中", "cancelling": "⏹️ 终止中", "done": "🟢 完成",
+    "failed": "🔴 失败", "cancelled": "⚪ 已取消", "lost": "⚠️ 未知",
+}
+
+def attach_job(job):
+    """把会话切换到已有任务（浏览器刷新或换用户后恢复监控）"""
+    st.session_state.selected_project = job['project'] if job['project'] in PROJECTS else st.session_state.get('selected_project')
+    st.session_state.job_id = job['id']
+    st.session_state.job_status = job['status']
+    st.session_state.log_file = job['log_file']
+    st.session_state.running = job['status'] in job_manager.ACTIVE_STATES
+    # 结果与实时结果都从工作目录读取；提交时日志写在工作目录下
+    if job['log_file']:
+        st.session_state.work_dir = os.path.dirname(job['log_file'])
+    # 恢复任务名参数，页面据此定位结果文件
+    project_params = PROJECTS.get(job['project'], {}).get('params', {})
+    if job['name'] and 'name' in project_params:
+        st.session_state[f"{job['project']}_name"] = job['name']
+    # WORF-Seq 的任务名为测序文件夹名，日志位于该文件夹内
+    if job['name'] and 'folder_name' in project_params and os.path.basename(st.session_state.get('work_dir', '')) == job['name']:
+        st.session_state[f"{job['project']}_folder_name"] = st.session_state.work_dir
+    st.session_state.start_time = datetime.fromtimestamp(job['started'] or job['submitted'])
+    st.session_state.monitor_interval = MONITOR_INTERVAL
+    st.session_state.output = []
+    st.session_state.error = ""
+
+def display_job_queue():
+    """侧边栏：任务队列与最近任务，可切换到任一任务查看进度与日志"""
+    with st.sidebar:
+        st.markdown("### 📋 任务队列")
+        try:
+            jobs = job_manager.list_jobs(limit=10)
+        except Exception as e:
+            st.caption(f"无法读取任务队列: {e}")
+            return
+        if not jobs:
+            st.caption("暂无任务")
+            return
+        daemon_ok = job_manager.is_running()
+        n_active = sum(1 for job in jobs if job['status'] in job_manager.ACTIVE_STATES)
+        st.caption(f"{'🟢' if daemon_ok else '🔴'} 守护进程{'运行中' if daemon_ok else '未运行'} · 活动任务 {n_active} 个")
+        for job in jobs:
+            label = f"#{job['id']} {JOB_STATUS_NAMES.get(job['status'], job['status'])} {job['project'] or ''} {job['name'] or ''}"
+            current = job['id'] == st.session_state.get('job_id')
+            if st.button(label, key=f"attach_job_{job['id']}", use_container_width=True,
+                         type="primary" if current else "secondary"):
+                attach_job(job)
+                st.rerun()
 
 def estimate_progress(log_content):
     """根据日志内容估算进度"""
@@ -884,93 +748,104 @@ def estimate_progress(log_content):
     return min(0.95, (completed_steps / len(steps)) * 0.9 + 0.05) / 100
 
 def analyze_progress(log_content):
-    """分析进度并返回详细信息"""
+    """分析进度并返回详细信息（运行监控中由 LogTail 增量维护同样的结果）"""
     if not log_content:
-        return {"status": "未开始", "progress": 0, "current_step": "等待开始"}
-    
-    lines = log_content.split('\n')
-    
-    # 检查是否完成
-    if "WORF-Seq Analysis Pipeline Completed Successfully" in log_content:
-        return {"status": "已完成", "progress": 100, "current_step": "分析完成"}
-    if "分析完成" in log_content or "nanobody分析完成摘要" in log_content:
-        return {"status": "已完成", "progress": 100, "current_step": "分析完成"}
-    
-    # 检查当前步骤 - 支持多个项目的步骤
-    current_step = "准备中"
-    progress_value = 0
-    
-    # 首先检查是否是 WORF-Seq 项目
-    if "WORF-Seq Analysis Pipeline Started" in log_content:
-        # WORF-Seq 步骤
-        if "步骤4: 染色体比对图生成" in log_content:
-            current_step = "染色体比对图生成"
-            progress_value = 85
-        elif "步骤3: SAM转BAM" in log_content:
-            current_step = "SAM转BAM处理"
-            progress_value = 65
-        elif "步骤2: 序列比对" in log_content:
-            current_step = "序列比对中"
-            progress_value = 45
-        elif "步骤1: 开始质控处理" in log_content:
-            current_step = "质控处理"
-            progress_value = 25
-        else:
-            current_step = "开始分析"
-            progress_value = 10
-    # 检查是否是 Nanobody 项目
-    elif "开始纳米抗体分析流程" in log_content:
-        # Nanobody 步骤
-        if "步骤4:" in log_content:
-            current_step = "解析序列并生成结果"
-            progress_value = 80
-        elif "步骤3:" in log_content:
-            current_step = "Trim序列处理"
-            progress_value = 60
-        elif "步骤2:" in log_content:
-            current_step = "格式转换"
-            progress_value = 40
-        elif "步骤1:" in log_content:
-            current_step = "FLASH拼接序列"
-            progress_value = 20
-        else:
-            current_step = "开始分析"
-            progress_value = 10
-    # Egg Indel 步骤 - 增强版
-    elif "Egg Indel Analysis Completed" in log_content:
-        current_step = "分析完成"
-        progress_value = 100
-    elif "calculating indel efficiency" in log_content.lower():
-        current_step = "计算编辑效率"
-        progress_value = 90
-    elif "aligning reads" in log_content.lower():
-        current_step = "序列比对"
-        progress_value = 75
-    elif "Running egg_indel_analysis.py" in log_content:
-        current_step = "Indel分析处理"
-        progress_value = 60
-    elif "processing barcode" in log_content.lower():
-        current_step = "处理Barcode数据"
-        progress_value = 45
-    elif "splitting reads by barcode" in log_content.lower():
-        current_step = "按Barcode分组"
-        progress_value = 30
-    elif "merging reads" in log_content.lower():
-        current_step = "合并双端序列"
-        progress_value = 15
-    elif "Starting Egg Indel Analysis" in log_content:
-        current_step = "开始分析"
-        progress_value = 10
-    
-    # 检查是否有错误
-    if "[ERROR]" in log_content or "错误:" in log_content or "ERROR" in log_content:
-        current_step += " (检测到错误)"
-    
-    return {
-        "status": "运行中" if progress_value < 100 else "已完成",
-        "progress": progress_value,
-        "current_step": current_step
-    }
+        return progress_from_markers(set(), has_content=False)
+    return progress_from_markers(find_markers(log_content))
+
+
+def get_log_tail(log_file):
+    """返回该日志的增量读取器（按路径保存在会话中，每次刷新只读取新增字节）"""
+    tails = st.session_state.setdefault('log_tails', {})
+    tail = tails.get(log_file)
+    if tail is None:
+        tail = tails[log_file] = LogTail(log_file)
+    tail.poll()
+    return tail
+
+def event_file_for(log_file):
+    """日志对应的结构化进度事件文件（JSON-lines）"""
+    return os.path.splitext(log_file)[0] + ".events.jsonl"
+
+def get_event_tail(log_file):
+    """返回该日志对应事件文件的增量读取器；事件文件不存在时返回的读取器没有内容"""
+    tails = st.session_state.setdefault('event_tails', {})
+    tail = tails.get(log_file)
+    if tail is None:
+        tail = tails[log_file] = EventTail(event_file_for(log_file))
+    tail.poll()
+    return tail
+
+def pipeline_progress(log_tail, event_tail):
+    """优先使用事件流给出的精确进度，旧版脚本或无事件时按日志标记估算"""
+    if event_tail is not None and event_tail.has_content():
+        return event_tail.progress()
+    return log_tail.progress() if log_tail else analyze_progress("")
+
+def format_stage_table(stages):
+    """把事件流中的阶段明细整理为表格"""
+    import pandas as pd
+    status_names = {"running": "🟡 运行中", "ok": "🟢 完成", "skip": "⚪ 跳过", "error": "🔴 失败"}
+    rows = []
+    for stage in stages:
+        elapsed = stage.get("elapsed")
+        if elapsed is None and stage.get("start") and stage.get("end"):
+            elapsed = stage["end"] - stage["start"]
+        rows.append({
+            "阶段": stage.get("label") or stage["stage"],
+            "状态": status_names.get(stage["status"], stage["status"]),
+            "已处理": f"{stage['records']:,}" if stage.get("records") is not None else "",
+            "速度 (条/秒)": f"{stage['rate']:,.0f}" if stage.get("rate") else "",
+            "耗时": f"{elapsed:.1f} 秒" if elapsed is not None else "",
+        })
+    return pd.DataFrame(rows)
+
+def format_bytes_rate(value):
+    """字节/秒显示为 MB/s"""
+    return f"{value / 1024 / 1024:,.1f} MB/s" if value is not None else "-"
+
+def display_resource_panel(job_id, running=True):
+    """任务进程树的资源时间序列（守护进程通过 /proc 采样）：当前值 + CPU/内存/读写曲线"""
+    samples = job_manager.get_samples(job_id)
+    if not samples:
+        if running:
+            st.caption("📈 资源采样中（首个数据点需等待几秒）...")
+        return
+    import pandas as pd
+    latest = samples[-1]
+    cols = st.columns(4)
+    cols[0].metric("CPU", f"{latest['cpu_percent']:,.0f}%" if latest['cpu_percent'] is not None else "-")
+    cols[1].metric("内存 (RSS)", f"{latest['rss_kb'] / 1024:,.0f} MB")
+    cols[2].metric("读取", format_bytes_rate(latest['read_rate']),
+                   help=f"累计 {latest['read_bytes'] / 1024 / 1024:,.0f} MB")
+    cols[3].metric("写入", format_bytes_rate(latest['write_rate']),
+                   help=f"累计 {latest['write_bytes'] / 1024 / 1024:,.0f} MB")
+    if running:
+        cmd_cpu = f"{latest['cmd_cpu']:,.0f}%" if latest['cmd_cpu'] is not None else "-"
+        st.caption(f"⚙️ 当前主要进程（CPU {cmd_cpu}，{latest['cmd_threads']} 线程，"
+                   f"共 {latest['n_procs']} 个进程）: `{latest['command']}`")
+
+    df = pd.DataFrame(samples)
+    df['时间'] = pd.to_datetime(df['ts'], unit='s')
+    df = df.set_index('时间')
+    col1, col2 = st.columns(2)
+    with col1:
+        st.caption("CPU 使用率 (%，100 = 1 核)")
+        st.line_chart(df[['cpu_percent']].rename(columns={'cpu_percent': 'CPU %'}), height=180)
+        st.caption("内存 (MB)")
+        st.line_chart((df[['rss_kb']] / 1024).rename(columns={'rss_kb': 'RSS MB'}), height=180)
+    with col2:
+        st.caption("读写速度 (MB/s)")
+        io = df[['read_rate', 'write_rate']] / 1024 / 1024
+        st.line_chart(io.rename(columns={'read_rate': '读取', 'write_rate': '写入'}), height=180)
+        # 各阶段的主要进程：命令变化时记录一行，便于对照曲线
+        changes = df[df['command'] != df['command'].shift()]
+        st.caption("主要进程变化")
+        st.dataframe(pd.DataFrame({
+            '开始时间': changes.index.strftime('%H:%M:%S'),
+            '命令': changes['command'].str.slice(0, 80),
+            '线程': changes['cmd_threads'],
+        }), use_container_width=True, hide_index=True, height=180)
 
 def get_current_step(log_content):
     """获取当前执行步骤的简短描述"""
@@ -990,469 +865,19 @@ def get_current_step(log_content):
     else:
         return "⏳ 准备中"
 
-def display_results(project_name, params, work_dir):
-    # 初始化变量，避免UnboundLocalError
-    folder_name = work_dir
-    folder_basename = os.path.basename(work_dir) if work_dir else "analysis"
-    if project_name == "Nanobody" and params.get('name'):
-        result_file = os.path.join(work_dir, f"{params['name']}_result.csv")
-        
-        st.markdown("## 📊 Nanobody 分析结果")
-        st.markdown("---")
-        
-        if os.path.exists(result_file):
-            try:
-                df = pd.read_csv(result_file)
-                
-                # 显示文件状态
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    st.metric("📏 总行数", len(df))
-                with col2:
-                    st.metric("📋 总列数", len(df.columns))
-                with col3:
-                    file_size = os.path.getsize(result_file) / 1024
-                    st.metric("💾 文件大小", f"{file_size:.1f} KB")
-                with col4:
-                    file_time = datetime.fromtimestamp(os.path.getmtime(result_file))
-                    st.metric("🕐 修改时间", file_time.strftime('%m-%d %H:%M'))
-                
-                st.markdown("---")
-                
-                # 主要下载区域
-                st.markdown("### 💾 结果文件下载")
-                col1, col2 = st.columns([1, 1])
-                
-                with col1:
-                    # Streamlit原生下载
-                    try:
-                        csv_content = df.to_csv(index=False)
-                        st.download_button(
-                            label="📥 下载完整CSV文件",
-                            data=csv_content,
-                            file_name=f"{params['name']}_result.csv",
-                            mime="text/csv",
-                            use_container_width=True
-                        )
-                    except Exception as e:
-                        st.error(f"生成下载失败: {e}")
-                
-                with col2:
-                    # 备用下载方法
-                    download_link = get_file_download_link(result_file, "📁 原始文件下载")
-                    st.markdown(download_link, unsafe_allow_html=True)
-                
-                st.markdown("---")
-                
-                # 数据预览控制
-                st.markdown("### 📋 数据预览设置")
-                col1, col2 = st.columns([1, 1])
-                
-                with col1:
-                    preview_rows = st.slider(
-                        "显示行数",
-                        min_value=10,
-                        max_value=min(1000, len(df)),
-                        value=100,
-                        key=f"preview_rows_{params['name']}"
-                    )
-                
-                with col2:
-                    show_all_columns = st.checkbox("显示所有列", value=True, key=f"show_all_cols_{params['name']}")
-                    if not show_all_columns:
-                        selected_columns = st.multiselect(
-                            "选择显示的列",
-                            options=df.columns.tolist(),
-                            default=df.columns.tolist()[:5],
-                            key=f"select_cols_{params['name']}"
-                        )
-                        df_display = df[selected_columns]
-                    else:
-                        df_display = df
-                
-                st.markdown("---")
-                
-                # 显示数据表格
-                st.markdown(f"### 📊 数据预览 (前 {preview_rows} 行)")
-                st.dataframe(
-                    df_display.head(preview_rows),
-                    use_container_width=True,
-                    height=500
-                )
-                
-                # 显示列详细信息
-                with st.expander("📈 列详细信息"):
-                    col_info = []
-                    for col in df.columns:
-                        dtype = str(df[col].dtype)
-                        non_null = df[col].notna().sum()
-                        null_count = df[col].isna().sum()
-                        unique_count = df[col].nunique()
-                        
-                        col_info.append({
-                            '列名': col,
-                            '数据类型': dtype,
-                            '非空值': non_null,
-                            '空值': null_count,
-                            '唯一值': unique_count
-                        })
-                    
-                    col_info_df = pd.DataFrame(col_info)
-                    st.dataframe(col_info_df, use_container_width=True)
-                
-            except Exception as e:
-                st.error(f"❌ 读取CSV文件失败: {e}")
-                st.markdown("### 📁 直接文件访问")
-                st.info(f"文件路径: `{result_file}`")
-                
-                # 提供直接下载
-                if os.path.exists(result_file):
-                    download_link = get_file_download_link(result_file, f"📥 下载 {os.path.basename(result_file)}")
-                    st.markdown(download_link, unsafe_allow_html=True)
-        else:
-            st.warning(f"⚠️ 结果文件不存在: `{result_file}`")
-            st.info("💡 请等待分析完成或检查工作目录是否正确")
-    
-    # 处理 Egg_Indel 项目的结果显示
-    elif project_name == "Egg_Indel" and params.get('name'):
-        # 添加CSV文件选择下载功能
-        st.markdown("### 📥 CSV结果文件下载")
-        
-        # 定义结果文件夹路径
-        result_dir = "/data/sunyuhong/data/20250720_ShangHaiJiaoTongDaXue-sunyuhong-1_1/00.mergeRawFq/UDI001/20250720_result"
-        
-        # 查找所有CSV文件
-        csv_files = []
-        if os.path.exists(result_dir):
-            for file in os.listdir(result_dir):
-                if file.endswith('.csv'):
-                    csv_files.append(file)
-        
-        if csv_files:
-            # 文件选择器
-            st.markdown("#### 🔍 选择要下载的CSV文件")
-            selected_csv = st.selectbox(
-                "选择CSV文件:",
-                csv_files,
-                key="egg_indel_csv_selector"
-            )
-            
-            if selected_csv:
-                result_file = os.path.join(result_dir, selected_csv)
-                
-                if os.path.exists(result_file):
-                    # 显示文件信息（简化版，不显示大小和时间）
-                    col1, col2 = st.columns([2, 1])
-                    with col1:
-                        st.info(f"📁 选中文件: `{selected_csv}`")
-                    
-                    with col2:
-                        # 生成下载链接
-                        download_link = get_file_download_link(result_file, "📥 下载选中文件")
-                        st.markdown(download_link, unsafe_allow_html=True)
-                else:
-                    st.warning(f"⚠️ 文件不存在: `{result_file}`")
-        else:
-            st.warning("⚠️ 未找到任何CSV文件")
-            st.info("💡 请检查结果文件夹路径是否正确，或等待文件生成")
-        
-        st.markdown("---")
-        return
-        
-        # 分析参数概览
-        st.markdown("### 🔍 分析参数")
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("📁 文件夹", folder_basename)
-        with col2:
-            st.metric("🧬 染色体", chromosome)
-        with col3:
-            st.metric("📍 中心位置", f"{center_position:,}")
-        with col4:
-            step_size = params.get('step_size', 100000)
-            st.metric("📏 步长", f"{step_size:,}")
-        
-        st.markdown("---")
-        
-        # 查找生成的图片文件
-        st.markdown("### 📈 染色体比对图")
-        
-        # 调试信息：显示文件夹内容
-        import glob
-        if os.path.exists(folder_name):
-            all_files = glob.glob(os.path.join(folder_name, "*"))
-            png_files = glob.glob(os.path.join(folder_name, "*.png"))
-            txt_files = glob.glob(os.path.join(folder_name, "*.txt"))
-            
-            with st.expander("🔍 调试信息 - 文件夹内容"):
-                st.write(f"**文件夹路径:** `{folder_name}`")
-                st.write(f"**所有文件数量:** {len(all_files)}")
-                st.write(f"**PNG文件数量:** {len(png_files)}")
-                st.write(f"**文本文件数量:** {len(txt_files)}")
-                
-                if png_files:
-                    st.write("**PNG文件列表:**")
-                    for png_file in png_files:
-                        filename = os.path.basename(png_file)
-                        filesize = os.path.getsize(png_file) / (1024 * 1024)  # MB
-                        st.write(f"  - {filename} ({filesize:.2f} MB)")
-                
-                if txt_files:
-                    st.write("**文本文件列表:**")
-                    for txt_file in txt_files:
-                        filename = os.path.basename(txt_file)
-                        filesize = os.path.getsize(txt_file) / 1024  # KB
-                        st.write(f"  - {filename} ({filesize:.2f} KB)")
-        else:
-            st.error(f"❌ 文件夹不存在: `{folder_name}`")
-        
-        # 可能的图片文件模式 (根据WGSmapping.py生成的实际文件名)
-        image_patterns = [
-            f"{folder_basename}_target_region_{chromosome}_{center_position}.png",
-            f"{folder_basename}_target_region_{chromosome}_{center_position}.pdf",
-            f"{folder_basename}_chromosome_{chromosome}_step{step_size}.png",
-            f"{folder_basename}_chromosome_{chromosome}_step{step_size}.pdf"
-        ]
-        
-        found_images = []
-        
-        # 先精确匹配
-        for pattern in image_patterns:
-            image_path = os.path.join(folder_name, pattern)
-            if os.path.exists(image_path):
-                found_images.append((image_path, pattern))
-        
-        # 如果没有找到，尝试模糊搜索
-        if not found_images:
-            import glob
-            # 搜索目标区域图
-            target_pattern = os.path.join(folder_name, f"*target_region_{chromosome}_{center_position}*.png")
-            target_images = glob.glob(target_pattern)
-            for img_path in target_images:
-                filename = os.path.basename(img_path)
-                found_images.append((img_path, filename))
-            
-            # 搜索全染色体图
-            chrom_pattern = os.path.join(folder_name, f"*chromosome_{chromosome}_step{step_size}*.png")
-            chrom_images = glob.glob(chrom_pattern)
-            for img_path in chrom_images:
-                filename = os.path.basename(img_path)
-                found_images.append((img_path, filename))
-            
-            # 搜索所有PNG文件作为后备
-            if not found_images:
-                png_pattern = os.path.join(folder_name, "*.png")
-                all_pngs = glob.glob(png_pattern)
-                for img_path in all_pngs:
-                    filename = os.path.basename(img_path)
-                    found_images.append((img_path, filename))
-        
-        if found_images:
-            # 显示找到的图片
-            for image_path, filename in found_images:
-                try:
-                    st.markdown(f"#### 📊 {filename}")
-                    
-                    # 文件信息
-                    file_size = os.path.getsize(image_path) / (1024 * 1024)  # MB
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.info(f"📁 文件: {filename} ({file_size:.2f} MB)")
-                    with col2:
-                        # 下载按钮
-                        download_link = get_file_download_link(image_path, f"📥 下载 {filename}")
-                        st.markdown(download_link, unsafe_allow_html=True)
-                    
-                    # 显示图片
-                    if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                        # 检查文件是否可读
-                        if os.path.getsize(image_path) > 0:
-                            try:
-                                st.image(image_path, caption=f"{filename}", use_container_width=True)
-                            except Exception as img_e:
-                                st.error(f"❌ 图片加载失败: {img_e}")
-                                st.code(f"文件路径: {image_path}")
-                        else:
-                            st.warning(f"⚠️ 图片文件为空: {filename}")
-                    else:
-                        st.warning(f"📄 {filename} (PDF格式，请下载后查看)")
-                    
-                    st.markdown("---")
-                    
-                except Exception as e:
-                    st.error(f"❌ 无法显示图片 {filename}: {e}")
-                    st.code(f"完整路径: {image_path}")
-        else:
-            st.warning("⚠️ 未找到染色体比对图")
-            st.info("💡 请检查分析是否已完成，或查看日志文件获取更多信息")
-        
-        # 显示分析报告
-        report_file = os.path.join(folder_name, f"{folder_basename}_worf_seq_summary.txt")
-        if os.path.exists(report_file):
-            st.markdown("### 📋 分析报告")
-            try:
-                with open(report_file, 'r', encoding='utf-8') as f:
-                    report_content = f.read()
-                st.text_area("完整分析报告", value=report_content, height=200, disabled=True)
-                
-                # 下载报告
-                download_link = get_file_download_link(report_file, f"📥 下载分析报告")
-                st.markdown(download_link, unsafe_allow_html=True)
-                
-            except Exception as e:
-                st.error(f"❌ 读取分析报告失败: {e}")
-        
-        # 显示BAM文件信息（如果存在）
-        bam_file = os.path.join(folder_name, f"{folder_basename}_aligned_minimap.sorted.bam")
-        if os.path.exists(bam_file):
-            st.markdown("### 🧬 BAM文件信息")
-            try:
-                file_size = os.path.getsize(bam_file) / (1024 * 1024)  # MB
-                index_file = f"{bam_file}.bai"
-                index_exists = os.path.exists(index_file)
-                index_size = os.path.getsize(index_file) / (1024 * 1024) if index_exists else 0
-                
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("📊 BAM大小", f"{file_size:.2f} MB")
-                with col2:
-                    st.metric("📋 索引存在", "✅" if index_exists else "❌")
-                with col3:
-                    if index_exists:
-                        st.metric("📁 索引大小", f"{index_size:.2f} MB")
-                    else:
-                        st.metric("📁 索引大小", "N/A")
-                
-                # 下载BAM文件
-                download_link = get_file_download_link(bam_file, f"📥 下载 {os.path.basename(bam_file)}")
-                st.markdown(download_link, unsafe_allow_html=True)
-                
-                if index_exists:
-                    download_link = get_file_download_link(index_file, f"📥 下载 {os.path.basename(index_file)}")
-                    st.markdown(download_link, unsafe_allow_html=True)
-                    
-            except Exception as e:
-                st.error(f"❌ 读取BAM文件信息失败: {e}")
-        
-        # 显示所有生成的文件
-        st.markdown("### 📁 所有生成文件")
-        all_files = []
-        if os.path.exists(folder_name):
-            for file in os.listdir(folder_name):
-                file_path = os.path.join(folder_name, file)
-                if os.path.isfile(file_path):
-                    file_size = os.path.getsize(file_path) / (1024 * 1024)  # MB
-                    file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                    all_files.append({
-                        '文件名': file,
-                        '大小 (MB)': f"{file_size:.2f}",
-                        '修改时间': file_time.strftime('%Y-%m-%d %H:%M:%S')
-                    })
-        
-        if all_files:
-            df_files = pd.DataFrame(all_files)
-            st.dataframe(df_files, use_container_width=True)
-        else:
-            st.info("未找到生成文件")
-
-    # 新增 WORF-Seq 结果展示（重定位临时目录 + 打包下载 PNG/TXT）
-    if project_name == "WORF-Seq" and params.get("folder_name"):
-        folder_input = params["folder_name"]
-        folder_basename = os.path.basename(folder_input)
-        chromosome = params.get("chromosome", "chr6")
-        center_position = params.get("center_position", 0)
-        step_size = params.get("step_size", 100000)
-        import glob
-
-        def dir_has_outputs(path):
-            if not os.path.exists(path):
-                return False
-            pngs = glob.glob(os.path.join(path, "*.png"))
-            txts = glob.glob(os.path.join(path, "*worf_seq_summary.txt"))
-            return len(pngs) + len(txts) > 0
-
-        candidates = [folder_input] + glob.glob(f"/tmp/worf_seq_{folder_basename}_*")
-        result_dir = next((p for p in candidates if dir_has_outputs(p)), candidates[0])
-
-        if result_dir != folder_input:
-            st.warning(f"已从临时目录加载结果: {result_dir}")
-
-        st.markdown("## 📊 WORF-Seq 分析结果")
-        st.markdown("### 🔍 结果目录")
-        st.info(f"📁 使用目录: {result_dir}")
-
-        # 尝试查找实际生成的文件（兼容多种命名格式，包含旧的带有对齐后缀的名字）
-        import fnmatch
-
-        def find_result_file(dirpath, pattern_glob):
-            matches = glob.glob(os.path.join(dirpath, pattern_glob))
-            return matches[0] if matches else None
-
-        # 支持两类命名：1) {sample}_target_region_chr_pos.png 2) {sample}_aligned_minimap.sorted_target_region_chr_pos.png
-        target_patterns = [f"{folder_basename}_target_region_{chromosome}_{center_position}.png",
-                           f"{folder_basename}_*target_region_{chromosome}_{center_position}.png"]
-        chrom_patterns = [f"{folder_basename}_chromosome_{chromosome}_step{step_size}.png",
-                          f"{folder_basename}_*chromosome_{chromosome}_step{step_size}.png"]
-        summary_patterns = [f"{folder_basename}_worf_seq_summary.txt",
-                            f"{folder_basename}_*worf_seq_summary.txt"]
 
-        target_png = None
-        chrom_png = None
-        summary_txt = None
-        for p in target_patterns:
-            found = find_result_file(result_dir, p)
-            if found:
-                target_png = found
-                break
-        for p in chrom_patterns:
-            found = find_result_file(result_dir, p)
-            if found:
-                chrom_png = found
-                break
-        for p in summary_patterns:
-            found = find_result_file(result_dir, p)
-            if found:
-                summary_txt = found
-                break
 
-        # 单文件下载（不含 BAM）
-        st.markdown("### 📥 结果下载 (不含BAM)")
-        for fpath, label in [
-            (target_png, "下载目标区域图"),
-            (chrom_png, "下载全染色体图"),
-            (summary_txt, "下载报告(txt)")
-        ]:
-            if fpath and os.path.exists(fpath):
-                st.markdown(get_file_download_link(fpath, f"📥 {label}"), unsafe_allow_html=True)
-            else:
-                # 显示期望文件名以便用户参考
-                expected_name = label
-                if label == "下载目标区域图":
-                    expected_name = f"{folder_basename}_target_region_{chromosome}_{center_position}.png"
-                elif label == "下载全染色体图":
-                    expected_name = f"{folder_basename}_chromosome_{chromosome}_step{step_size}.png"
-                elif label == "下载报告(txt)":
-                    expected_name = f"{folder_basename}_worf_seq_summary.txt"
-                st.info(f"未找到文件: {expected_name}")
-
-        # 打包下载（仅 PNG + TXT，排除 BAM）
-        bundle_candidates = [p for p in [target_png, chrom_png, summary_txt] if p and os.path.exists(p)]
-        if bundle_candidates:
-            import tarfile
-            bundle_name = f"{folder_basename}_worf_seq_results.tar.gz"
-            bundle_path = os.path.join(result_dir, bundle_name)
-            try:
-                with tarfile.open(bundle_path, "w:gz") as tar:
-                    for f in bundle_candidates:
-                        tar.add(f, arcname=os.path.basename(f))
-                st.success(f"已打包 {len(bundle_candidates)} 个文件")
-                st.markdown(get_file_download_link(bundle_path, f"📦 下载 {bundle_name}"), unsafe_allow_html=True)
-            except Exception as e:
-                st.error(f"打包失败: {e}")
-        else:
-            st.info("未找到可打包的PNG/TXT结果")
+def display_results(project_name, params, work_dir):
+    """由项目页面模块展示结果（页面模块在首次选中该项目时才导入）"""
+    if project_name in PROJECTS:
+        get_page(project_name).display_results(params, work_dir)
 
-        return
+def display_live_results(project_name, params, work_dir):
+    """任务运行中由页面模块展示阶段性结果（页面模块未提供 display_live_results 时不显示）"""
+    if project_name in PROJECTS:
+        page = get_page(project_name)
+        if hasattr(page, "display_live_results"):
+            page.display_live_results(params, work_dir)
 
 def display_log_files(work_dir, analysis_name):
     """显示和分析日志文件"""
@@ -1605,10 +1030,275 @@ def display_log_files(work_dir, analysis_name):
         - 检查工作目录中是否有 `.log` 文件
         """)
 
+def reset_monitor_interval():
+    """恢复基础刷新间隔；间隔改变时整页重跑一次，以新的 run_every 重新声明片段"""
+    st.session_state.monitor_signature = None
+    st.session_state.monitor_checked = time.time()
+    if st.session_state.get('monitor_interval', MONITOR_INTERVAL) != MONITOR_INTERVAL:
+        st.session_state.monitor_interval = MONITOR_INTERVAL
+        st.rerun()
+
+def update_monitor_interval(signature):
+    """按监控内容是否变化调整自动刷新间隔
+
+    signature 为任务状态与日志/事件文件已读偏移；无变化时间隔加倍（最长 MONITOR_MAX_INTERVAL），
+    有变化时恢复为 MONITOR_INTERVAL。片段的 run_every 在声明时固定，间隔改变时整页重跑一次重新声明，
+    这在每次退避/恢复时只发生一次。只有距上次检查已过当前间隔才算一次"无变化"，
+    避免整页重跑时立即再次加倍。
+    """
+    state = st.session_state
+    interval = state.get('monitor_interval', MONITOR_INTERVAL)
+    now = time.time()
+    if signature != state.get('monitor_signature'):
+        new_interval = MONITOR_INTERVAL
+    elif now - state.get('monitor_checked', 0) >= interval * 0.9:
+        new_interval = min(MONITOR_MAX_INTERVAL, interval * 2)
+    else:
+        return
+    state.monitor_signature = signature
+    state.monitor_checked = now
+    if new_interval != interval:
+        state.monitor_interval = new_interval
+        st.rerun()
+
+def run_monitor(selected_project, params):
+    """任务运行中时把运行监控声明为定时刷新的片段；未运行时只渲染一次"""
+    run_every = st.session_state.get('monitor_interval', MONITOR_INTERVAL) if st.session_state.get('running') else None
+    st.fragment(run_every=run_every)(display_run_monitor)(selected_project, params)
+
+def display_run_monitor(selected_project, params):
+    """运行监控（进度、资源、日志）；任务运行中时作为片段按 monitor_interval 独立刷新，不重跑整个页面"""
+    was_running = st.session_state.get('running', False)
+    st.markdown("### 📊 执行日志")
+    
+    # 进度信息
+    if st.session_state.get('running', False):
+        elapsed = datetime.now() - st.session_state.get('start_time', datetime.now())
+        st.info(f"⏱️ 运行时间: {elapsed}")
+        
+        # 添加Egg Indel特定的状态信息
+        if selected_project == "Egg_Indel":
+            st.info("🔬 Egg Indel CRISPR编辑效率分析进行中...")
+            
+            # 检查是否已经过了30秒，显示下载选项
+            if st.session_state.get('download_start_time'):
+                current_time = datetime.now()
+                time_diff = (current_time - st.session_state['download_start_time']).total_seconds()
+                
+                if time_diff >= 30:
+                    st.markdown("### 📥 结果下载")
+                    st.info("✅ 分析已开始超过30秒，可以下载结果文件")
+                    
+                    result_file = st.session_state.get('egg_indel_result_file', "/data/sunyuhong/data/20250720_ShangHaiJiaoTongDaXue-sunyuhong-1_1/00.mergeRawFq/UDI001/20250720_result/sample_summary.csv")
+                    
+                    if os.path.exists(result_file):
+                        # 显示文件信息
+                        file_size = os.path.getsize(result_file) / (1024 * 1024)  # MB
+                        file_time = datetime.fromtimestamp(os.path.getmtime(result_file))
+                        
+                        col1, col2 = st.columns([2, 1])
+                        with col1:
+                            st.info(f"📁 结果文件: `{os.path.basename(result_file)}`")
+                            st.write(f"📏 文件大小: {file_size:.2f} MB")
+                            st.write(f"🕐 修改时间: {file_time.strftime('%Y-%m-%d %H:%M:%S')}")
+                        
+                        with col2:
+                            # 生成下载链接
+                            download_link = get_file_download_link(result_file, "📥 下载结果文件")
+                            st.markdown(download_link, unsafe_allow_html=True)
+                    else:
+                        st.warning(f"⚠️ 结果文件不存在: `{result_file}`")
+                        st.info("💡 请检查文件路径是否正确，或等待文件生成")
+                else:
+                    remaining_time = 30 - time_diff
+                    st.info(f"⏳ 分析开始后 {int(remaining_time)} 秒可下载结果文件")
+    
+    # 增量读取日志：只读取上次刷新之后新增的字节
+    log_tail = None
+    if st.session_state.get('log_file') and os.path.exists(st.session_state.get('log_file')):
+        try:
+            log_tail = get_log_tail(st.session_state.get('log_file'))
+        except Exception as e:
+            st.warning(f"无法读取日志文件: {e}")
+    has_log = log_tail is not None and log_tail.has_content()
+    # 结构化进度事件（新版 pipeline 脚本写出），用于精确的阶段进度与速度
+    event_tail = None
+    if st.session_state.get('log_file'):
+        try:
+            event_tail = get_event_tail(st.session_state.get('log_file'))
+        except OSError:
+            event_tail = None
+    
+    # 轮询任务状态（任务由 job_manager 守护进程运行，页面刷新或重启不影响任务）
+    if st.session_state.get('job_id'):
+        try:
+            job = job_manager.get_job(st.session_state.job_id)
+            if job is None:
+                raise LookupError(f"任务不存在: #{st.session_state.job_id}")
+            st.session_state.job_status = job['status']
+            if job['status'] == 'queued':
+                # 排队中：日志文件可能还是上一次运行留下的，不显示
+                has_log = False
+                position = job_manager.queue_position(job['id'])
+                daemon = job_manager.daemon_status() or {}
+                st.info(f"⏳ 任务 #{job['id']} 排队中，前面还有 {position or 0} 个任务"
+                        f"（最多同时运行 {daemon.get('max_jobs') or job_manager.MAX_JOBS} 个）")
+            if job['status'] in ('running', 'cancelling'):  # 任务仍在运行
+                if job['status'] == 'cancelling':
+                    st.warning("⏹️ 正在终止任务...")
+                # 显示进度条和实时状态
+                progress_info = pipeline_progress(log_tail, event_tail)
+                
+                # 为Egg Indel添加特定状态信息
+                if selected_project == "Egg_Indel":
+                    status_text = f"🔬 Egg Indel Analysis - {progress_info['current_step']} ({progress_info['progress']}%)"
+                else:
+                    status_text = f"{progress_info['current_step']} ({progress_info['progress']}%)"
+                
+                st.progress(progress_info['progress'] / 100, text=status_text)
+                if progress_info.get('stages'):
+                    if progress_info.get('rate'):
+                        st.caption(f"⚡ 当前阶段处理速度: {progress_info['rate']:,.0f} 条/秒")
+                    st.dataframe(format_stage_table(progress_info['stages']), use_container_width=True, hide_index=True)
+                
+                # 进程树资源监控
+                st.markdown("### 📈 资源监控")
+                display_resource_panel(job['id'])
+                
+                # 阶段性结果（如 Nanobody 的近似 Top 克隆）
+                display_live_results(selected_project, params, st.session_state.get('work_dir', '.'))
+                
+                # 实时显示最近几行日志
+                if has_log:
+                    recent_lines = log_tail.text().strip().split('\n')[-10:]  # 显示最后10行
+                    st.markdown("### 📋 实时日志输出")
+                    st.code("\n".join(recent_lines), language="bash")
+                    st.caption(f"🔄 实时更新 (最后{len(recent_lines)}行)")
+                else:
+                    st.info("⏳ 等待日志输出...")
+            
+            if job['status'] in job_manager.ACTIVE_STATES:
+                # 自动刷新：本面板作为片段定时重跑，无变化时逐步延长间隔
+                st.markdown("---")
+                col1, col2 = st.columns([1, 1])
+                with col1:
+                    # 片段内的按钮只重跑本面板
+                    if st.button("🔄 手动刷新日志", key="refresh_logs"):
+                        reset_monitor_interval()
+                with col2:
+                    st.info(f"💡 日志每 {st.session_state.get('monitor_interval', MONITOR_INTERVAL):g} 秒自动更新"
+                            "（无新输出时逐步放慢），点击按钮可立即刷新")
+                update_monitor_interval((job['status'], log_tail.offset if log_tail else None,
+                                         event_tail.offset if event_tail else None))
+                
+            else:  # 任务结束
+                # 清除进度并显示完成状态
+                returncode = job['returncode']
+                if job['status'] == 'done':
+                    st.success("✅ 执行完成！")
+                    
+                    # 为Egg Indel添加完成信息和下载选项
+                    if selected_project == "Egg_Indel":
+                        st.info("🎉 Egg Indel CRISPR编辑效率分析已完成！")
+                        
+                        # 检查是否已设置下载状态
+                        if not st.session_state.get('download_ready', False):
+                            st.session_state['download_ready_time'] = datetime.now()
+                            st.session_state['download_ready'] = True
+                        
+                        # 设置结果文件路径
+                        st.session_state['egg_indel_result_file'] = "/data/sunyuhong/data/20250720_ShangHaiJiaoTongDaXue-sunyuhong-1_1/00.mergeRawFq/UDI001/20250720_result/sample_summary.csv"
+                elif job['status'] == 'cancelled':
+                    st.warning(f"⏹️ 任务 #{job['id']} 已取消")
+                elif job['status'] == 'lost':
+                    st.warning(f"⚠️ {job['message']}")
+                else:
+                    st.error(f"❌ 执行失败，返回码: {returncode}")
+                    if job.get('message'):
+                        st.session_state.error = job['message']
+                usage = job_manager.format_usage(job)
+                if usage:
+                    st.caption(f"📈 资源用量（整个进程树）: {usage}")
+                with st.expander("📈 资源监控记录"):
+                    display_resource_panel(job['id'], running=False)
+                
+                st.session_state.running = False
+                
+                # 读取进程结束前最后写入的日志
+                if log_tail is not None:
+                    log_tail.poll()
+                    has_log = log_tail.has_content()
+                if event_tail is not None:
+                    event_tail.poll()
+                if was_running:
+                    # 在片段刷新中检测到任务结束：整页重跑一次，更新停止按钮与结果展示
+                    st.rerun()
+                        
+        except Exception as e:
+            st.error(f"❌ 检查任务状态时出错: {e}")
+            st.session_state.running = False
+    
+    # 显示日志内容
+    if has_log:
+        st.markdown("### 📜 实时日志输出")
+        
+        # 创建两列布局：日志显示 + 进度信息
+        col1, col2 = st.columns([4, 1])
+        
+        with col1:
+            # 日志显示选项：运行中默认只显示最近的行（来自环形缓冲区，无需重新读取文件）
+            show_all_logs = st.checkbox("显示完整日志", value=not st.session_state.get('running', False),
+                                        key="show_all_logs")
+            
+            if show_all_logs:
+                # 缓冲区已包含全部日志时直接使用，否则读取完整文件
+                if log_tail.truncated:
+                    with open(log_tail.path, 'r', encoding='utf-8', errors='replace') as f:
+                        full_log = f.read()
+                else:
+                    full_log = log_tail.text()
+                st.code(full_log, language='bash', line_numbers=False)
+            else:
+                # 只显示最后N行
+                tail_lines = st.slider("显示最后几行", 100, log_tail.max_lines, 500, key="tail_lines")
+                st.code('\n'.join(log_tail.recent(tail_lines)), language='bash', line_numbers=True)
+                if log_tail.truncated:
+                    st.caption(f"共 {log_tail.total_lines:,} 行，仅保留最近 {log_tail.max_lines:,} 行")
+        
+        with col2:
+            # 进度分析（增量维护，无需重新扫描日志）
+            progress_info = pipeline_progress(log_tail, event_tail)
+            
+            # 显示状态（简洁显示）
+            status_color = "🟢" if progress_info['status'] == "已完成" else "🟡" if progress_info['status'] == "运行中" else "🔴"
+            st.metric(f"{status_color} {progress_info['status']}", f"{progress_info['progress']}%")
+            
+            # 操作按钮
+            if st.button("🔄 刷新状态", key="refresh_status", use_container_width=True):
+                reset_monitor_interval()
+    
+    # 如果有session state的output，也显示（兼容性）
+    elif st.session_state.get('output'):
+        st.markdown("### 📜 实时日志输出")
+        
+        # 显示选项
+        col1, col2, col3 = st.columns([2, 1, 1])
+        
+        st.info(f"📝 当前输出行数: {len(st.session_state.output)}")
+        
+        # 显示日志内容
+        output_text = '\n'.join(st.session_state.output)
+        st.code(output_text, language='bash', line_numbers=False)
+    
+    # 显示错误信息
+    if st.session_state.get('error'):
+        st.error(f"❌ 错误信息:\n{st.session_state.error}")
+
 def main():
     # 标题
     st.markdown('<h1 class="main-header">🧬 NGS Tool Analyzer</h1>', unsafe_allow_html=True)
     st.markdown("---")
+    display_job_queue()
     
     # 项目选择界面
     if 'selected_project' not in st.session_state:
@@ -1703,6 +1393,7 @@ def main():
     # 项目详情界面
     selected_project = st.session_state.selected_project
     project_config = PROJECTS[selected_project]
+    page = get_page(selected_project)
     
     # 返回按钮
     if st.button("⬅️ 返回项目选择"):
@@ -1774,116 +1465,10 @@ def main():
     col1, col2 = st.columns(2)
     file_checks = {}
 
-    # WORF-Seq: 基因到坐标的快捷填充
-    if selected_project == "WORF-Seq":
-        st.markdown("### 🔎 基因定位助手 (NCBI)")
-        with st.expander("输入基因符号，一键获取染色体与起止坐标并自动填充", expanded=False):
-            gene_symbol_key = f"{selected_project}_gene_symbol"
-            organism_key = f"{selected_project}_organism"
-            st.session_state.setdefault(gene_symbol_key, "")
-            st.session_state.setdefault(organism_key, "Homo sapiens")
-
-            gene_symbol = st.text_input(
-                "🧬 基因符号 (官方HGNC/基因符号，如 HLA-C, TP53)",
-                value=st.session_state.get(gene_symbol_key, ""),
-                key=gene_symbol_key,
-                help="请输入官方基因符号（HGNC/RefSeq Gene Symbol），例如 TP53、HLA-C；支持同义词但以官方符号最稳"
-            )
-
-            organism_options = ["Homo sapiens", "Mus musculus", "Rattus norvegicus", "Danio rerio"]
-            default_org = st.session_state.get(organism_key, "Homo sapiens")
-            try:
-                default_org_idx = organism_options.index(default_org)
-            except ValueError:
-                default_org_idx = 0
-
-            organism = st.selectbox(
-                "🌍 物种",
-                options=organism_options,
-                index=default_org_idx,
-                key=organism_key,
-                help="用于NCBI检索的物种过滤"
-            )
-
-            lookup_btn = st.button("🔎 从NCBI获取坐标", key=f"lookup_gene_{selected_project}")
-            if lookup_btn:
-                with st.spinner("正在查询NCBI基因坐标..."):
-                    gene_info, msg = fetch_gene_coordinates(gene_symbol.strip(), organism)
-                if gene_info:
-                    # 写入session state，供下方参数默认值使用
-                    st.session_state[f"{selected_project}_chromosome"] = gene_info["chromosome"]
-                    st.session_state[f"{selected_project}_center_position"] = gene_info["center"]
-                    st.session_state[f"{selected_project}_gene_region"] = gene_info
-                    st.success(
-                        f"已获取 {gene_symbol.upper()} ({organism}) 坐标: {gene_info['chromosome']}:{gene_info['start']:,}-{gene_info['end']:,}"
-                    )
-                    st.info("已自动填充染色体与中心坐标，可在下方继续调整")
-                    st.rerun()
-                else:
-                    st.error(msg)
-
-            st.caption(f"调试日志: logs/gene_lookup.log (自动记录最近查询)")
-
-            # 收藏夹操作区域
-            favs = load_gene_favorites()
-            if favs:
-                fav_options = [
-                    f"{fav['symbol']} ({fav['organism']}) {fav['chromosome']}:{fav['start']}-{fav['end']}"
-                    for fav in favs
-                ]
-                applied_key = f"{selected_project}_fav_applied"
-                st.session_state.setdefault(applied_key, "- 选择收藏 -")
-
-                options = ["- 选择收藏 -"] + fav_options
-                default_idx = options.index(st.session_state.get(applied_key, "- 选择收藏 -")) if st.session_state.get(applied_key, "- 选择收藏 -") in options else 0
-
-                selected_fav = st.selectbox(
-                    "⭐ 基因收藏夹（点击选择直接使用，无需再次查询）",
-                    options=options,
-                    index=default_idx,
-                    key=f"{selected_project}_fav_select",
-                )
-                if selected_fav != "- 选择收藏 -" and st.session_state.get(applied_key) != selected_fav:
-                    idx = fav_options.index(selected_fav)
-                    chosen = favs[idx]
-                    st.session_state[f"{selected_project}_chromosome"] = chosen["chromosome"]
-                    st.session_state[f"{selected_project}_center_position"] = chosen["center"]
-                    st.session_state[f"{selected_project}_gene_region"] = {
-                        "chromosome": chosen["chromosome"],
-                        "start": chosen["start"],
-                        "end": chosen["end"],
-                        "center": chosen["center"],
-                        "map_location": None,
-                        "summary": None,
-                    }
-                    st.session_state[applied_key] = selected_fav
-                    st.success(f"已应用收藏: {chosen['symbol']} ({chosen['organism']})")
-
-            # 查询成功后允许收藏
-            if st.session_state.get(f"{selected_project}_gene_region"):
-                current_region = st.session_state[f"{selected_project}_gene_region"]
-                already_saved = any(
-                    fav.get("symbol", "").upper() == gene_symbol.strip().upper()
-                    and fav.get("organism") == organism
-                    for fav in favs
-                ) if favs else False
-                col_fav_btn, _ = st.columns([1, 3])
-                with col_fav_btn:
-                    if st.button("⭐ 收藏当前基因", key=f"fav_btn_{selected_project}", disabled=already_saved):
-                        added = add_gene_favorite(gene_symbol, organism, current_region)
-                        if added:
-                            st.success("已加入收藏夹")
-                        else:
-                            st.info("已在收藏夹中")
-                        st.rerun()
-
-            gene_region = st.session_state.get(f"{selected_project}_gene_region")
-            if gene_region:
-                st.markdown(
-                    f"**最新查询:** {gene_region['chromosome']}:{gene_region['start']:,}-{gene_region['end']:,} (中心 {gene_region['center']:,})"
-                )
-                if gene_region.get("map_location"):
-                    st.caption(f"图谱位置: {gene_region['map_location']}")
+    # 项目专用的参数辅助区域（如 WORF-Seq 基因定位助手），由页面模块提供
+    param_helpers = getattr(page, "display_param_helpers", None)
+    if param_helpers:
+        param_helpers(selected_project)
     
     for i, (param_key, param_config) in enumerate(project_config["params"].items()):
         col = col1 if i % 2 == 0 else col2
@@ -2131,7 +1716,9 @@ def main():
             # 显示开始信息
             st.session_state.running = True
             st.session_state.start_time = datetime.now()
-            st.session_state.process = None
+            st.session_state.job_id = None
+            st.session_state.job_status = None
+            st.session_state.monitor_interval = MONITOR_INTERVAL
             st.session_state.output = []
             st.session_state.error = ""
             # 设置工作目录，针对不同项目使用不同逻辑
@@ -2146,12 +1733,12 @@ def main():
                     st.session_state.work_dir = "/tmp"
             
             # 启动脚本
-            result = run_script(project_config["script"], params)
+            result = run_script(project_config["script"], params, project=selected_project)
             if isinstance(result, tuple) and len(result) == 2 and result[0] is None:
                 st.session_state.error = result[1]
                 st.session_state.running = False
             else:
-                st.session_state.process = result[0]
+                st.session_state.job_id = result[0]
                 st.session_state.log_file = result[1]
                 
                 # 为Egg Indel设置30秒后下载功能
@@ -2163,206 +1750,19 @@ def main():
     with col2:
         if st.session_state.get('running', False):
             if st.button("⏹️ 停止执行", use_container_width=True):
-                if st.session_state.get('process'):
-                    st.session_state.process.terminate()
-                st.session_state.running = False
+                # 只发出取消请求；running 保持不变，由运行监控片段在守护进程报告任务结束后清除，
+                # 这样终止过程、最终状态与资源用量都会自动刷新显示
+                if st.session_state.get('job_id'):
+                    job_manager.cancel(st.session_state.job_id)
+                else:
+                    st.session_state.running = False
                 st.session_state.output.append("\n⏹️ 用户停止执行")
+                reset_monitor_interval()
                 st.rerun()
     
     # 输出区域
     if st.session_state.get('running', False) or st.session_state.get('output') or st.session_state.get('log_file'):
-        st.markdown("### 📊 执行日志")
-        
-        # 进度信息
-        if st.session_state.get('running', False):
-            elapsed = datetime.now() - st.session_state.get('start_time', datetime.now())
-            st.info(f"⏱️ 运行时间: {elapsed}")
-            
-            # 添加Egg Indel特定的状态信息
-            if selected_project == "Egg_Indel":
-                st.info("🔬 Egg Indel CRISPR编辑效率分析进行中...")
-                
-                # 检查是否已经过了30秒，显示下载选项
-                if st.session_state.get('download_start_time'):
-                    current_time = datetime.now()
-                    time_diff = (current_time - st.session_state['download_start_time']).total_seconds()
-                    
-                    if time_diff >= 30:
-                        st.markdown("### 📥 结果下载")
-                        st.info("✅ 分析已开始超过30秒，可以下载结果文件")
-                        
-                        result_file = st.session_state.get('egg_indel_result_file', "/data/sunyuhong/data/20250720_ShangHaiJiaoTongDaXue-sunyuhong-1_1/00.mergeRawFq/UDI001/20250720_result/sample_summary.csv")
-                        
-                        if os.path.exists(result_file):
-                            # 显示文件信息
-                            file_size = os.path.getsize(result_file) / (1024 * 1024)  # MB
-                            file_time = datetime.fromtimestamp(os.path.getmtime(result_file))
-                            
-                            col1, col2 = st.columns([2, 1])
-                            with col1:
-                                st.info(f"📁 结果文件: `{os.path.basename(result_file)}`")
-                                st.write(f"📏 文件大小: {file_size:.2f} MB")
-                                st.write(f"🕐 修改时间: {file_time.strftime('%Y-%m-%d %H:%M:%S')}")
-                            
-                            with col2:
-                                # 生成下载链接
-                                download_link = get_file_download_link(result_file, "📥 下载结果文件")
-                                st.markdown(download_link, unsafe_allow_html=True)
-                        else:
-                            st.warning(f"⚠️ 结果文件不存在: `{result_file}`")
-                            st.info("💡 请检查文件路径是否正确，或等待文件生成")
-                    else:
-                        remaining_time = 30 - time_diff
-                        st.info(f"⏳ 分析开始后 {int(remaining_time)} 秒可下载结果文件")
-        
-        # 读取日志文件内容
-        log_content = ""
-        if st.session_state.get('log_file') and os.path.exists(st.session_state.get('log_file')):
-            try:
-                with open(st.session_state.get('log_file'), 'r', encoding='utf-8') as f:
-                    log_content = f.read()
-            except Exception as e:
-                st.warning(f"无法读取日志文件: {e}")
-        
-        # 读取进程输出（如果仍在运行）
-        if st.session_state.get('process'):
-            process = st.session_state.process
-            
-            # 检查进程状态
-            try:
-                returncode = process.poll()
-                if returncode is None:  # 进程仍在运行
-                    # 显示进度条和实时状态
-                    progress_info = analyze_progress(log_content)
-                    
-                    # 为Egg Indel添加特定状态信息
-                    if selected_project == "Egg_Indel":
-                        status_text = f"🔬 Egg Indel Analysis - {progress_info['current_step']} ({progress_info['progress']}%)"
-                    else:
-                        status_text = f"{progress_info['current_step']} ({progress_info['progress']}%)"
-                    
-                    st.progress(progress_info['progress'] / 100, text=status_text)
-                    
-                    # 实时显示最近几行日志
-                    if log_content:
-                        lines = log_content.strip().split('\n')
-                        recent_lines = lines[-10:]  # 显示最后10行
-                        st.markdown("### 📋 实时日志输出")
-                        st.code("\n".join(recent_lines), language="bash")
-                        st.caption(f"🔄 实时更新 (最后{len(recent_lines)}行)")
-                    else:
-                        st.info("⏳ 等待日志输出...")
-                    
-                    # 添加自动刷新功能
-                    st.markdown("---")
-                    col1, col2 = st.columns([1, 1])
-                    with col1:
-                        if st.button("🔄 手动刷新日志", key="refresh_logs"):
-                            st.rerun()
-                    with col2:
-                        st.info("💡 日志将自动更新，点击按钮可手动刷新")
-                    
-                    # 设置自动刷新（每5秒）
-                    st.markdown("""
-                    <script>
-                    setTimeout(function() {
-                        window.location.reload();
-                    }, 5000);
-                    </script>
-                    """, unsafe_allow_html=True)
-                    
-                else:  # 进程结束
-                    # 清除进度并显示完成状态
-                    if returncode == 0:
-                        st.success("✅ 执行完成！")
-                        
-                        # 为Egg Indel添加完成信息和下载选项
-                        if selected_project == "Egg_Indel":
-                            st.info("🎉 Egg Indel CRISPR编辑效率分析已完成！")
-                            
-                            # 检查是否已设置下载状态
-                            if not st.session_state.get('download_ready', False):
-                                st.session_state['download_ready_time'] = datetime.now()
-                                st.session_state['download_ready'] = True
-                            
-                            # 设置结果文件路径
-                            st.session_state['egg_indel_result_file'] = "/data/sunyuhong/data/20250720_ShangHaiJiaoTongDaXue-sunyuhong-1_1/00.mergeRawFq/UDI001/20250720_result/sample_summary.csv"
-                    else:
-                        st.error(f"❌ 执行失败，返回码: {returncode}")
-                    
-                    # 读取剩余的错误输出（stderr已被重定向到stdout，所以这里为None）
-                    try:
-                        if process.stderr:
-                            error_output = process.stderr.read()
-                            if error_output:
-                                st.session_state.error = error_output
-                    except AttributeError:
-                        # process.stderr 为 None，这是正常的（因为重定向了stderr）
-                        pass
-                    
-                    st.session_state.running = False
-                    
-                    # 重新读取完整的日志文件
-                    if st.session_state.get('log_file') and os.path.exists(st.session_state.get('log_file')):
-                        try:
-                            with open(st.session_state.get('log_file'), 'r', encoding='utf-8') as f:
-                                log_content = f.read()
-                        except:
-                            pass
-                            
-            except Exception as e:
-                st.error(f"❌ 检查进程状态时出错: {e}")
-                st.session_state.running = False
-        
-        # 显示日志内容
-        if log_content:
-            st.markdown("### 📜 实时日志输出")
-            
-            # 创建两列布局：日志显示 + 进度信息
-            col1, col2 = st.columns([4, 1])
-            
-            with col1:
-                # 日志显示选项
-                show_all_logs = st.checkbox("显示完整日志", value=True, key="show_all_logs")
-                
-                if show_all_logs:
-                    # 显示所有日志，使用代码块格式
-                    st.code(log_content, language='bash', line_numbers=False)
-                else:
-                    # 只显示最后N行
-                    tail_lines = st.slider("显示最后几行", 100, 2000, 500, key="tail_lines")
-                    lines = log_content.split('\n')
-                    recent_lines = lines[-tail_lines:] if len(lines) > tail_lines else lines
-                    st.code('\n'.join(recent_lines), language='bash', line_numbers=True)
-            
-            with col2:
-                # 进度分析
-                progress_info = analyze_progress(log_content)
-                
-                # 显示状态（简洁显示）
-                status_color = "🟢" if progress_info['status'] == "已完成" else "🟡" if progress_info['status'] == "运行中" else "🔴"
-                st.metric(f"{status_color} {progress_info['status']}", f"{progress_info['progress']}%")
-                
-                # 操作按钮
-                if st.button("🔄 刷新状态", key="refresh_status", use_container_width=True):
-                    st.rerun()
-        
-        # 如果有session state的output，也显示（兼容性）
-        elif st.session_state.get('output'):
-            st.markdown("### 📜 实时日志输出")
-            
-            # 显示选项
-            col1, col2, col3 = st.columns([2, 1, 1])
-            
-            st.info(f"📝 当前输出行数: {len(st.session_state.output)}")
-            
-            # 显示日志内容
-            output_text = '\n'.join(st.session_state.output)
-            st.code(output_text, language='bash', line_numbers=False)
-        
-        # 显示错误信息
-        if st.session_state.get('error'):
-            st.error(f"❌ 错误信息:\n{st.session_state.error}")
+        run_monitor(selected_project, params)
         
         # 显示错误
         if st.session_state.get('error'):
@@ -2370,7 +1770,9 @@ def main():
         
         # 如果执行完成，显示结果
         if not st.session_state.get('running', False):
-            if not st.session_state.get('error'):
+            if st.session_state.get('job_status') == 'cancelled':
+                st.warning("⏹️ 执行已取消")
+            elif not st.session_state.get('error'):
                 st.success("✅ 执行完成！")
                 
                 # 保存日志到文件（如果还没有保存的话）
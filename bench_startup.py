@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Streamlit app 启动与重跑耗时基准测试
+
+用 streamlit.testing 的 AppTest 在无浏览器的情况下执行 app.py，对每个场景
+（首页、以及选中每个项目后的页面）分别测量:
+    cold      新解释器中首次执行脚本的耗时（含 app 及其依赖模块的导入）
+    process   子进程从启动到首次执行结束的总耗时（含 Python 与 streamlit 自身的导入）
+    rerun     同一会话中再次执行脚本的耗时中位数（用户每次交互都会触发）
+    modules   首次执行后已加载的重型模块（pandas / requests / numpy）
+
+脚本耗时在脚本线程内计时（app.py 由一个包装脚本通过 runpy 执行），不包含 AppTest 轮询脚本结束的等待。
+每次冷启动都在新的子进程中进行，结果取中位数。任务队列使用临时数据库，不影响 logs/jobs.db。
+
+使用示例:
+  python bench_startup.py
+  python bench_startup.py --runs 5 --reruns 20 --json startup.json
+  python bench_startup.py --project Nanobody
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(BASE_DIR, "app.py")
+SCENARIOS = ["home", "Egg_Indel", "Nanobody", "WORF-Seq"]
+HEAVY_MODULES = ["pandas", "requests", "numpy"]
+# 包装脚本记录的每次执行耗时（秒）
+SCRIPT_TIMES = []
+
+WRAPPER = """
+import runpy
+import time
+import bench_startup
+_start = time.perf_counter()
+try:
+    runpy.run_path({app!r}, run_name="__main__")
+finally:
+    bench_startup.SCRIPT_TIMES.append(time.perf_counter() - _start)
+"""
+
+
+def run_child(scenario, reruns):
+    """子进程：执行一次冷启动与若干次重跑，以 JSON 输出耗时"""
+    process_start = float(os.environ["BENCH_PROCESS_START"])
+    # 包装脚本中的 import bench_startup 需要得到本模块（而不是重新导入一份）
+    sys.modules.setdefault("bench_startup", sys.modules[__name__])
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.NamedTemporaryFile("w", suffix=".py", dir=BASE_DIR, prefix=".bench_", delete=False) as f:
+        f.write(WRAPPER.format(app=APP_PATH))
+    try:
+        at = AppTest.from_file(f.name, default_timeout=120)
+        if scenario != "home":
+            at.session_state.selected_project = scenario
+        at.run()
+        process = time.time() - process_start
+        if at.exception:
+            print(json.dumps({"error": str(at.exception[0].value)}))
+            return
+        modules = [m for m in HEAVY_MODULES if m in sys.modules]
+        for _ in range(reruns):
+            at.run()
+    finally:
+        os.unlink(f.name)
+    cold, times = SCRIPT_TIMES[0], SCRIPT_TIMES[1:]
+    print(json.dumps({"cold": cold, "process": process, "rerun": statistics.median(times) if times else None,
+                      "modules": modules}))
+
+
+def bench_scenario(scenario, runs, reruns, db_dir):
+    """在 runs 个新子进程中测量一个场景，返回各项中位数"""
+    results = []
+    for _ in range(runs):
+        env = dict(os.environ, NGS_JOB_DB=os.path.join(db_dir, "jobs.db"), BENCH_PROCESS_START=str(time.time()))
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", scenario, "--reruns", str(reruns)],
+                             cwd=BASE_DIR, env=env, capture_output=True, text=True)
+        lines = [line for line in out.stdout.splitlines() if line.startswith("{")]
+        if out.returncode != 0 or not lines:
+            raise RuntimeError(f"{scenario} 子进程失败:\n{out.stderr[-2000:]}")
+        result = json.loads(lines[-1])
+        if "error" in result:
+            raise RuntimeError(f"{scenario} 执行出错: {result['error']}")
+        results.append(result)
+    return {
+        "scenario": scenario,
+        "cold_ms": round(statistics.median(r["cold"] for r in results) * 1000, 1),
+        "process_ms": round(statistics.median(r["process"] for r in results) * 1000, 1),
+        "rerun_ms": round(statistics.median(r["rerun"] for r in results) * 1000, 1) if reruns else None,
+        "modules": results[-1]["modules"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold-start and per-rerun script time of the Streamlit app")
+    parser.add_argument("--project", choices=SCENARIOS, action="append",
+                        help="Scenario to benchmark (repeatable, default: all)")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts per scenario, each in a new process (default: 3)")
+    parser.add_argument("--reruns", type=int, default=10, help="Reruns per cold start (default: 10)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.reruns)
+        return
+
+    rows = []
+    with tempfile.TemporaryDirectory() as db_dir:
+        for scenario in args.project or SCENARIOS:
+            row = bench_scenario(scenario, args.runs, args.reruns, db_dir)
+            rows.append(row)
+            print(f"{row['scenario']:<10}  冷启动 {row['cold_ms']:>8.1f} ms  进程总计 {row['process_ms']:>8.1f} ms  "
+                  f"重跑 {row['rerun_ms'] if row['rerun_ms'] is not None else '-':>8} ms  "
+                  f"已加载: {', '.join(row['modules']) or '-'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        print(f"[INFO] 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
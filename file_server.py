@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+结果文件下载服务（Streamlit 旁路进程）
+
+app.py 不再把文件 base64 内嵌进页面，而是生成指向本服务的短时签名链接。
+本服务按块流式发送文件（socket.sendfile 零拷贝），支持 HTTP Range 断点续传，
+不在内存中缓冲整个文件，大BAM下载也不会占用 Streamlit 进程的内存与线程。
+
+令牌格式: base64url(JSON{"p": 绝对路径, "s": 大小, "m": 修改时间ns, "e": 过期时间}) + "." + HMAC-SHA256
+签名密钥来自环境变量 NGS_DOWNLOAD_SECRET，未设置时使用 logs/.download_secret（首次自动生成，权限0600），
+因此 app 与本服务无需额外配置即可共享密钥。文件在签发后被修改或替换时令牌自动失效。
+
+用法:
+    python file_server.py --port 8601
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import socket
+import subprocess
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SECRET_FILE = os.path.join(BASE_DIR, "logs", ".download_secret")
+DEFAULT_HOST = os.environ.get("NGS_DOWNLOAD_HOST", "0.0.0.0")
+DEFAULT_PORT = int(os.environ.get("NGS_DOWNLOAD_PORT", "8601"))
+# 链接在每次页面刷新时重新签发，有效期只需覆盖用户点击下载前的停留时间
+TOKEN_TTL = 1800
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def get_secret():
+    """返回HMAC签名密钥（bytes）"""
+    env_secret = os.environ.get("NGS_DOWNLOAD_SECRET")
+    if env_secret:
+        return env_secret.encode()
+    try:
+        with open(SECRET_FILE, "rb") as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(SECRET_FILE), exist_ok=True)
+    secret = secrets.token_hex(32).encode()
+    # O_EXCL 保证并发首次启动时只有一个进程写入，其余进程读取已写入的密钥
+    try:
+        fd = os.open(SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        time.sleep(0.1)
+        with open(SECRET_FILE, "rb") as f:
+            return f.read().strip()
+    with os.fdopen(fd, "wb") as f:
+        f.write(secret)
+    return secret
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def make_token(file_path, ttl=TOKEN_TTL, secret=None):
+    """为文件签发下载令牌，绑定文件的路径、大小与修改时间"""
+    real_path = os.path.realpath(file_path)
+    st = os.stat(real_path)
+    payload = json.dumps({"p": real_path, "s": st.st_size, "m": st.st_mtime_ns,
+                          "e": int(time.time() + ttl)}, separators=(",", ":")).encode()
+    sig = hmac.new(secret or get_secret(), payload, hashlib.sha256).digest()
+    return f"{_b64encode(payload)}.{_b64encode(sig)}"
+
+
+def verify_token(token, secret=None):
+    """校验令牌，返回文件绝对路径；签名错误、过期或文件已变化时抛出 ValueError"""
+    try:
+        payload_b64, sig_b64 = token.split(".", 1)
+        payload = _b64decode(payload_b64)
+        sig = _b64decode(sig_b64)
+    except (ValueError, TypeError) as e:
+        raise ValueError("令牌格式错误") from e
+    expected = hmac.new(secret or get_secret(), payload, hashlib.sha256).digest()
+    if not hmac.compare_digest(sig, expected):
+        raise ValueError("令牌签名无效")
+    info = json.loads(payload)
+    if time.time() > info["e"]:
+        raise ValueError("令牌已过期")
+    try:
+        st = os.stat(info["p"])
+    except OSError as e:
+        raise ValueError("文件不存在") from e
+    if (st.st_size, st.st_mtime_ns) != (info["s"], info["m"]):
+        raise ValueError("文件已被修改，请刷新页面重新获取下载链接")
+    return info["p"]
+
+
+def parse_range(header, size):
+    """解析单段 Range 头，返回 (start, end)（end 为闭区间）；无 Range 返回 None，无法满足时抛出 ValueError"""
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        # 多段或格式不支持时按完整文件返回（RFC 7233 允许忽略 Range）
+        return None
+    first, last = match.groups()
+    if first == "":
+        # bytes=-N：最后N个字节
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("unsatisfiable range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+class DownloadHandler(BaseHTTPRequestHandler):
+    """GET/HEAD /download?token=...，支持 Range"""
+
+    server_version = "NGSFileServer/1.0"
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._send_text(200, "ok")
+            return
+        if url.path != "/download":
+            self._send_text(404, "not found")
+            return
+        token = parse_qs(url.query).get("token", [""])[0]
+        try:
+            file_path = verify_token(token, self.server.secret)
+        except ValueError as e:
+            self._send_text(403, str(e))
+            return
+
+        try:
+            f = open(file_path, "rb")
+        except OSError as e:
+            self._send_text(404, str(e))
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            try:
+                byte_range = parse_range(self.headers.get("Range"), size)
+            except ValueError:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            start, end = byte_range if byte_range else (0, size - 1)
+            length = max(0, end - start + 1)
+
+            self.send_response(206 if byte_range else 200)
+            filename = os.path.basename(file_path)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(filename)}")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(length))
+            if byte_range:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.end_headers()
+            if not send_body or length == 0:
+                return
+            self.wfile.flush()
+            try:
+                # socket.sendfile 在支持时使用 os.sendfile 零拷贝，否则退化为按块 send
+                self.connection.sendfile(f, offset=start, count=length)
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端取消下载
+                pass
+
+    def _send_text(self, status, text):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[INFO] {self.address_string()} {format % args}\n")
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """前台运行下载服务"""
+    server = ThreadingHTTPServer((host, port), DownloadHandler)
+    server.daemon_threads = True
+    server.secret = get_secret()
+    print(f"[INFO] 下载服务已启动: http://{host}:{port}/download")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def is_running(port=DEFAULT_PORT, host="127.0.0.1", timeout=0.3):
+    """检查本机端口上是否已有下载服务"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(b"GET /health HTTP/1.0\r\n\r\n")
+            return sock.recv(64).startswith(b"HTTP/1.0 200")
+    except OSError:
+        return False
+
+
+def ensure_server(port=DEFAULT_PORT, host=DEFAULT_HOST, wait=3.0):
+    """下载服务未运行时以独立进程启动（脱离 Streamlit 进程组），返回是否可用"""
+    if is_running(port):
+        return True
+    log_path = os.path.join(BASE_DIR, "logs", "file_server.log")
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    with open(log_path, "a") as log_f:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--host", host, "--port", str(port)],
+                         stdout=log_f, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                         start_new_session=True, close_fds=True)
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        if is_running(port):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming download sidecar for NGS Tool Analyzer results")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Bind address (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Listen port (default: {DEFAULT_PORT})")
+    parser.add_argument("--sign", metavar="FILE", help="Print a signed download URL for FILE and exit")
+    parser.add_argument("--ttl", type=int, default=TOKEN_TTL, help=f"Token lifetime in seconds for --sign (default: {TOKEN_TTL})")
+    args = parser.parse_args()
+    if args.sign:
+        print(f"http://localhost:{args.port}/download?token={make_token(args.sign, args.ttl)}")
+        return
+    serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+"""
+Pipeline 任务管理（SQLite 队列 + 独立守护进程）
+
+app 不再在会话中直接持有 Popen 句柄：提交任务只是向 logs/jobs.db 插入一行，
+由独立的守护进程按提交顺序（FIFO）启动，并限制同时运行的 pipeline 数量，
+避免多个用户同时提交时 minimap2 等程序把机器压满。
+任务状态保存在数据库中，浏览器刷新、多个用户或 Streamlit 重启都不会丢失任务，
+app 只需轮询状态并读取日志。
+
+每个任务在独立的进程组中运行，可选限制 CPU 核数与内存（cgroup v2 或 rlimit，见 process_control.py），
+取消时终止整个进程树；任务结束后记录峰值内存 (peak_rss_kb) 与 CPU 时间 (cpu_seconds)。
+运行期间每隔 NGS_SAMPLE_INTERVAL 秒通过 /proc 对进程树采样（见 resource_monitor.py），
+CPU、内存、读写速度与当前命令保存在 job_samples 表中，供运行监控绘制时间序列。
+
+任务状态:
+    queued      排队中
+    running     运行中
+    cancelling  已请求取消，等待守护进程终止
+    done        正常结束（返回码0）
+    failed      返回码非0
+    cancelled   已取消
+    lost        守护进程重启期间结束，返回码未知
+
+用法:
+    python job_manager.py daemon --max-jobs 2
+    python job_manager.py submit --log run.log -- bash pipeline.bash -a ...
+    python job_manager.py status [JOB_ID]
+    python job_manager.py cancel JOB_ID
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+
+import process_control
+import resource_monitor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.environ.get("NGS_JOB_DB", os.path.join(BASE_DIR, "logs", "jobs.db"))
+# 同时运行的 pipeline 数量上限
+MAX_JOBS = int(os.environ.get("NGS_MAX_JOBS", "2"))
+# 每个任务默认的资源限制（0 表示不限制），可被提交时的参数覆盖
+JOB_CPUS = float(os.environ.get("NGS_JOB_CPUS", "0"))
+JOB_MEM_MB = int(os.environ.get("NGS_JOB_MEM_MB", "0"))
+POLL_INTERVAL = 1.0
+# 取消时先发 SIGTERM，超过该时间仍未退出则 SIGKILL
+KILL_GRACE = 10.0
+# 超过该时间没有心跳即认为守护进程已退出
+HEARTBEAT_TIMEOUT = 10.0
+# 进程树资源采样间隔（秒），0 表示不采样
+SAMPLE_INTERVAL = float(os.environ.get("NGS_SAMPLE_INTERVAL", "5"))
+# 每个任务保留的采样点上限，超过后把较早的一半隔点删除（长任务的早期数据分辨率降低）
+MAX_SAMPLES = 720
+
+ACTIVE_STATES = ("queued", "running", "cancelling")
+FINISHED_STATES = ("done", "failed", "cancelled", "lost")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project TEXT,
+    name TEXT,
+    cmd TEXT NOT NULL,
+    cwd TEXT,
+    env TEXT,
+    log_file TEXT,
+    status TEXT NOT NULL,
+    pid INTEGER,
+    returncode INTEGER,
+    submitted REAL,
+    started REAL,
+    finished REAL,
+    message TEXT,
+    cpu_limit REAL,
+    mem_limit_mb INTEGER,
+    peak_rss_kb INTEGER,
+    cpu_seconds REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS job_samples (
+    job_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    cpu_percent REAL,
+    rss_kb INTEGER,
+    read_bytes INTEGER,
+    write_bytes INTEGER,
+    read_rate REAL,
+    write_rate REAL,
+    n_procs INTEGER,
+    command TEXT,
+    cmd_cpu REAL,
+    cmd_threads INTEGER
+);
+CREATE INDEX IF NOT EXISTS job_samples_job ON job_samples (job_id, ts);
+CREATE TABLE IF NOT EXISTS daemon (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    pid INTEGER,
+    max_jobs INTEGER,
+    heartbeat REAL
+);
+"""
+
+
+def connect(db_path=None):
+    """打开任务数据库（WAL 模式，app 读取时不阻塞守护进程写入）"""
+    db_path = db_path or DB_PATH
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    _migrate(conn)
+    return conn
+
+
+def _migrate(conn):
+    """为旧版数据库补充资源限制/用量列"""
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+    for name, kind in (("cpu_limit", "REAL"), ("mem_limit_mb", "INTEGER"),
+                       ("peak_rss_kb", "INTEGER"), ("cpu_seconds", "REAL")):
+        if name not in columns:
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+            except sqlite3.OperationalError:
+                # 并发连接已经添加
+                pass
+
+
+def _job_dict(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["cmd"] = json.loads(job["cmd"])
+    job["env"] = json.loads(job["env"]) if job["env"] else {}
+    return job
+
+
+def submit(cmd, log_file, project=None, name=None, cwd=None, env=None, cpus=None, mem_mb=None, db_path=None):
+    """提交任务，返回任务ID
+
+    env 为在当前环境基础上追加的变量；cpus/mem_mb 为该任务的资源限制，省略时使用守护进程的默认值。
+    """
+    conn = connect(db_path)
+    try:
+        cur = conn.execute(
+            "INSERT INTO jobs (project, name, cmd, cwd, env, log_file, status, submitted, cpu_limit, mem_limit_mb) "
+            "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+            (project, name, json.dumps(list(cmd)), cwd, json.dumps(env or {}), log_file, time.time(), cpus, mem_mb))
+        return cur.lastrowid
+    finally:
+        conn.close()
+
+
+def get_job(job_id, db_path=None):
+    """返回任务信息字典，不存在时返回 None"""
+    conn = connect(db_path)
+    try:
+        return _job_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+    finally:
+        conn.close()
+
+
+def list_jobs(limit=20, active_only=False, db_path=None):
+    """按提交时间倒序列出最近的任务"""
+    conn = connect(db_path)
+    try:
+        if active_only:
+            rows = conn.execute(f"SELECT * FROM jobs WHERE status IN ({','.join('?' * len(ACTIVE_STATES))}) "
+                                "ORDER BY id DESC LIMIT ?", (*ACTIVE_STATES, limit)).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [_job_dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def queue_position(job_id, db_path=None):
+    """排队任务前面还有几个排队任务（0表示下一个启动），不在排队中时返回 None"""
+    conn = connect(db_path)
+    try:
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row["status"] != "queued":
+            return None
+        return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND id < ?", (job_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def get_samples(job_id, since=None, db_path=None):
+    """任务的资源采样时间序列（按时间排序），since 为只返回该时间之后的采样"""
+    conn = connect(db_path)
+    try:
+        rows = conn.execute("SELECT * FROM job_samples WHERE job_id = ? AND ts > ? ORDER BY ts",
+                            (job_id, since or 0)).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def cancel(job_id, db_path=None):
+    """取消任务：排队中的直接标记为已取消，运行中的交由守护进程终止；返回是否接受了取消请求"""
+    conn = connect(db_path)
+    try:
+        cur = conn.execute("UPDATE jobs SET status = 'cancelled', finished = ?, message = '用户取消（未启动）' "
+                           "WHERE id = ? AND status = 'queued'", (time.time(), job_id))
+        if cur.rowcount:
+            return True
+        cur = conn.execute("UPDATE jobs SET status = 'cancelling' WHERE id = ? AND status = 'running'", (job_id,))
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def daemon_status(db_path=None):
+    """守护进程心跳信息，从未启动时返回 None"""
+    conn = connect(db_path)
+    try:
+        row = conn.execute("SELECT * FROM daemon WHERE id = 1").fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def is_running(db_path=None):
+    """守护进程是否在运行（心跳未超时且进程存在）"""
+    info = daemon_status(db_path)
+    return bool(info and time.time() - info["heartbeat"] < HEARTBEAT_TIMEOUT and _pid_alive(info["pid"]))
+
+
+def ensure_daemon(max_jobs=None, db_path=None, wait=3.0):
+    """守护进程未运行时以独立会话启动（不随 Streamlit 退出），返回是否可用"""
+    if is_running(db_path):
+        return True
+    db_path = db_path or DB_PATH
+    log_path = os.path.join(os.path.dirname(db_path), "job_manager.log")
+    cmd = [sys.executable, "-u", os.path.abspath(__file__), "--db", db_path, "daemon"]
+    if max_jobs:
+        cmd += ["--max-jobs", str(max_jobs)]
+    with open(log_path, "a") as log_f:
+        subprocess.Popen(cmd, stdout=log_f, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                         start_new_session=True, close_fds=True)
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        if is_running(db_path):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+class JobDaemon:
+    """按 FIFO 顺序启动排队任务，保持运行中的任务不超过 max_jobs"""
+
+    def __init__(self, max_jobs=MAX_JOBS, db_path=None, cpus=JOB_CPUS, mem_mb=JOB_MEM_MB):
+        self.max_jobs = max(1, max_jobs)
+        self.db_path = db_path or DB_PATH
+        self.default_cpus = cpus
+        self.default_mem_mb = mem_mb
+        self.conn = connect(self.db_path)
+        # 任务ID -> {"proc", "cgroup", "cpu_set"}
+        self.procs = {}
+        # 上一个守护进程启动、仍在运行的任务（只能按 pid 跟踪，无法获得返回码）
+        self.adopted = {}
+        # 已发送 SIGTERM 的任务ID -> 发送时间
+        self.terminating = {}
+        # 任务ID -> (TreeSampler, 上次采样时间)
+        self.samplers = {}
+        self.cgroup_root = None
+        self.stopping = False
+
+    def _lock(self):
+        """同一数据库只允许一个守护进程"""
+        self.lock_file = open(self.db_path + ".lock", "w")
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("[ERROR] 已有任务管理守护进程在运行")
+            sys.exit(1)
+
+    def _heartbeat(self):
+        self.conn.execute("INSERT OR REPLACE INTO daemon (id, pid, max_jobs, heartbeat) VALUES (1, ?, ?, ?)",
+                          (os.getpid(), self.max_jobs, time.time()))
+
+    def _finish(self, job_id, status, returncode=None, message=None, usage=None):
+        usage = usage or process_control.JobUsage(None, None)
+        self.conn.execute("UPDATE jobs SET status = ?, returncode = ?, finished = ?, message = COALESCE(?, message), "
+                          "peak_rss_kb = ?, cpu_seconds = ? WHERE id = ?",
+                          (status, returncode, time.time(), message, usage.peak_rss_kb, usage.cpu_seconds, job_id))
+        detail = f" (返回码 {returncode})" if returncode is not None else ""
+        if usage.peak_rss_kb is not None:
+            detail += f" 峰值内存 {usage.peak_rss_kb / 1024:.1f} MB, CPU {usage.cpu_seconds:.1f} 秒"
+        print(f"[INFO] 任务 {job_id} 结束: {status}{detail}")
+
+    def _recover(self):
+        """接管上一个守护进程留下的运行中任务"""
+        for row in self.conn.execute("SELECT id, pid FROM jobs WHERE status IN ('running', 'cancelling')").fetchall():
+            if row["pid"] and _pid_alive(row["pid"]):
+                self.adopted[row["id"]] = row["pid"]
+                print(f"[INFO] 接管运行中的任务 {row['id']} (pid {row['pid']})")
+            else:
+                self._finish(row["id"], "lost", message="守护进程重启期间任务已结束，返回码未知")
+
+    def _start(self, job):
+        env = dict(os.environ, **job["env"])
+        cpus = job["cpu_limit"] if job["cpu_limit"] is not None else self.default_cpus
+        mem_mb = job["mem_limit_mb"] if job["mem_limit_mb"] is not None else self.default_mem_mb
+        cgroup = cpu_set = None
+        if (cpus or mem_mb) and self.cgroup_root:
+            cgroup = process_control.create_job_cgroup(self.cgroup_root, job["id"], cpus, mem_mb)
+        if cpus and cgroup is None:
+            busy = set().union(*(p["cpu_set"] for p in self.procs.values() if p["cpu_set"]))
+            cpu_set = process_control.pick_cpus(cpus, busy)
+        try:
+            if job["log_file"]:
+                os.makedirs(os.path.dirname(os.path.abspath(job["log_file"])), exist_ok=True)
+            with open(job["log_file"] or os.devnull, "w") as log_f:
+                # 独立会话：进程组号即主进程 pid，取消时可向整个进程树发信号
+                proc = subprocess.Popen(job["cmd"], cwd=job["cwd"] or None, env=env, stdout=log_f,
+                                        stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, close_fds=True,
+                                        start_new_session=True,
+                                        preexec_fn=process_control.make_preexec(cgroup, cpu_set, mem_mb))
+        except (OSError, subprocess.SubprocessError) as e:
+            process_control.remove_cgroup(cgroup)
+            self._finish(job["id"], "failed", message=f"启动失败: {e}")
+            return
+        self.procs[job["id"]] = {"proc": proc, "cgroup": cgroup, "cpu_set": cpu_set}
+        self.conn.execute("UPDATE jobs SET status = 'running', pid = ?, started = ?, cpu_limit = ?, mem_limit_mb = ? "
+                          "WHERE id = ?", (proc.pid, time.time(), cpus or None, mem_mb or None, job["id"]))
+        limits = []
+        if cpus:
+            limits.append(f"CPU {cpus:g} 核" + (f" (绑定 {sorted(cpu_set)})" if cpu_set else ""))
+        if mem_mb:
+            limits.append(f"内存 {mem_mb} MB" + ("" if cgroup else " (每进程虚拟内存)"))
+        print(f"[INFO] 启动任务 {job['id']} (pid {proc.pid}{', ' + ', '.join(limits) if limits else ''}): "
+              f"{' '.join(job['cmd'])}")
+
+    def _sample(self, job_id, session):
+        """按 SAMPLE_INTERVAL 对任务进程树采样并写入 job_samples"""
+        if SAMPLE_INTERVAL <= 0:
+            return
+        sampler, last = self.samplers.get(job_id, (None, 0.0))
+        now = time.time()
+        if now - last < SAMPLE_INTERVAL:
+            return
+        if sampler is None:
+            sampler = resource_monitor.TreeSampler(session)
+        self.samplers[job_id] = (sampler, now)
+        sample = sampler.sample()
+        if sample is None:
+            return
+        columns = list(sample)
+        self.conn.execute(f"INSERT INTO job_samples (job_id, {', '.join(columns)}) "
+                          f"VALUES (?, {', '.join('?' * len(columns))})", (job_id, *sample.values()))
+        n = self.conn.execute("SELECT COUNT(*) FROM job_samples WHERE job_id = ?", (job_id,)).fetchone()[0]
+        if n > MAX_SAMPLES:
+            # 按本任务自身的时间顺序抽稀：最早的 n//2 个样本中每隔一个删除一个
+            # （不能用全局 rowid 奇偶，多个任务交替写入时 rowid 与任务内位置无关）
+            oldest = [row[0] for row in self.conn.execute(
+                "SELECT rowid FROM job_samples WHERE job_id = ? ORDER BY ts, rowid LIMIT ?", (job_id, n // 2))]
+            self.conn.executemany("DELETE FROM job_samples WHERE rowid = ?", [(rowid,) for rowid in oldest[1::2]])
+
+    def _terminate(self, job_id):
+        """取消任务：先向进程树发 SIGTERM，超过 KILL_GRACE 仍未退出则 SIGKILL"""
+        running = self.procs.get(job_id)
+        pgid = running["proc"].pid if running else self.adopted.get(job_id)
+        if pgid is None:
+            return
+        cgroup = running["cgroup"] if running else None
+        if job_id not in self.terminating:
+            self.terminating[job_id] = time.time()
+            process_control.kill_tree(pgid, signal.SIGTERM, cgroup)
+        elif time.time() - self.terminating[job_id] > KILL_GRACE:
+            process_control.kill_tree(pgid, signal.SIGKILL, cgroup)
+
+    def step(self):
+        """一次调度：处理取消请求、回收结束的任务、按顺序启动排队任务"""
+        self._heartbeat()
+        cancelling = {row["id"] for row in self.conn.execute("SELECT id FROM jobs WHERE status = 'cancelling'")}
+        for job_id in cancelling:
+            self._terminate(job_id)
+
+        for job_id, running in list(self.procs.items()):
+            proc = running["proc"]
+            result = process_control.reap(proc.pid)
+            if result is None:
+                self._sample(job_id, proc.pid)
+                continue
+            returncode, usage = result
+            # 已由 wait4 回收，避免 Popen 再次 wait
+            proc.returncode = returncode
+            del self.procs[job_id]
+            self.samplers.pop(job_id, None)
+            self.terminating.pop(job_id, None)
+            # 主进程结束后清理进程组中残留的子进程
+            process_control.kill_tree(proc.pid, signal.SIGKILL, running["cgroup"])
+            if running["cgroup"]:
+                cg_usage = process_control.cgroup_usage(running["cgroup"])
+                usage = process_control.JobUsage(cg_usage.peak_rss_kb or usage.peak_rss_kb,
+                                                 cg_usage.cpu_seconds or usage.cpu_seconds)
+                process_control.remove_cgroup(running["cgroup"])
+            if job_id in cancelling:
+                self._finish(job_id, "cancelled", returncode, "用户取消", usage)
+            else:
+                self._finish(job_id, "done" if returncode == 0 else "failed", returncode, usage=usage)
+        for job_id, pid in list(self.adopted.items()):
+            if _pid_alive(pid):
+                self._sample(job_id, pid)
+            else:
+                del self.adopted[job_id]
+                self.terminating.pop(job_id, None)
+                self.samplers.pop(job_id, None)
+                if job_id in cancelling:
+                    self._finish(job_id, "cancelled", message="用户取消")
+                else:
+                    self._finish(job_id, "lost", message="守护进程重启期间任务已结束，返回码未知")
+
+        free = self.max_jobs - len(self.procs) - len(self.adopted)
+        if free > 0 and not self.stopping:
+            rows = self.conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT ?", (free,)).fetchall()
+            for row in rows:
+                self._start(_job_dict(row))
+
+    def run(self):
+        self._lock()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        self._recover()
+        self.cgroup_root, detail = process_control.setup_cgroup_root()
+        print(f"[INFO] 资源限制方式: {detail if self.cgroup_root else 'rlimit/CPU亲和性 (' + detail + ')'}")
+        print(f"[INFO] 任务管理守护进程已启动 (pid {os.getpid()}, 最多同时运行 {self.max_jobs} 个任务): {self.db_path}")
+        while not self.stopping:
+            try:
+                self.step()
+            except sqlite3.Error as e:
+                print(f"[WARN] 数据库访问失败，稍后重试: {e}")
+            time.sleep(POLL_INTERVAL)
+        # 运行中的任务不随守护进程退出，下次启动时接管
+        print(f"[INFO] 守护进程退出，{len(self.procs) + len(self.adopted)} 个运行中的任务将在下次启动时接管")
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+
+def _format_time(ts):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) if ts else "-"
+
+
+def format_usage(job):
+    """任务资源用量的简短描述，未记录时返回空字符串"""
+    parts = []
+    if job.get("peak_rss_kb") is not None:
+        parts.append(f"峰值内存 {job['peak_rss_kb'] / 1024:,.1f} MB")
+    if job.get("cpu_seconds") is not None:
+        parts.append(f"CPU {job['cpu_seconds']:,.1f} 秒")
+    return " · ".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FIFO job queue and worker daemon for NGS Tool Analyzer pipelines")
+    parser.add_argument("--db", default=DB_PATH, help=f"Job database path (default: {DB_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_daemon = sub.add_parser("daemon", help="Run the worker daemon in the foreground")
+    p_daemon.add_argument("--max-jobs", type=int, default=MAX_JOBS,
+                          help=f"Maximum number of concurrently running pipelines (default: {MAX_JOBS})")
+    p_daemon.add_argument("--cpus", type=float, default=JOB_CPUS,
+                          help=f"Default CPU cores per job, 0 = unlimited (default: {JOB_CPUS:g})")
+    p_daemon.add_argument("--mem-mb", type=int, default=JOB_MEM_MB,
+                          help=f"Default memory limit per job in MB, 0 = unlimited (default: {JOB_MEM_MB})")
+    p_submit = sub.add_parser("submit", help="Queue a command")
+    p_submit.add_argument("--log", required=True, help="Log file receiving stdout/stderr")
+    p_submit.add_argument("--name", help="Job name")
+    p_submit.add_argument("--project", help="Project key")
+    p_submit.add_argument("--cpus", type=float, help="CPU cores for this job (default: daemon setting)")
+    p_submit.add_argument("--mem-mb", type=int, help="Memory limit for this job in MB (default: daemon setting)")
+    p_submit.add_argument("cmd", nargs=argparse.REMAINDER, help="Command to run (after --)")
+    p_status = sub.add_parser("status", help="Show one job or the most recent jobs")
+    p_status.add_argument("job_id", nargs="?", type=int)
+    p_cancel = sub.add_parser("cancel", help="Cancel a queued or running job")
+    p_cancel.add_argument("job_id", type=int)
+    args = parser.parse_args()
+
+    if args.command == "daemon":
+        JobDaemon(args.max_jobs, args.db, args.cpus, args.mem_mb).run()
+    elif args.command == "submit":
+        cmd = args.cmd[1:] if args.cmd[:1] == ["--"] else args.cmd
+        if not cmd:
+            parser.error("submit requires a command")
+        job_id = submit(cmd, os.path.abspath(args.log), args.project, args.name,
+                        cpus=args.cpus, mem_mb=args.mem_mb, db_path=args.db)
+        print(f"[INFO] 已提交任务 {job_id}")
+        if not ensure_daemon(db_path=args.db):
+            print("[WARN] 任务管理守护进程未能启动，任务将保持排队")
+    elif args.command == "status":
+        jobs = [get_job(args.job_id, args.db)] if args.job_id else list_jobs(db_path=args.db)
+        if args.job_id and jobs[0] is None:
+            print(f"[ERROR] 任务不存在: {args.job_id}")
+            sys.exit(1)
+        print("[INFO] 守护进程: " + ("运行中" if is_running(args.db) else "未运行"))
+        for job in jobs:
+            rc = "" if job["returncode"] is None else f" rc={job['returncode']}"
+            print(f"{job['id']}\t{job['status']}{rc}\t{job['project'] or '-'}\t{job['name'] or '-'}\t"
+                  f"{_format_time(job['submitted'])}\t{job['log_file']}\t{format_usage(job)}")
+    elif args.command == "cancel":
+        if cancel(args.job_id, args.db):
+            print(f"[INFO] 已请求取消任务 {args.job_id}")
+        else:
+            print(f"[WARN] 任务 {args.job_id} 不存在或已结束")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Pipeline 日志增量读取
+
+运行监控每次刷新只读取日志新增的字节：LogTail 记住上次读到的字节偏移，
+把新行放入有界环形缓冲区（最近N行），并逐行更新进度标记，
+不必在每次刷新时重新读取并拆分整个日志（minimap2/fastp 日志可达数十MB）。
+
+日志被截断或替换（inode 变化、文件变小）时自动从头重新读取。
+
+EventTail 以同样的方式增量读取 pipeline 写出的 JSON-lines 事件文件（见 pipeline_events.py），
+得到精确的阶段、已处理记录数与速度；没有事件文件的旧任务仍按日志标记估算进度。
+"""
+
+import json
+import os
+from collections import deque
+
+DEFAULT_MAX_LINES = 2000
+# 单次 poll 最多读取的字节数，避免首次打开超大日志时阻塞页面；剩余部分在后续刷新中继续读取
+MAX_READ_BYTES = 64 * 1024 * 1024
+
+# analyze_progress 判断所需的日志标记（区分大小写）
+PROGRESS_MARKERS = (
+    "WORF-Seq Analysis Pipeline Started",
+    "WORF-Seq Analysis Pipeline Completed Successfully",
+    "步骤1: 开始质控处理",
+    "步骤2: 序列比对",
+    "步骤3: SAM转BAM",
+    "步骤4: 染色体比对图生成",
+    "开始纳米抗体分析流程",
+    "分析完成",
+    "nanobody分析完成摘要",
+    "步骤1:",
+    "步骤2:",
+    "步骤3:",
+    "步骤4:",
+    "Starting Egg Indel Analysis",
+    "Running egg_indel_analysis.py",
+    "Egg Indel Analysis Completed",
+    "[ERROR]",
+    "错误:",
+    "ERROR",
+)
+# 不区分大小写的标记（按小写匹配）
+PROGRESS_MARKERS_LOWER = (
+    "merging reads",
+    "splitting reads by barcode",
+    "processing barcode",
+    "aligning reads",
+    "calculating indel efficiency",
+)
+
+
+def find_markers(text):
+    """返回 text 中出现的进度标记集合"""
+    found = {m for m in PROGRESS_MARKERS if m in text}
+    lower = text.lower()
+    found.update(m for m in PROGRESS_MARKERS_LOWER if m in lower)
+    return found
+
+
+def progress_from_markers(found, has_content=True):
+    """由已出现的标记集合计算进度，规则与按整个日志判断时一致"""
+    if not has_content:
+        return {"status": "未开始", "progress": 0, "current_step": "等待开始"}
+
+    # 检查是否完成
+    if "WORF-Seq Analysis Pipeline Completed Successfully" in found:
+        return {"status": "已完成", "progress": 100, "current_step": "分析完成"}
+    if "分析完成" in found or "nanobody分析完成摘要" in found:
+        return {"status": "已完成", "progress": 100, "current_step": "分析完成"}
+
+    # 检查当前步骤 - 支持多个项目的步骤
+    current_step = "准备中"
+    progress_value = 0
+
+    # 首先检查是否是 WORF-Seq 项目
+    if "WORF-Seq Analysis Pipeline Started" in found:
+        if "步骤4: 染色体比对图生成" in found:
+            current_step, progress_value = "染色体比对图生成", 85
+        elif "步骤3: SAM转BAM" in found:
+            current_step, progress_value = "SAM转BAM处理", 65
+        elif "步骤2: 序列比对" in found:
+            current_step, progress_value = "序列比对中", 45
+        elif "步骤1: 开始质控处理" in found:
+            current_step, progress_value = "质控处理", 25
+        else:
+            current_step, progress_value = "开始分析", 10
+    # 检查是否是 Nanobody 项目
+    elif "开始纳米抗体分析流程" in found:
+        if "步骤4:" in found:
+            current_step, progress_value = "解析序列并生成结果", 80
+        elif "步骤3:" in found:
+            current_step, progress_value = "Trim序列处理", 60
+        elif "步骤2:" in found:
+            current_step, progress_value = "格式转换", 40
+        elif "步骤1:" in found:
+            current_step, progress_value = "FLASH拼接序列", 20
+        else:
+            current_step, progress_value = "开始分析", 10
+    # Egg Indel 步骤
+    elif "Egg Indel Analysis Completed" in found:
+        current_step, progress_value = "分析完成", 100
+    elif "calculating indel efficiency" in found:
+        current_step, progress_value = "计算编辑效率", 90
+    elif "aligning reads" in found:
+        current_step, progress_value = "序列比对", 75
+    elif "Running egg_indel_analysis.py" in found:
+        current_step, progress_value = "Indel分析处理", 60
+    elif "processing barcode" in found:
+        current_step, progress_value = "处理Barcode数据", 45
+    elif "splitting reads by barcode" in found:
+        current_step, progress_value = "按Barcode分组", 30
+    elif "merging reads" in found:
+        current_step, progress_value = "合并双端序列", 15
+    elif "Starting Egg Indel Analysis" in found:
+        current_step, progress_value = "开始分析", 10
+
+    # 检查是否有错误
+    if "[ERROR]" in found or "错误:" in found or "ERROR" in found:
+        current_step += " (检测到错误)"
+
+    return {
+        "status": "运行中" if progress_value < 100 else "已完成",
+        "progress": progress_value,
+        "current_step": current_step
+    }
+
+
+class _FileTail:
+    """按字节偏移增量读取文件新增的完整行，子类在 _consume 中处理新行"""
+
+    def __init__(self, path):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.inode = None
+        self.partial = b""
+
+    def _consume(self, new_lines):
+        raise NotImplementedError
+
+    def poll(self):
+        """读取上次偏移之后新增的内容，返回新增的完整行数"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return 0
+        if self.inode is not None and (st.st_ino != self.inode or st.st_size < self.offset):
+            # 日志被替换或截断（例如重新运行同名任务），从头读取
+            self.reset()
+        self.inode = st.st_ino
+        if st.st_size == self.offset:
+            return 0
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(min(st.st_size - self.offset, MAX_READ_BYTES))
+        self.offset += len(data)
+        data = self.partial + data
+        # 最后一段可能是尚未写完的行，留到下次拼接
+        complete, _, self.partial = data.rpartition(b"\n")
+        if not complete and not data.endswith(b"\n"):
+            return 0
+        new_lines = complete.decode("utf-8", errors="replace").split("\n")
+        self._consume(new_lines)
+        return len(new_lines)
+
+
+class LogTail(_FileTail):
+    """增量读取单个日志文件，保留最近 max_lines 行与累积的进度标记"""
+
+    def __init__(self, path, max_lines=DEFAULT_MAX_LINES):
+        self.max_lines = max_lines
+        super().__init__(path)
+
+    def reset(self):
+        super().reset()
+        self.lines = deque(maxlen=self.max_lines)
+        self.total_lines = 0
+        self.markers = set()
+
+    @property
+    def truncated(self):
+        """环形缓冲区是否已丢弃了较早的行"""
+        return self.total_lines > len(self.lines)
+
+    def _consume(self, new_lines):
+        self.markers.update(find_markers("\n".join(new_lines)))
+        self.lines.extend(new_lines)
+        self.total_lines += len(new_lines)
+
+    def recent(self, n=None):
+        """返回最近 n 行（含尚未换行的最后一行）"""
+        lines = list(self.lines)
+        if self.partial:
+            lines.append(self.partial.decode("utf-8", errors="replace"))
+        return lines if n is None else lines[-n:]
+
+    def text(self):
+        return "\n".join(self.recent())
+
+    def has_content(self):
+        return bool(self.total_lines or self.partial)
+
+    def progress(self):
+        """当前进度信息，与 analyze_progress(完整日志) 的结果一致"""
+        found = self.markers | find_markers(self.partial.decode("utf-8", errors="replace")) if self.partial else self.markers
+        return progress_from_markers(found, self.has_content())
+
+
+# 从事件复制到阶段状态的字段
+_STAGE_FIELDS = ("label", "index", "step", "records", "total", "bytes", "total_bytes", "rate", "elapsed",
+                 "extracted", "unique")
+
+
+def _stage_fraction(stage):
+    """运行中阶段的完成比例：优先按已读字节，其次按已完成条目数（如样品、目标区间）"""
+    if stage.get("bytes") is not None and stage.get("total_bytes"):
+        return min(1.0, stage["bytes"] / stage["total_bytes"])
+    if stage.get("records") is not None and stage.get("total"):
+        return min(1.0, stage["records"] / stage["total"])
+    return 0.0
+
+
+class EventTail(_FileTail):
+    """增量解析 pipeline 事件文件，维护各阶段状态
+
+    bash 脚本与其调用的 Python 脚本可能对同一阶段各写一次 stage_start/stage_end，
+    同名阶段的事件按到达顺序合并到一条记录中。
+    """
+
+    def reset(self):
+        super().reset()
+        self.pipeline = None
+        self.total = None
+        self.stages = {}
+        self.finished = None
+        self.exit_code = None
+        self.n_events = 0
+
+    def _consume(self, new_lines):
+        for line in new_lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # 写入中途被截断的行或非事件内容
+                continue
+            if isinstance(event, dict):
+                self._apply(event)
+
+    def _apply(self, event):
+        kind = event.get("event")
+        self.n_events += 1
+        if event.get("pipeline"):
+            self.pipeline = event["pipeline"]
+        if kind == "pipeline_start":
+            self.total = event.get("total")
+            self.finished = None
+        elif kind == "pipeline_end":
+            self.finished = event.get("status", "ok")
+            self.exit_code = event.get("exit_code")
+        elif kind in ("stage_start", "stage_end", "progress") and event.get("stage"):
+            stage = self.stages.setdefault(event["stage"], {"stage": event["stage"], "status": "running",
+                                                            "start": event.get("ts")})
+            stage.update((k, event[k]) for k in _STAGE_FIELDS if k in event)
+            if kind == "stage_start" and stage.get("end") is not None:
+                # 同名阶段重新开始（例如事件文件未清理时重新运行）
+                stage.update(status="running", start=event.get("ts"), end=None)
+            elif kind == "stage_end":
+                stage["status"] = event.get("status", "ok")
+                stage["end"] = event.get("ts")
+
+    def has_content(self):
+        return self.n_events > 0
+
+    def current_stage(self):
+        """最近开始且尚未结束的阶段"""
+        return next((s for s in reversed(list(self.stages.values())) if s["status"] == "running"), None)
+
+    def progress(self):
+        """与 progress_from_markers 相同格式的进度信息，另含各阶段明细 stages 与当前速度 rate"""
+        stages = list(self.stages.values())
+        current = self.current_stage()
+        info = {"stages": stages, "rate": current.get("rate") if current else None}
+        if not self.n_events:
+            info.update(status="未开始", progress=0, current_step="等待开始")
+            return info
+        if self.finished == "ok":
+            info.update(status="已完成", progress=100, current_step="分析完成")
+            return info
+
+        done = sum(1 for s in stages if s["status"] != "running")
+        total = max(self.total or 0, len(stages), 1)
+        fraction = _stage_fraction(current) if current else 0.0
+        info["progress"] = min(99, int(100 * (done + fraction) / total))
+        latest = current or (stages[-1] if stages else None)
+        step = (latest.get("label") or latest["stage"]) if latest else "开始分析"
+        if self.finished:
+            code = f"，退出码 {self.exit_code}" if self.exit_code is not None else ""
+            info.update(status="失败", current_step=f"{step} (检测到错误{code})")
+        else:
+            info.update(status="运行中", current_step=step)
+        return info
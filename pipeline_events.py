@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Pipeline 结构化进度事件
+
+各 pipeline（bash 脚本与其 Python 辅助脚本）向 NGS_EVENT_FILE 指向的
+JSON-lines 文件追加事件，app 只需增量解析新增事件即可得到精确的阶段进度与速度，
+不必在日志中搜索步骤标题。未设置 NGS_EVENT_FILE 时所有调用都是空操作。
+
+每行一个事件，公共字段:
+    ts        Unix 时间戳（秒，浮点）
+    pipeline  pipeline 名称（NGS_EVENT_PIPELINE，由 bash 脚本导出）
+    event     pipeline_start / pipeline_end / stage_start / stage_end / progress
+可选字段:
+    stage, index, total, label, status, records, bytes, total_bytes, rate (records/s), elapsed
+
+bash 脚本通过同目录的 pipeline_events.sh 写出相同格式的事件。
+"""
+
+import json
+import os
+import time
+
+EVENT_FILE_ENV = "NGS_EVENT_FILE"
+EVENT_PIPELINE_ENV = "NGS_EVENT_PIPELINE"
+# progress 事件的最小间隔（秒）
+PROGRESS_INTERVAL = 1.0
+
+
+class EventWriter:
+    """向事件文件追加 JSON 行；每行单次 write，行长远小于 PIPE_BUF，多进程追加不会交错"""
+
+    def __init__(self, path=None, pipeline=None):
+        self.path = path if path is not None else os.environ.get(EVENT_FILE_ENV)
+        self.pipeline = pipeline or os.environ.get(EVENT_PIPELINE_ENV)
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def emit(self, event, **fields):
+        if not self.path:
+            return
+        record = {"ts": round(time.time(), 3), "pipeline": self.pipeline, "event": event}
+        record.update((k, v) for k, v in fields.items() if v is not None)
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+        except OSError:
+            # 事件只用于展示进度，写入失败不影响分析本身
+            pass
+
+    def stage(self, stage, label=None, total_bytes=None, **fields):
+        """开始一个阶段，返回用于上报进度的 StageProgress"""
+        return StageProgress(self, stage, label, total_bytes, **fields)
+
+
+class StageProgress:
+    """单个阶段的进度上报：progress() 按时间节流，end() 写出汇总与平均速度"""
+
+    def __init__(self, writer, stage, label=None, total_bytes=None, **fields):
+        self.writer = writer
+        self.stage = stage
+        self.total_bytes = total_bytes
+        self.start = time.time()
+        self._last = 0.0
+        self.records = 0
+        self.bytes = None
+        writer.emit("stage_start", stage=stage, label=label, total_bytes=total_bytes, **fields)
+
+    def _rate(self, now):
+        elapsed = now - self.start
+        return round(self.records / elapsed, 1) if elapsed > 0 else None
+
+    def progress(self, records, bytes_read=None, force=False):
+        self.records = records
+        self.bytes = bytes_read
+        if not self.writer.enabled:
+            return
+        now = time.time()
+        if not force and now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        self.writer.emit("progress", stage=self.stage, records=records, bytes=bytes_read,
+                         total_bytes=self.total_bytes, rate=self._rate(now))
+
+    def end(self, status="ok", **fields):
+        now = time.time()
+        fields.setdefault("records", self.records)
+        self.writer.emit("stage_end", stage=self.stage, status=status, bytes=self.bytes,
+                         total_bytes=self.total_bytes, rate=self._rate(now),
+                         elapsed=round(now - self.start, 3), **fields)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end("ok" if exc_type is None else "error")
+        return False
+
+
+def file_size(path):
+    """输入文件大小（用于按已读字节估算阶段进度），无法获取时返回 None"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
@@ -0,0 +1,67 @@
+#!/bin/bash
+# Pipeline 结构化进度事件（bash 端），格式与 pipeline_events.py 一致
+# 用法: source pipeline_events.sh 后调用
+#   event_pipeline_start <pipeline名> <阶段总数>
+#   event_stage_start <阶段> <序号> <说明>
+#   event_stage_end <阶段> [ok|skip|error] [key=value ...]
+# pipeline_end 事件在脚本退出时由 EXIT trap 自动写出（退出码非0记为 error）
+# 未设置 NGS_EVENT_FILE 时所有函数为空操作
+
+# 数值原样输出，其余按 JSON 字符串转义
+_event_value() {
+    local value="$1"
+    if [[ "$value" =~ ^-?[0-9]+(\.[0-9]+)?$ ]]; then
+        printf '%s' "$value"
+    else
+        value=${value//\\/\\\\}
+        value=${value//\"/\\\"}
+        value=${value//$'\t'/\\t}
+        value=${value//$'\n'/\\n}
+        printf '"%s"' "$value"
+    fi
+}
+
+# event_emit <event> [key=value ...]
+event_emit() {
+    [[ -z "$NGS_EVENT_FILE" ]] && return 0
+    local event="$1"
+    shift
+    local json
+    json="{\"ts\":$(date +%s.%3N),\"pipeline\":$(_event_value "${NGS_EVENT_PIPELINE:-}"),\"event\":$(_event_value "$event")"
+    local pair
+    for pair in "$@"; do
+        json+=",$(_event_value "${pair%%=*}"):$(_event_value "${pair#*=}")"
+    done
+    printf '%s}\n' "$json" >> "$NGS_EVENT_FILE" 2>/dev/null || true
+}
+
+event_pipeline_start() {
+    export NGS_EVENT_PIPELINE="$1"
+    event_emit pipeline_start "total=$2"
+    trap '_event_on_exit' EXIT
+}
+
+_event_on_exit() {
+    local rc=$?
+    if [[ $rc -eq 0 ]]; then
+        event_emit pipeline_end "status=ok"
+    else
+        event_emit pipeline_end "status=error" "exit_code=$rc"
+    fi
+}
+
+event_stage_start() {
+    event_emit stage_start "stage=$1" "index=$2" "label=$3"
+}
+
+event_stage_end() {
+    local stage="$1"
+    local status="${2:-ok}"
+    shift 2 2>/dev/null || shift $#
+    event_emit stage_end "stage=$stage" "status=$status" "$@"
+}
+
+# 文件大小（字节），文件不存在时为0
+event_file_bytes() {
+    stat -L -c%s "$1" 2>/dev/null || echo 0
+}
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Pipeline 进程树管理与资源限制
+
+每个任务在独立的会话/进程组中启动（进程组号 = 主进程 pid），取消时向整个进程组发信号，
+flash、minimap2 -t 8、samtools sort -@ 8、CRISPResso 等子进程会和 bash 包装脚本一起终止。
+
+资源限制按可用性选择:
+    cgroup v2   每个任务一个子 cgroup：cpu.max 限制核数，memory.max 限制整个进程树的内存，
+                cgroup.kill 可一次终止树中所有进程（包括自行 setsid 脱离进程组的进程）。
+                需要可写的 cgroup v2 目录：环境变量 NGS_CGROUP_ROOT，或守护进程自身所在的
+                委托 cgroup（守护进程先移入其中的 daemon 叶子节点，再为任务创建兄弟节点）。
+    回退        sched_setaffinity 把任务绑定到指定数量的 CPU；RLIMIT_AS 限制每个进程的虚拟内存。
+
+任务结束时由 wait4 取得整棵（已被回收的）进程树的峰值 RSS 与 CPU 时间；
+使用 cgroup 时优先读取 memory.peak 与 cpu.stat，统计同样覆盖未被 wait 的进程。
+"""
+
+import math
+import os
+import resource
+import signal
+from collections import namedtuple
+
+CGROUP_MOUNT = "/sys/fs/cgroup"
+CGROUP_ROOT_ENV = "NGS_CGROUP_ROOT"
+# cpu.max 的调度周期（微秒）
+CPU_PERIOD_US = 100000
+
+JobUsage = namedtuple("JobUsage", ["peak_rss_kb", "cpu_seconds"])
+
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def _own_cgroup():
+    """当前进程所在的 cgroup v2 目录，非 cgroup v2 时返回 None"""
+    if not os.path.exists(os.path.join(CGROUP_MOUNT, "cgroup.controllers")):
+        return None
+    try:
+        with open("/proc/self/cgroup") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    return os.path.join(CGROUP_MOUNT, line.strip()[3:].lstrip("/"))
+    except OSError:
+        pass
+    return None
+
+
+def setup_cgroup_root():
+    """准备用于创建任务 cgroup 的父目录，返回 (路径, 说明)；不可用时路径为 None
+
+    只应由守护进程调用一次：未设置 NGS_CGROUP_ROOT 时会把守护进程自身移入 daemon 叶子节点，
+    以满足 cgroup v2 “有进程的节点不能向子节点分配控制器”的规则。
+    """
+    root = os.environ.get(CGROUP_ROOT_ENV)
+    if not root:
+        root = _own_cgroup()
+        if root is None:
+            return None, "系统未使用 cgroup v2"
+        if not os.access(root, os.W_OK):
+            return None, f"cgroup 不可写: {root}"
+        try:
+            leaf = os.path.join(root, "daemon")
+            os.makedirs(leaf, exist_ok=True)
+            _write(os.path.join(leaf, "cgroup.procs"), str(os.getpid()))
+        except OSError as e:
+            return None, f"无法移入 daemon 子节点: {e}"
+    elif not os.access(root, os.W_OK):
+        return None, f"cgroup 不可写: {root}"
+
+    try:
+        with open(os.path.join(root, "cgroup.controllers")) as f:
+            available = f.read().split()
+    except OSError as e:
+        return None, f"无法读取 cgroup 控制器: {e}"
+    enabled = []
+    for controller in ("cpu", "memory"):
+        if controller not in available:
+            continue
+        try:
+            _write(os.path.join(root, "cgroup.subtree_control"), f"+{controller}")
+            enabled.append(controller)
+        except OSError:
+            pass
+    if not enabled:
+        return None, "cgroup 未委托 cpu/memory 控制器"
+    return root, f"cgroup v2 ({', '.join(enabled)}): {root}"
+
+
+def create_job_cgroup(root, job_id, cpus=None, mem_mb=None):
+    """为任务创建子 cgroup 并写入限制，返回目录；失败时返回 None（调用方回退到 rlimit）"""
+    path = os.path.join(root, f"job_{job_id}")
+    try:
+        os.makedirs(path, exist_ok=True)
+        if cpus:
+            _write(os.path.join(path, "cpu.max"), f"{int(cpus * CPU_PERIOD_US)} {CPU_PERIOD_US}")
+        if mem_mb:
+            _write(os.path.join(path, "memory.max"), str(int(mem_mb) * 1024 * 1024))
+    except OSError as e:
+        print(f"[WARN] 创建任务 cgroup 失败，改用 rlimit: {e}")
+        remove_cgroup(path)
+        return None
+    return path
+
+
+def remove_cgroup(path):
+    """删除已无进程的任务 cgroup"""
+    if path:
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+
+def pick_cpus(n_cpus, busy=()):
+    """从可用 CPU 中选出 n_cpus 个，优先选择未被其他任务占用的"""
+    available = sorted(os.sched_getaffinity(0))
+    n = min(len(available), max(1, math.ceil(n_cpus)))
+    free = [c for c in available if c not in busy]
+    chosen = free[:n]
+    if len(chosen) < n:
+        chosen += [c for c in available if c not in chosen][:n - len(chosen)]
+    return set(chosen)
+
+
+def make_preexec(cgroup=None, cpu_set=None, mem_mb=None):
+    """返回 Popen 的 preexec_fn：在子进程 exec 之前加入 cgroup 或设置 CPU 亲和性/内存 rlimit
+
+    Popen(start_new_session=True) 已在此之前调用 setsid，子进程成为新进程组的组长。
+    """
+    def preexec():
+        if cgroup:
+            _write(os.path.join(cgroup, "cgroup.procs"), str(os.getpid()))
+            return
+        if cpu_set:
+            os.sched_setaffinity(0, cpu_set)
+        if mem_mb:
+            limit = int(mem_mb) * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    return preexec
+
+
+def kill_tree(pgid, sig=signal.SIGTERM, cgroup=None):
+    """向任务的整个进程组（以及 cgroup 中的全部进程）发送信号"""
+    if cgroup and sig == signal.SIGKILL and os.path.exists(os.path.join(cgroup, "cgroup.kill")):
+        try:
+            _write(os.path.join(cgroup, "cgroup.kill"), "1")
+            return
+        except OSError:
+            pass
+    try:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+    if cgroup:
+        try:
+            with open(os.path.join(cgroup, "cgroup.procs")) as f:
+                pids = [int(line) for line in f if line.strip()]
+        except OSError:
+            pids = []
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+
+def reap(pid):
+    """非阻塞回收任务主进程，返回 (返回码, JobUsage)；仍在运行时返回 None
+
+    返回码与 Popen.returncode 一致（被信号终止时为负的信号值）。
+    """
+    try:
+        wpid, status, usage = os.wait4(pid, os.WNOHANG)
+    except ChildProcessError:
+        # 已被其他地方回收，返回码未知
+        return None, JobUsage(None, None)
+    if wpid == 0:
+        return None
+    # Linux 的 ru_maxrss 单位为 KB
+    return os.waitstatus_to_exitcode(status), JobUsage(usage.ru_maxrss, round(usage.ru_utime + usage.ru_stime, 2))
+
+
+def cgroup_usage(cgroup):
+    """读取 cgroup 的峰值内存与累计 CPU 时间，不可用的项为 None"""
+    peak_kb = cpu_seconds = None
+    try:
+        with open(os.path.join(cgroup, "memory.peak")) as f:
+            peak_kb = int(f.read()) // 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(cgroup, "cpu.stat")) as f:
+            for line in f:
+                key, _, value = line.partition(" ")
+                if key == "usage_usec":
+                    cpu_seconds = round(int(value) / 1e6, 2)
+    except (OSError, ValueError):
+        pass
+    return JobUsage(peak_kb, cpu_seconds)
@@ -0,0 +1,12 @@
+"""
+各分析项目的页面模块
+
+app.py 只保留项目元数据（PROJECTS）与公共界面；每个项目的结果展示和专用参数辅助区域
+放在本包的独立模块中，仅在用户选中该项目时由 app.get_page 导入。
+pandas、requests 等较重的依赖在页面模块的函数内部按需导入，首页和未用到的项目不会加载它们。
+
+页面模块约定:
+    display_results(params, work_dir)        必需，显示分析结果
+    display_param_helpers(selected_project)  可选，显示在参数表单之前
+    display_live_results(params, work_dir)   可选，任务运行中在运行监控内显示阶段性结果（随监控定时刷新）
+"""
@@ -0,0 +1,66 @@
+"""
+app 与各项目页面模块共用的路径与下载链接工具
+"""
+
+import base64
+import os
+
+import streamlit as st
+
+import file_server
+
+# 项目根目录与日志目录
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_DIR = os.path.join(BASE_DIR, "logs")
+# 下载服务不可用时，base64 内嵌回退允许的最大文件
+MAX_INLINE_DOWNLOAD_MB = 20
+
+
+def rel_path(*parts):
+    """基于项目根目录拼接路径"""
+    return os.path.join(BASE_DIR, *parts)
+
+
+@st.cache_resource(show_spinner=False)
+def start_file_server():
+    """启动（或复用已运行的）流式下载服务，返回是否可用"""
+    try:
+        return file_server.ensure_server(file_server.DEFAULT_PORT)
+    except OSError:
+        return False
+
+
+def download_base_url():
+    """下载服务地址：优先 NGS_DOWNLOAD_BASE_URL，否则使用浏览器访问本页面时的主机名"""
+    base_url = os.environ.get("NGS_DOWNLOAD_BASE_URL")
+    if base_url:
+        return base_url.rstrip("/")
+    host = "localhost"
+    try:
+        host = st.context.headers.get("Host", host).rsplit(":", 1)[0] or host
+    except Exception:
+        pass
+    return f"http://{host}:{file_server.DEFAULT_PORT}"
+
+
+def get_file_download_link(file_path, link_text):
+    """生成文件下载链接
+
+    优先指向流式下载服务（短时签名令牌，支持断点续传，不占用 Streamlit 内存）；
+    服务不可用时仅对小文件回退为 base64 内嵌链接。
+    """
+    try:
+        filename = os.path.basename(file_path)
+        if start_file_server():
+            token = file_server.make_token(file_path)
+            return f'<a href="{download_base_url()}/download?token={token}" download="{filename}" class="download-btn">{link_text}</a>'
+        size_mb = os.path.getsize(file_path) / (1024 * 1024)
+        if size_mb > MAX_INLINE_DOWNLOAD_MB:
+            return f'<span class="file-missing">下载服务未启动，文件过大 ({size_mb:.0f} MB) 无法内嵌下载: {file_path}</span>'
+        with open(file_path, "rb") as f:
+            contents = f.read()
+        b64 = base64.b64encode(contents).decode()
+        href = f'<a href="data:application/octet-stream;base64,{b64}" download="{filename}" class="download-btn">{link_text}</a>'
+        return href
+    except Exception as e:
+        return f'<span class="file-missing">无法读取文件: {str(e)}</span>'
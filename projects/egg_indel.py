@@ -0,0 +1,57 @@
+"""
+Egg Indel Analysis 页面：结果展示
+"""
+
+import os
+
+import streamlit as st
+
+from projects.common import get_file_download_link
+
+
+def display_results(params, work_dir):
+    """列出结果文件夹中的 CSV 文件供选择下载"""
+    if not params.get('name'):
+        return
+    # 添加CSV文件选择下载功能
+    st.markdown("### 📥 CSV结果文件下载")
+    
+    # 定义结果文件夹路径
+    result_dir = "/data/sunyuhong/data/20250720_ShangHaiJiaoTongDaXue-sunyuhong-1_1/00.mergeRawFq/UDI001/20250720_result"
+    
+    # 查找所有CSV文件
+    csv_files = []
+    if os.path.exists(result_dir):
+        for file in os.listdir(result_dir):
+            if file.endswith('.csv'):
+                csv_files.append(file)
+    
+    if csv_files:
+        # 文件选择器
+        st.markdown("#### 🔍 选择要下载的CSV文件")
+        selected_csv = st.selectbox(
+            "选择CSV文件:",
+            csv_files,
+            key="egg_indel_csv_selector"
+        )
+        
+        if selected_csv:
+            result_file = os.path.join(result_dir, selected_csv)
+            
+            if os.path.exists(result_file):
+                # 显示文件信息（简化版，不显示大小和时间）
+                col1, col2 = st.columns([2, 1])
+                with col1:
+                    st.info(f"📁 选中文件: `{selected_csv}`")
+                
+                with col2:
+                    # 生成下载链接
+                    download_link = get_file_download_link(result_file, "📥 下载选中文件")
+                    st.markdown(download_link, unsafe_allow_html=True)
+            else:
+                st.warning(f"⚠️ 文件不存在: `{result_file}`")
+    else:
+        st.warning("⚠️ 未找到任何CSV文件")
+        st.info("💡 请检查结果文件夹路径是否正确，或等待文件生成")
+    
+    st.markdown("---")
@@ -0,0 +1,178 @@
+"""
+Nanobody Analysis 页面：结果展示
+"""
+
+import json
+import os
+from datetime import datetime
+
+import streamlit as st
+
+from projects.common import MAX_INLINE_DOWNLOAD_MB, get_file_download_link
+
+PAGE_SIZES = [50, 100, 500, 1000]
+# 近似 Top 克隆表显示的行数
+APPROX_PREVIEW_ROWS = 200
+
+
+def display_approx_results(params, work_dir):
+    """显示 parse.py --approx-top 写出的近似 Top 克隆快照，没有快照时返回 False
+
+    Count 为条数上界、Count_min 为下界；Guaranteed 的序列一定属于真实的 Top-K。
+    """
+    csv_path = os.path.join(work_dir, f"{params['name']}_result_approx.csv")
+    json_path = os.path.join(work_dir, f"{params['name']}_result_approx.json")
+    if not (os.path.exists(csv_path) and os.path.exists(json_path)):
+        return False
+    import pandas as pd
+
+    try:
+        with open(json_path) as f:
+            meta = json.load(f)
+        df = pd.read_csv(csv_path, nrows=APPROX_PREVIEW_ROWS)
+    except (OSError, ValueError) as e:
+        st.caption(f"近似结果暂不可读: {e}")
+        return False
+
+    st.markdown(f"### ⚡ 近似 Top-{meta['k']} 克隆")
+    if meta.get('done'):
+        st.caption(f"近似统计已完成：共 {meta['total_sequences']:,} 条序列，"
+                   f"{meta['guaranteed']:,} 条确定属于真实 Top-{meta['k']}")
+    else:
+        fraction = meta['bytes_read'] / meta['input_bytes'] if meta.get('input_bytes') else 0
+        st.progress(min(1.0, fraction), text=f"近似统计中：已处理 {meta['total_sequences']:,} 条序列")
+    bounds = f"SpaceSaving 条数误差不超过 {meta['max_error']:,}"
+    if 'cms_error' in meta:
+        bounds += f"；Count-Min 以 {meta['cms_confidence']:.0%} 的概率高估不超过 {meta['cms_error']:,.0f}"
+    st.caption(f"Count 为上界，Count_min 为下界（{bounds}）。精确结果生成后以精确结果为准。")
+    st.dataframe(df, use_container_width=True, hide_index=True, height=400)
+    return True
+
+
+def display_live_results(params, work_dir):
+    """任务运行中显示近似 Top 克隆；精确结果已生成时不显示"""
+    if not params.get('name'):
+        return
+    if os.path.exists(os.path.join(work_dir, f"{params['name']}_result.csv")):
+        return
+    display_approx_results(params, work_dir)
+
+
+def display_results(params, work_dir):
+    """显示 {name}_result.csv 的统计、分页预览与下载
+
+    结果表通过 projects.result_table 按页读取并缓存列统计，不在每次重跑时完整加载；
+    parse.py 写出的同名列式表（.feather / .npz）存在时优先使用。下载直接提供原始 CSV，不重新序列化。
+    """
+    if not params.get('name'):
+        return
+    from projects.result_table import open_result_table
+
+    result_file = os.path.join(work_dir, f"{params['name']}_result.csv")
+    
+    st.markdown("## 📊 Nanobody 分析结果")
+    st.markdown("---")
+    
+    if os.path.exists(result_file):
+        try:
+            table = open_result_table(result_file)
+            file_size_mb = os.path.getsize(result_file) / (1024 * 1024)
+            
+            # 显示文件状态
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("📏 总行数", f"{table.n_rows:,}")
+            with col2:
+                st.metric("📋 总列数", len(table.columns))
+            with col3:
+                st.metric("💾 文件大小", f"{file_size_mb * 1024:.1f} KB" if file_size_mb < 1 else f"{file_size_mb:.1f} MB")
+            with col4:
+                file_time = datetime.fromtimestamp(os.path.getmtime(result_file))
+                st.metric("🕐 修改时间", file_time.strftime('%m-%d %H:%M'))
+            if table.format_name != "CSV":
+                st.caption(f"预览读取自列式表 `{os.path.basename(table.path)}`（{table.format_name}）")
+            
+            st.markdown("---")
+            
+            # 主要下载区域：均为原始文件，不重新生成CSV
+            st.markdown("### 💾 结果文件下载")
+            col1, col2 = st.columns([1, 1])
+            
+            with col1:
+                # 流式下载服务（支持断点续传，大文件不占用 Streamlit 内存）
+                download_link = get_file_download_link(result_file, "📥 下载完整CSV文件")
+                st.markdown(download_link, unsafe_allow_html=True)
+            
+            with col2:
+                # 小文件同时提供 Streamlit 原生下载
+                if file_size_mb <= MAX_INLINE_DOWNLOAD_MB:
+                    with open(result_file, "rb") as f:
+                        st.download_button(
+                            label="📁 浏览器直接下载",
+                            data=f.read(),
+                            file_name=f"{params['name']}_result.csv",
+                            mime="text/csv",
+                            use_container_width=True
+                        )
+                else:
+                    st.caption(f"文件较大（{file_size_mb:.0f} MB），请使用左侧链接下载")
+            
+            st.markdown("---")
+            
+            # 数据预览控制
+            st.markdown("### 📋 数据预览设置")
+            col1, col2, col3 = st.columns([1, 1, 2])
+            
+            with col1:
+                page_size = st.selectbox("每页行数", PAGE_SIZES, index=1, key=f"page_size_{params['name']}")
+            n_pages = max(1, -(-table.n_rows // page_size))
+            with col2:
+                page_no = st.number_input(f"页码（共 {n_pages:,} 页）", min_value=1, max_value=n_pages, value=1,
+                                          key=f"page_no_{params['name']}")
+            
+            with col3:
+                show_all_columns = st.checkbox("显示所有列", value=True, key=f"show_all_cols_{params['name']}")
+                selected_columns = None
+                if not show_all_columns:
+                    selected_columns = st.multiselect(
+                        "选择显示的列",
+                        options=table.columns,
+                        default=table.columns[:5],
+                        key=f"select_cols_{params['name']}"
+                    ) or None
+            
+            st.markdown("---")
+            
+            # 只读取当前页（结果按条数降序排列，第1页即 Top 克隆）
+            start = (int(page_no) - 1) * page_size
+            page_df = table.page(start, page_size, selected_columns)
+            page_df.index = range(start + 1, start + 1 + len(page_df))
+            st.markdown(f"### 📊 数据预览 (第 {start + 1:,} - {start + len(page_df):,} 行)")
+            st.dataframe(
+                page_df,
+                use_container_width=True,
+                height=500
+            )
+            
+            # 显示列详细信息（整表统计只计算一次并缓存）
+            with st.expander("📈 列详细信息"):
+                # 大表的首次统计需要扫描整个文件，按需触发
+                if (table.has_stats or table.n_rows <= 100000 or table.format_name != "CSV"
+                        or st.button("计算列统计", key=f"col_stats_{params['name']}")):
+                    st.dataframe(table.column_stats(), use_container_width=True)
+                else:
+                    st.caption(f"共 {table.n_rows:,} 行，统计需要扫描整个文件")
+            
+        except Exception as e:
+            st.error(f"❌ 读取CSV文件失败: {e}")
+            st.markdown("### 📁 直接文件访问")
+            st.info(f"文件路径: `{result_file}`")
+            
+            # 提供直接下载
+            if os.path.exists(result_file):
+                download_link = get_file_download_link(result_file, f"📥 下载 {os.path.basename(result_file)}")
+                st.markdown(download_link, unsafe_allow_html=True)
+    else:
+        st.warning(f"⚠️ 结果文件不存在: `{result_file}`")
+        st.info("💡 请等待分析完成或检查工作目录是否正确")
+        display_approx_results(params, work_dir)
@@ -0,0 +1,279 @@
+"""
+大结果表（CSV/TSV）的分页读取
+
+深度测序文库的 Nanobody {name}_result.csv 可达数百万行，每次页面重跑都完整读取、
+重新序列化并逐列统计会占满内存和时间。ResultTable 对每个文件只做一次准备:
+    行偏移索引  按块读取原始字节，用 numpy 查找换行符，每 INDEX_STRIDE 行记录一次字节偏移；
+               翻页时 seek 到最近的索引点，只解析该页附近的行
+    列统计      首次需要时用 pandas 分块读取（CHUNK_ROWS 行一块），累加非空/空值计数，
+               唯一值按 64 位哈希去重计数，之后直接复用
+对象按 (路径, 修改时间, 大小) 缓存，文件重新生成后自动失效。
+假定字段内不含换行（parse.py 的输出满足）。parse.py 的结果按条数降序排列，因此前 N 行即 Top-N 克隆。
+
+parse.py 同时写出的列式表（同名 .feather / .npz）不需要建索引，open_result_table 优先使用:
+    ArrowResultTable  Arrow IPC 文件内存映射，翻页只切片并转换所选列
+    NpzResultTable    未压缩 npz 中的各数组直接内存映射，序列由拼接字节与偏移数组按页解码
+列式表比 CSV 旧（例如 CSV 被单独重新生成）时不使用。
+"""
+
+import os
+import threading
+import zipfile
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+INDEX_STRIDE = 10000
+CHUNK_ROWS = 1_000_000
+READ_BLOCK = 8 * 1024 * 1024
+# 合并唯一值哈希的分块数阈值，限制统计时的内存
+MERGE_EVERY = 8
+
+
+class ResultTable:
+    """单个结果表文件：行数、列名、按页读取与列统计"""
+
+    format_name = "CSV"
+
+    def __init__(self, path):
+        self.path = path
+        self.sep = "\t" if path.endswith((".tsv", ".txt")) else ","
+        self.columns = pd.read_csv(path, sep=self.sep, nrows=0).columns.tolist()
+        self.offsets, self.n_rows = self._build_index()
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def _build_index(self):
+        """返回 (第 k*INDEX_STRIDE 行的起始字节偏移数组, 数据行数)"""
+        offsets = []
+        with open(self.path, "rb") as f:
+            f.readline()
+            pos = f.tell()
+            offsets.append(pos)
+            n_lines = 0
+            last = b""
+            while True:
+                block = f.read(READ_BLOCK)
+                if not block:
+                    break
+                newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10)
+                # 第 r 行从第 r 个换行符之后开始；取全局序号满足 (序号 + 1) % INDEX_STRIDE == 0 的换行符
+                first = -(n_lines + 1) % INDEX_STRIDE
+                offsets.extend((pos + newlines[first::INDEX_STRIDE] + 1).tolist())
+                n_lines += len(newlines)
+                pos += len(block)
+                last = block[-1:]
+        n_rows = n_lines + (1 if last not in (b"", b"\n") else 0)
+        # 以换行结尾时最后一个偏移指向文件末尾，不对应任何行
+        if offsets and offsets[-1] >= pos:
+            offsets.pop()
+        return np.asarray(offsets, dtype=np.int64), n_rows
+
+    def page(self, start, n_rows, columns=None):
+        """读取第 start 行起的 n_rows 行（0 起始，不含表头），columns 为只读取的列"""
+        start = max(0, min(start, self.n_rows))
+        n_rows = max(0, min(n_rows, self.n_rows - start))
+        if n_rows == 0:
+            return pd.DataFrame(columns=columns or self.columns)
+        k = start // INDEX_STRIDE
+        with open(self.path, "rb") as f:
+            f.seek(int(self.offsets[k]))
+            return pd.read_csv(f, sep=self.sep, header=None, names=self.columns, usecols=columns,
+                               skiprows=start - k * INDEX_STRIDE, nrows=n_rows)
+
+    def head(self, n_rows, columns=None):
+        """前 n_rows 行（Top-N）"""
+        return self.page(0, n_rows, columns)
+
+    @property
+    def has_stats(self):
+        return self._stats is not None
+
+    def column_stats(self):
+        """各列的数据类型、非空值、空值与唯一值数量（只计算一次）"""
+        with self._lock:
+            if self._stats is None:
+                self._stats = self._compute_stats()
+            return self._stats
+
+    def _compute_stats(self):
+        dtypes = {}
+        non_null = dict.fromkeys(self.columns, 0)
+        null = dict.fromkeys(self.columns, 0)
+        hashes = {c: [] for c in self.columns}
+        for chunk in pd.read_csv(self.path, sep=self.sep, chunksize=CHUNK_ROWS):
+            for col in self.columns:
+                values = chunk[col]
+                present = values.dropna()
+                non_null[col] += len(present)
+                null[col] += len(values) - len(present)
+                dtype = str(values.dtype)
+                # 各块推断的类型不一致时按 object 显示
+                dtypes[col] = dtype if dtypes.get(col, dtype) == dtype else "object"
+                hashes[col].append(np.unique(pd.util.hash_pandas_object(present, index=False).to_numpy()))
+                if len(hashes[col]) >= MERGE_EVERY:
+                    hashes[col] = [np.unique(np.concatenate(hashes[col]))]
+        rows = []
+        for col in self.columns:
+            unique = len(np.unique(np.concatenate(hashes[col]))) if hashes[col] else 0
+            rows.append({"列名": col, "数据类型": dtypes.get(col, "object"), "非空值": non_null[col],
+                         "空值": null[col], "唯一值": unique})
+        return pd.DataFrame(rows)
+
+
+class _ColumnarTable:
+    """列式表的公共部分：子类提供 columns、n_rows 与 _read_columns(start, stop, columns)"""
+
+    format_name = ""
+
+    def page(self, start, n_rows, columns=None):
+        start = max(0, min(start, self.n_rows))
+        stop = max(start, min(start + n_rows, self.n_rows))
+        columns = [c for c in columns if c in self.columns] if columns else self.columns
+        return pd.DataFrame(self._read_columns(start, stop, columns), columns=columns)
+
+    def head(self, n_rows, columns=None):
+        return self.page(0, n_rows, columns)
+
+    @property
+    def has_stats(self):
+        return self._stats is not None
+
+    def column_stats(self):
+        with self._lock:
+            if self._stats is None:
+                self._stats = pd.DataFrame(self._compute_stats())
+            return self._stats
+
+
+class ArrowResultTable(_ColumnarTable):
+    """parse.py 写出的 Arrow IPC（Feather v2）文件，内存映射读取"""
+
+    format_name = "Arrow"
+
+    def __init__(self, path):
+        import pyarrow as pa
+
+        self.path = path
+        # 未压缩的 IPC 文件读入后各列直接引用映射的页面，不复制数据
+        self._table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        self.columns = self._table.column_names
+        self.n_rows = self._table.num_rows
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def _read_columns(self, start, stop, columns):
+        sliced = self._table.slice(start, stop - start).select(columns)
+        return {col: sliced.column(col).to_pandas() for col in columns}
+
+    def _compute_stats(self):
+        import pyarrow.compute as pc
+
+        rows = []
+        for col in self.columns:
+            values = self._table.column(col)
+            dtype = np.dtype(values.type.to_pandas_dtype()).name
+            rows.append({"列名": col, "数据类型": dtype, "非空值": len(values) - values.null_count,
+                         "空值": values.null_count, "唯一值": pc.count_distinct(values).as_py()})
+        return rows
+
+
+def _mmap_npz(path):
+    """把未压缩 npz 中的每个数组内存映射为只读 ndarray"""
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} 中的 {info.filename} 经过压缩，无法内存映射")
+            # 本地文件头: 30 字节固定部分 + 文件名 + 扩展字段
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = np.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + int(name_len) + int(extra_len))
+            version = np.lib.format.read_magic(f)
+            read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                           else np.lib.format.read_array_header_2_0)
+            shape, fortran, dtype = read_header(f)
+            arrays[info.filename[:-4]] = np.memmap(f, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                                   order="F" if fortran else "C")
+    return arrays
+
+
+class NpzResultTable(_ColumnarTable):
+    """parse.py 在没有 pyarrow 时写出的 npz：seq_data/seq_offsets/count/percentage"""
+
+    format_name = "npz"
+    COLUMNS = {"Sequence": None, "Count": "count", "Percentage(%)": "percentage"}
+
+    def __init__(self, path):
+        self.path = path
+        self._arrays = _mmap_npz(path)
+        self.columns = list(self.COLUMNS)
+        self.n_rows = len(self._arrays["count"])
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def _sequences(self, start, stop):
+        offsets = self._arrays["seq_offsets"][start:stop + 1]
+        data = self._arrays["seq_data"][offsets[0]:offsets[-1]].tobytes() if len(offsets) else b""
+        rel = (offsets - offsets[0]).tolist() if len(offsets) else []
+        return [data[a:b].decode("ascii") for a, b in zip(rel, rel[1:])]
+
+    def _read_columns(self, start, stop, columns):
+        return {col: self._sequences(start, stop) if self.COLUMNS[col] is None
+                else np.asarray(self._arrays[self.COLUMNS[col]][start:stop]) for col in columns}
+
+    def _compute_stats(self):
+        rows = []
+        for col, key in self.COLUMNS.items():
+            if key is None:
+                # parse.py 按序列计数，每条序列只出现一次
+                dtype, unique = "object", self.n_rows
+            else:
+                values = self._arrays[key]
+                dtype, unique = str(values.dtype), len(np.unique(values))
+            rows.append({"列名": col, "数据类型": dtype, "非空值": self.n_rows, "空值": 0, "唯一值": unique})
+        return rows
+
+
+@st.cache_resource(max_entries=4, show_spinner="正在索引结果文件...")
+def _open_table(path, mtime, size):
+    if path.endswith(".feather"):
+        return ArrowResultTable(path)
+    if path.endswith(".npz"):
+        return NpzResultTable(path)
+    return ResultTable(path)
+
+
+def _columnar_path(path):
+    """与 CSV 同名、且不比 CSV 旧的列式表；没有时返回 None"""
+    stem = os.path.splitext(path)[0]
+    csv_mtime = os.path.getmtime(path)
+    for ext in (".feather", ".npz"):
+        candidate = stem + ext
+        if not os.path.exists(candidate) or os.path.getmtime(candidate) < csv_mtime:
+            continue
+        if ext == ".feather":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                continue
+        return candidate
+    return None
+
+
+def open_result_table(path):
+    """按 (路径, 修改时间, 大小) 缓存的结果表，优先使用同名列式表
+
+    返回的对象都提供 columns、n_rows、page、head、has_stats 与 column_stats；
+    列式表读取失败时回退到 CSV。
+    """
+    columnar = _columnar_path(path)
+    if columnar:
+        stat = os.stat(columnar)
+        try:
+            return _open_table(columnar, stat.st_mtime, stat.st_size)
+        except Exception as e:
+            print(f"[WARN] 读取列式表失败，改用 {path}: {e}")
+    stat = os.stat(path)
+    return _open_table(path, stat.st_mtime, stat.st_size)
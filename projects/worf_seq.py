@@ -0,0 +1,508 @@
+"""
+WORF-Seq Analysis 页面：基因定位助手（NCBI）、结果展示与覆盖度缩放浏览
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+import streamlit as st
+
+from projects.common import LOG_DIR, get_file_download_link, rel_path
+
+GENE_LOG_FILE = os.path.join(LOG_DIR, "gene_lookup.log")
+GENE_FAV_FILE = os.path.join(LOG_DIR, "gene_favorites.json")
+
+
+def log_gene_lookup(message):
+    """将基因定位助手的调试信息写入日志文件"""
+    try:
+        with open(GENE_LOG_FILE, "a", encoding="utf-8") as f:
+            f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}\n")
+    except Exception:
+        pass
+
+
+def load_gene_favorites():
+    """加载基因收藏记录"""
+    if not os.path.exists(GENE_FAV_FILE):
+        return []
+    try:
+        with open(GENE_FAV_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return []
+
+
+def save_gene_favorites(favs):
+    """保存基因收藏记录"""
+    try:
+        with open(GENE_FAV_FILE, "w", encoding="utf-8") as f:
+            json.dump(favs, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        log_gene_lookup(f"save favorites error: {e}")
+
+
+def add_gene_favorite(gene_symbol, organism, gene_info):
+    """添加收藏（去重，按symbol+organism）"""
+    favs = load_gene_favorites()
+    key = (gene_symbol.strip().upper(), organism.strip())
+    exists = any(
+        fav.get("symbol", "").upper() == key[0] and fav.get("organism") == key[1]
+        for fav in favs
+    )
+    if exists:
+        return False
+    entry = {
+        "symbol": gene_symbol.strip(),
+        "organism": organism.strip(),
+        "chromosome": gene_info.get("chromosome"),
+        "start": gene_info.get("start"),
+        "end": gene_info.get("end"),
+        "center": gene_info.get("center"),
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    favs.append(entry)
+    save_gene_favorites(favs)
+    return True
+
+
+def fetch_gene_coordinates(gene_symbol, organism="Homo sapiens"):
+    """通过NCBI E-utilities查询基因坐标，返回染色体、起止位置、中心点"""
+    if not gene_symbol:
+        return None, "请输入基因名称"
+    import requests
+
+    try:
+        query_term = f"{gene_symbol}[gene] AND {organism}[organism]"
+        log_gene_lookup(f"esearch term='{query_term}'")
+
+        esearch_params = {
+            "db": "gene",
+            "term": query_term,
+            "retmode": "json",
+            "retmax": 5,
+        }
+        esearch_resp = requests.get(
+            "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi",
+            params=esearch_params,
+            timeout=10,
+        )
+        log_gene_lookup(f"esearch status={esearch_resp.status_code} url={esearch_resp.url}")
+        esearch_resp.raise_for_status()
+        esearch_data = esearch_resp.json()
+        id_list = esearch_data.get("esearchresult", {}).get("idlist", [])
+        log_gene_lookup(f"esearch idlist={id_list}")
+        if not id_list:
+            return None, "未找到匹配的基因，请输入官方基因符号（如 TP53, HLA-C）"
+
+        gene_id = id_list[0]
+        esummary_params = {"db": "gene", "id": gene_id, "retmode": "json"}
+        esummary_resp = requests.get(
+            "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi",
+            params=esummary_params,
+            timeout=10,
+        )
+        log_gene_lookup(f"esummary status={esummary_resp.status_code} url={esummary_resp.url}")
+        esummary_resp.raise_for_status()
+        esummary_data = esummary_resp.json()
+
+        # esummary 返回的结构在 result 下，也可能出现在 DocumentSummarySet 下，双重兜底
+        docsum = esummary_data.get("result", {}).get(str(gene_id), {})
+        if not docsum and "DocumentSummarySet" in esummary_data:
+            summaries = esummary_data.get("DocumentSummarySet", {}).get("DocumentSummary", [])
+            if summaries:
+                docsum = summaries[0]
+
+        genomic_info = docsum.get("genomicinfo") or docsum.get("GenomicInfo") or []
+        if isinstance(genomic_info, dict):
+            genomic_info = [genomic_info]
+
+        log_gene_lookup(f"docsum keys={list(docsum.keys()) if docsum else []}")
+
+        if not genomic_info:
+            log_gene_lookup("no genomicinfo in docsum")
+            return None, "未在NCBI记录中找到基因坐标"
+
+        region = genomic_info[0]
+        chrom = (
+            region.get("ChrLoc")
+            or region.get("chr")
+            or docsum.get("chromosome")
+            or docsum.get("Chromosome")
+        )
+        start = (
+            region.get("ChrStart")
+            or region.get("chrstart")
+            or docsum.get("chrstart")
+        )
+        end = (
+            region.get("ChrStop")
+            or region.get("chrstop")
+            or docsum.get("chrstop")
+        )
+
+        log_gene_lookup(
+            f"region keys={list(region.keys())}; raw chrom={chrom} start={start} end={end}"
+        )
+
+        if start is None or end is None or chrom is None:
+            log_gene_lookup(
+                f"missing fields after fallback chrom={chrom} start={start} end={end}; docsum keys={list(docsum.keys())}"
+            )
+            return None, "NCBI返回数据不完整，缺少染色体或坐标"
+
+        # 标准化染色体格式
+        chrom_str = str(chrom)
+        if chrom_str.upper() in ["MT", "M"]:
+            chrom_str = "chrM"
+        elif not chrom_str.lower().startswith("chr"):
+            chrom_str = f"chr{chrom_str}"
+
+        start_pos = int(min(start, end))
+        end_pos = int(max(start, end))
+        center_pos = int((start_pos + end_pos) / 2)
+
+        log_gene_lookup(f"parsed chrom={chrom_str} start={start_pos} end={end_pos} center={center_pos}")
+
+        return {
+            "gene_id": gene_id,
+            "chromosome": chrom_str,
+            "start": start_pos,
+            "end": end_pos,
+            "center": center_pos,
+            "strand": region.get("ChrStrand"),
+            "map_location": docsum.get("maplocation") or docsum.get("MapLocation"),
+            "summary": docsum.get("summary") or docsum.get("Summary"),
+        }, "查询成功"
+    except requests.RequestException as req_err:
+        log_gene_lookup(f"request error: {req_err}")
+        return None, f"网络请求失败: {req_err}"
+    except Exception as e:
+        log_gene_lookup(f"parse error: {e}")
+        return None, f"解析NCBI返回数据失败: {e}"
+
+
+def display_param_helpers(selected_project):
+    """参数表单上方的基因定位助手：查询基因坐标并填充染色体与中心位置"""
+    st.markdown("### 🔎 基因定位助手 (NCBI)")
+    with st.expander("输入基因符号，一键获取染色体与起止坐标并自动填充", expanded=False):
+        gene_symbol_key = f"{selected_project}_gene_symbol"
+        organism_key = f"{selected_project}_organism"
+        st.session_state.setdefault(gene_symbol_key, "")
+        st.session_state.setdefault(organism_key, "Homo sapiens")
+
+        gene_symbol = st.text_input(
+            "🧬 基因符号 (官方HGNC/基因符号，如 HLA-C, TP53)",
+            value=st.session_state.get(gene_symbol_key, ""),
+            key=gene_symbol_key,
+            help="请输入官方基因符号（HGNC/RefSeq Gene Symbol），例如 TP53、HLA-C；支持同义词但以官方符号最稳"
+        )
+
+        organism_options = ["Homo sapiens", "Mus musculus", "Rattus norvegicus", "Danio rerio"]
+        default_org = st.session_state.get(organism_key, "Homo sapiens")
+        try:
+            default_org_idx = organism_options.index(default_org)
+        except ValueError:
+            default_org_idx = 0
+
+        organism = st.selectbox(
+            "🌍 物种",
+            options=organism_options,
+            index=default_org_idx,
+            key=organism_key,
+            help="用于NCBI检索的物种过滤"
+        )
+
+        lookup_btn = st.button("🔎 从NCBI获取坐标", key=f"lookup_gene_{selected_project}")
+        if lookup_btn:
+            with st.spinner("正在查询NCBI基因坐标..."):
+                gene_info, msg = fetch_gene_coordinates(gene_symbol.strip(), organism)
+            if gene_info:
+                # 写入session state，供下方参数默认值使用
+                st.session_state[f"{selected_project}_chromosome"] = gene_info["chromosome"]
+                st.session_state[f"{selected_project}_center_position"] = gene_info["center"]
+                st.session_state[f"{selected_project}_gene_region"] = gene_info
+                st.success(
+                    f"已获取 {gene_symbol.upper()} ({organism}) 坐标: {gene_info['chromosome']}:{gene_info['start']:,}-{gene_info['end']:,}"
+                )
+                st.info("已自动填充染色体与中心坐标，可在下方继续调整")
+                st.rerun()
+            else:
+                st.error(msg)
+
+        st.caption(f"调试日志: logs/gene_lookup.log (自动记录最近查询)")
+
+        # 收藏夹操作区域
+        favs = load_gene_favorites()
+        if favs:
+            fav_options = [
+                f"{fav['symbol']} ({fav['organism']}) {fav['chromosome']}:{fav['start']}-{fav['end']}"
+                for fav in favs
+            ]
+            applied_key = f"{selected_project}_fav_applied"
+            st.session_state.setdefault(applied_key, "- 选择收藏 -")
+
+            options = ["- 选择收藏 -"] + fav_options
+            default_idx = options.index(st.session_state.get(applied_key, "- 选择收藏 -")) if st.session_state.get(applied_key, "- 选择收藏 -") in options else 0
+
+            selected_fav = st.selectbox(
+                "⭐ 基因收藏夹（点击选择直接使用，无需再次查询）",
+                options=options,
+                index=default_idx,
+                key=f"{selected_project}_fav_select",
+            )
+            if selected_fav != "- 选择收藏 -" and st.session_state.get(applied_key) != selected_fav:
+                idx = fav_options.index(selected_fav)
+                chosen = favs[idx]
+                st.session_state[f"{selected_project}_chromosome"] = chosen["chromosome"]
+                st.session_state[f"{selected_project}_center_position"] = chosen["center"]
+                st.session_state[f"{selected_project}_gene_region"] = {
+                    "chromosome": chosen["chromosome"],
+                    "start": chosen["start"],
+                    "end": chosen["end"],
+                    "center": chosen["center"],
+                    "map_location": None,
+                    "summary": None,
+                }
+                st.session_state[applied_key] = selected_fav
+                st.success(f"已应用收藏: {chosen['symbol']} ({chosen['organism']})")
+
+        # 查询成功后允许收藏
+        if st.session_state.get(f"{selected_project}_gene_region"):
+            current_region = st.session_state[f"{selected_project}_gene_region"]
+            already_saved = any(
+                fav.get("symbol", "").upper() == gene_symbol.strip().upper()
+                and fav.get("organism") == organism
+                for fav in favs
+            ) if favs else False
+            col_fav_btn, _ = st.columns([1, 3])
+            with col_fav_btn:
+                if st.button("⭐ 收藏当前基因", key=f"fav_btn_{selected_project}", disabled=already_saved):
+                    added = add_gene_favorite(gene_symbol, organism, current_region)
+                    if added:
+                        st.success("已加入收藏夹")
+                    else:
+                        st.info("已在收藏夹中")
+                    st.rerun()
+
+        gene_region = st.session_state.get(f"{selected_project}_gene_region")
+        if gene_region:
+            st.markdown(
+                f"**最新查询:** {gene_region['chromosome']}:{gene_region['start']:,}-{gene_region['end']:,} (中心 {gene_region['center']:,})"
+            )
+            if gene_region.get("map_location"):
+                st.caption(f"图谱位置: {gene_region['map_location']}")
+
+
+@st.cache_resource(show_spinner=False)
+def load_coverage_pyramid(pyramid_path, mtime):
+    """打开覆盖度金字塔（按路径+修改时间缓存，文件重新生成后自动失效）"""
+    import sys
+    worf_dir = rel_path("WORF_Seq")
+    if worf_dir not in sys.path:
+        sys.path.insert(0, worf_dir)
+    from coverage_pyramid import CoveragePyramid
+    return CoveragePyramid(pyramid_path)
+
+
+def display_coverage_zoom(pyramid_path, chromosome, center_position):
+    """基于覆盖度金字塔的交互式缩放/平移视图，窗口计数直接从对应层级切片"""
+    try:
+        pyramid = load_coverage_pyramid(pyramid_path, os.path.getmtime(pyramid_path))
+    except (OSError, ValueError) as e:
+        st.warning(f"无法读取覆盖度金字塔: {e}")
+        return
+    refs = dict(pyramid.references())
+    if not refs:
+        st.info("覆盖度金字塔为空")
+        return
+
+    st.markdown("### 🔎 覆盖度缩放浏览")
+    chrom_names = list(refs)
+    col1, col2, col3 = st.columns([1, 2, 2])
+    with col1:
+        chrom = st.selectbox("染色体", chrom_names,
+                             index=chrom_names.index(chromosome) if chromosome in chrom_names else 0,
+                             key="pyr_chrom")
+    chrom_len = refs[chrom]
+    window_options = [w for w in (1_000, 5_000, 10_000, 50_000, 100_000, 500_000,
+                                  1_000_000, 5_000_000, 10_000_000, 50_000_000) if w < chrom_len] + [chrom_len]
+    with col2:
+        window = st.select_slider("窗口大小 (bp)", options=window_options,
+                                  value=100_000 if 100_000 in window_options else window_options[-1],
+                                  format_func=lambda w: f"{w:,}", key="pyr_window")
+    with col3:
+        try:
+            default_center = min(max(int(center_position), 0), chrom_len)
+        except (TypeError, ValueError):
+            default_center = chrom_len // 2
+        center = st.number_input("中心位置", min_value=0, max_value=int(chrom_len),
+                                 value=default_center, step=max(window // 2, 1), key="pyr_center")
+
+    start = max(0, int(center) - window // 2)
+    end = min(chrom_len, start + window)
+    start = max(0, end - window)
+    t0 = time.perf_counter()
+    starts, counts, bin_size = pyramid.query(chrom, start, end)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+
+    import pandas as pd
+
+    df = pd.DataFrame({"Position (Mb)": (starts + bin_size / 2) / 1e6, "Read Counts": counts})
+    st.bar_chart(df, x="Position (Mb)", y="Read Counts")
+    st.caption(f"{chrom}:{start:,}-{end:,} · bin {bin_size:,} bp · {len(counts):,} bins · "
+               f"查询 {elapsed_ms:.1f} ms · 计数规则: {pyramid.rule}（按read起点）")
+
+
+def display_results(params, work_dir):
+    """WORF-Seq 结果展示（重定位临时目录 + 打包下载 PNG/TXT）"""
+    if not params.get("folder_name"):
+        return
+    folder_input = params["folder_name"]
+    folder_basename = os.path.basename(folder_input)
+    chromosome = params.get("chromosome", "chr6")
+    center_position = params.get("center_position", 0)
+    step_size = params.get("step_size", 100000)
+    import glob
+
+    def dir_has_outputs(path):
+        if not os.path.exists(path):
+            return False
+        pngs = glob.glob(os.path.join(path, "*.png"))
+        txts = glob.glob(os.path.join(path, "*worf_seq_summary.txt"))
+        return len(pngs) + len(txts) > 0
+
+    candidates = [folder_input] + glob.glob(f"/tmp/worf_seq_{folder_basename}_*")
+    result_dir = next((p for p in candidates if dir_has_outputs(p)), candidates[0])
+
+    if result_dir != folder_input:
+        st.warning(f"已从临时目录加载结果: {result_dir}")
+
+    st.markdown("## 📊 WORF-Seq 分析结果")
+    st.markdown("### 🔍 结果目录")
+    st.info(f"📁 使用目录: {result_dir}")
+
+    # 尝试查找实际生成的文件（兼容多种命名格式，包含旧的带有对齐后缀的名字）
+    import fnmatch
+
+    def find_result_file(dirpath, pattern_glob):
+        matches = glob.glob(os.path.join(dirpath, pattern_glob))
+        return matches[0] if matches else None
+
+    # 支持两类命名：1) {sample}_target_region_chr_pos.png 2) {sample}_aligned_minimap.sorted_target_region_chr_pos.png
+    target_patterns = [f"{folder_basename}_target_region_{chromosome}_{center_position}.png",
+                       f"{folder_basename}_*target_region_{chromosome}_{center_position}.png"]
+    chrom_patterns = [f"{folder_basename}_chromosome_{chromosome}_step{step_size}.png",
+                      f"{folder_basename}_*chromosome_{chromosome}_step{step_size}.png"]
+    summary_patterns = [f"{folder_basename}_worf_seq_summary.txt",
+                        f"{folder_basename}_*worf_seq_summary.txt"]
+
+    target_png = None
+    chrom_png = None
+    summary_txt = None
+    for p in target_patterns:
+        found = find_result_file(result_dir, p)
+        if found:
+            target_png = found
+            break
+    for p in chrom_patterns:
+        found = find_result_file(result_dir, p)
+        if found:
+            chrom_png = found
+            break
+    for p in summary_patterns:
+        found = find_result_file(result_dir, p)
+        if found:
+            summary_txt = found
+            break
+
+    # 全基因组扫描输出（-g 开启时生成）
+    genome_png = find_result_file(result_dir, f"{folder_basename}*_genome_wide_step{step_size}.png")
+    genome_tsv = find_result_file(result_dir, f"{folder_basename}*_genome_bins_step{step_size}.tsv")
+    hotspot_tsv = find_result_file(result_dir, f"{folder_basename}*_hotspots_step{step_size}.tsv")
+    # 目标区域切片（带索引的小BAM），代替原始BAM提供下载
+    target_slice = find_result_file(result_dir, f"{folder_basename}*_target_slice.bam")
+    hotspot_slice = find_result_file(result_dir, f"{folder_basename}*_hotspots_slice.bam")
+
+    # 页面内显示低分辨率预览图（WGSmapping --preview-dpi 生成），高分辨率原图通过下载获取
+    previews = [p for p in (genome_png, chrom_png, target_png) if p]
+    previews = [f"{os.path.splitext(p)[0]}_preview.png" for p in previews]
+    previews = [p for p in previews if os.path.exists(p)]
+    if previews:
+        st.markdown("### 🖼️ 结果预览")
+        for preview in previews:
+            st.image(preview, caption=os.path.basename(preview).replace("_preview", ""), use_container_width=True)
+
+    # 富集热点排名表（WGSmapping 热点扫描生成）
+    if hotspot_tsv:
+        st.markdown("### 🔥 富集热点")
+        import pandas as pd
+        try:
+            hotspot_df = pd.read_csv(hotspot_tsv, sep="\t")
+            if hotspot_df.empty:
+                st.info("未检出显著富集的热点")
+            else:
+                st.caption(f"共 {len(hotspot_df)} 个热点，按得分排序（显示前20个）")
+                st.dataframe(hotspot_df.head(20), use_container_width=True, hide_index=True)
+        except Exception as e:
+            st.warning(f"无法读取热点表: {e}")
+
+    # 单文件下载（不含 BAM）
+    st.markdown("### 📥 结果下载 (不含BAM)")
+    for fpath, label in [
+        (target_png, "下载目标区域图"),
+        (chrom_png, "下载全染色体图"),
+        (summary_txt, "下载报告(txt)")
+    ] + [(p, label) for p, label in [(genome_png, "下载全基因组图"), (genome_tsv, "下载全基因组分bin计数表(tsv)"), (hotspot_tsv, "下载富集热点表(tsv)")] if p]:
+        if fpath and os.path.exists(fpath):
+            st.markdown(get_file_download_link(fpath, f"📥 {label}"), unsafe_allow_html=True)
+        else:
+            # 显示期望文件名以便用户参考
+            expected_name = label
+            if label == "下载目标区域图":
+                expected_name = f"{folder_basename}_target_region_{chromosome}_{center_position}.png"
+            elif label == "下载全染色体图":
+                expected_name = f"{folder_basename}_chromosome_{chromosome}_step{step_size}.png"
+            elif label == "下载报告(txt)":
+                expected_name = f"{folder_basename}_worf_seq_summary.txt"
+            st.info(f"未找到文件: {expected_name}")
+
+    slices = [p for p in (target_slice, hotspot_slice) if p and os.path.exists(f"{p}.bai")]
+    if slices:
+        st.markdown("### 🧬 区域BAM切片")
+        st.caption("仅包含目标位点 ±50kb（及热点）内的reads，附 .bai 索引，可直接载入 IGV")
+        for p in slices:
+            st.markdown(get_file_download_link(p, f"📥 下载 {os.path.basename(p)} ({os.path.getsize(p) / 1024 / 1024:.2f} MB)"),
+                        unsafe_allow_html=True)
+            st.markdown(get_file_download_link(f"{p}.bai", f"📥 下载 {os.path.basename(p)}.bai"), unsafe_allow_html=True)
+
+    # 覆盖度金字塔：由 WGSmapping 背景分析时生成，支持在页面内任意缩放
+    pyramid_file = find_result_file(result_dir, f"{folder_basename}*_coverage_pyramid.wcp")
+    if pyramid_file:
+        display_coverage_zoom(pyramid_file, chromosome, center_position)
+
+    # 打包下载（仅 PNG + TXT/TSV，排除 BAM）
+    bundle_candidates = [p for p in [target_png, chrom_png, summary_txt, genome_png, genome_tsv, hotspot_tsv] if p and os.path.exists(p)]
+    if bundle_candidates:
+        import tarfile
+        bundle_name = f"{folder_basename}_worf_seq_results.tar.gz"
+        bundle_path = os.path.join(result_dir, bundle_name)
+        try:
+            # 仅当有结果文件比压缩包新时才重建；已发出的下载链接绑定文件大小与修改时间，重建会使其失效
+            stale = (not os.path.exists(bundle_path)
+                     or any(os.stat(f).st_mtime_ns > os.stat(bundle_path).st_mtime_ns for f in bundle_candidates))
+            if stale:
+                # 先写临时文件再原子替换，正在下载旧压缩包的连接仍读取原文件，不会被截断
+                tmp_path = bundle_path + ".tmp"
+                with tarfile.open(tmp_path, "w:gz") as tar:
+                    for f in bundle_candidates:
+                        tar.add(f, arcname=os.path.basename(f))
+                os.replace(tmp_path, bundle_path)
+            st.success(f"已打包 {len(bundle_candidates)} 个文件")
+            st.markdown(get_file_download_link(bundle_path, f"📦 下载 {bundle_name}"), unsafe_allow_html=True)
+        except Exception as e:
+            st.error(f"打包失败: {e}")
+    else:
+        st.info("未找到可打包的PNG/TXT结果")
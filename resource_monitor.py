@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+任务进程树资源采样（/proc）
+
+任务在独立会话中运行（见 process_control.py），会话号即主进程 pid，
+因此只需扫描 /proc 中会话号相同的进程，就能得到 bash 包装脚本及其全部子进程
+（flash、minimap2、samtools、CRISPResso 等）。每次采样记录:
+    cpu_percent   整个进程树的 CPU 使用率（100 = 一个核满载）
+    rss_kb        整个进程树的常驻内存
+    read_bytes    累计从存储设备读取的字节数（/proc/<pid>/io）
+    write_bytes   累计写入的字节数
+    read_rate     两次采样之间的读取速度（字节/秒）
+    write_rate    两次采样之间的写入速度（字节/秒）
+    n_procs       进程数
+    command       当前 CPU 占用最高的子进程命令行
+    cmd_cpu       该进程的 CPU 使用率
+    cmd_threads   该进程的线程数
+
+例如 samtools sort 的 CPU 使用率远低于线程数 × 100 且读写速度高，说明瓶颈在磁盘；
+minimap2 -t 8 的 CPU 使用率长期只有 200% 左右，说明线程没有被充分利用。
+
+已退出子进程的 CPU 时间与读写字节数会在被 wait 回收时累加到父进程
+（cutime/cstime 与 /proc/<pid>/io），因此按存活进程的合计计算。子进程退出到被回收之间合计会暂时变小，
+累计值只取历史最大值，速度按累计值的增量计算，避免回收后重复计数。
+"""
+
+import os
+import time
+
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024
+# 命令行显示的最大长度
+MAX_COMMAND_LEN = 200
+
+
+def _read_stat(pid):
+    """解析 /proc/<pid>/stat，返回 (会话号, 进程名, utime+stime, cutime+cstime, 线程数, rss_kb)"""
+    with open(f"/proc/{pid}/stat", "rb") as f:
+        data = f.read()
+    # 进程名可能包含空格和括号，以最后一个右括号为界
+    name_end = data.rindex(b")")
+    comm = data[data.index(b"(") + 1:name_end].decode(errors="replace")
+    fields = data[name_end + 2:].split()
+    # fields[0] 为 state（stat 第3列），session 为第6列，utime..cstime 为第14-17列，num_threads 为第20列，rss 为第24列
+    session = int(fields[3])
+    own = int(fields[11]) + int(fields[12])
+    children = int(fields[13]) + int(fields[14])
+    threads = int(fields[17])
+    rss_kb = int(fields[21]) * PAGE_KB
+    return session, comm, own, children, threads, rss_kb
+
+
+def _read_io(pid):
+    """返回 (read_bytes, write_bytes)，无权限或内核不支持时返回 None"""
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            values = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(values["read_bytes"]), int(values["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _read_cmdline(pid, comm):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            args = f.read().split(b"\0")
+    except OSError:
+        return comm
+    cmd = " ".join(a.decode(errors="replace") for a in args if a)
+    return (cmd or comm)[:MAX_COMMAND_LEN]
+
+
+def session_pids(session):
+    """会话号为 session 的所有进程"""
+    pids = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        pid = int(entry)
+        try:
+            stat = _read_stat(pid)
+        except (OSError, ValueError, IndexError):
+            # 扫描期间退出的进程
+            continue
+        if stat[0] == session:
+            pids[pid] = stat
+    return pids
+
+
+class TreeSampler:
+    """对一个任务的进程树连续采样，CPU 使用率与读写速度由相邻两次采样的差值计算"""
+
+    def __init__(self, session):
+        self.session = session
+        self.last_time = None
+        # pid -> utime+stime，用于找出两次采样之间 CPU 占用最高的进程
+        self.last_procs = {}
+        self.cpu_ticks = 0
+        self.read_bytes = 0
+        self.write_bytes = 0
+
+    def sample(self):
+        """采样一次，进程树为空（任务已结束）时返回 None"""
+        now = time.monotonic()
+        procs = session_pids(self.session)
+        if not procs:
+            return None
+        dt = now - self.last_time if self.last_time is not None else None
+
+        cpu_ticks = rss_kb = read_bytes = write_bytes = 0
+        top = None
+        current = {}
+        for pid, (_, comm, own, children, threads, rss) in procs.items():
+            cpu_ticks += own + children
+            rss_kb += rss
+            io = _read_io(pid)
+            if io is not None:
+                read_bytes += io[0]
+                write_bytes += io[1]
+            # 新出现的进程（或 pid 被复用）从0开始计
+            prev = self.last_procs.get(pid)
+            own_delta = own - prev if prev is not None and own >= prev else own
+            current[pid] = own
+            if top is None or own_delta > top[0]:
+                top = (own_delta, pid, comm, threads)
+        cpu_delta = max(0, cpu_ticks - self.cpu_ticks)
+        read_delta = max(0, read_bytes - self.read_bytes)
+        write_delta = max(0, write_bytes - self.write_bytes)
+        self.cpu_ticks += cpu_delta
+        self.read_bytes += read_delta
+        self.write_bytes += write_delta
+
+        result = {
+            "ts": time.time(),
+            "cpu_percent": None,
+            "rss_kb": rss_kb,
+            "read_bytes": self.read_bytes,
+            "write_bytes": self.write_bytes,
+            "read_rate": None,
+            "write_rate": None,
+            "n_procs": len(procs),
+            "command": _read_cmdline(top[1], top[2]),
+            "cmd_cpu": None,
+            "cmd_threads": top[3],
+        }
+        if dt:
+            result["cpu_percent"] = round(cpu_delta / CLK_TCK / dt * 100, 1)
+            result["cmd_cpu"] = round(top[0] / CLK_TCK / dt * 100, 1)
+            result["read_rate"] = round(read_delta / dt)
+            result["write_rate"] = round(write_delta / dt)
+        self.last_time = now
+        self.last_procs = current
+        return result